@@ -2,15 +2,48 @@ __version__ = "0.2.0"
 
 # Interfacing with the metadata
 from . import config
-from .archive import Archive
+from . import profiling
+from .archive import Archive, FederatedArchive
 
-# Plotting routines
-from .plot_timeseries import *
-from .plot_magnitudes import *
-from .plot_connections import *
-from .plot_statistics import *
-from .plot_image import *
+# Plotting routines, loaded on first use (PEP 562) so that
+# importing the package does not import matplotlib
+_plots = {'plot_timeseries': ['OccurancePlot', 'OccuranceMagnitude',
+                              'ViolinPlot', 'RidgePlot'],
+          'plot_magnitudes': ['BarChart', 'PieChart'],
+          'plot_connections': ['ChordChart', 'Heatmap1', 'Heatmap2'],
+          'plot_statistics': ['FileTypes', 'HistogramYear',
+                              'HistogramMonth', 'HistogramWeek',
+                              'HistogramDay', 'TemporalStats',
+                              'HeatmapMonth', 'HeatmapWeek', 'HeatmapDay'],
+          'plot_image': ['ShowImage', 'ShowThumbnails'],
+          'plot_geospatial': ['MapDensity']}
+_lazy = {name: module for module, names in _plots.items() \
+         for name in names}
+
+def __getattr__(name):
+    if name in _lazy:
+        import importlib
+        module = importlib.import_module('.' + _lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
 
 # Other tools and functions
 from .tools import *
-from . import tools_datenames as dnt
\ No newline at end of file
+from . import tools_datenames as dnt
+from . import tools_duplicates as dup
+from . import tools_similarity as sim
+from . import tools_panorama as pano
+from . import tools_backup as bak
+from . import tools_exif as exif
+from . import tools_journal as jnl
+from . import tools_geo as geo
+from . import tools_folders as fld
+from . import tools_keywords as kw
+
+# Star imports of the package also include the lazy plotting routines
+__all__ = [n for n in globals() if not n.startswith('_')] + list(_lazy)
@@ -6,25 +6,109 @@ import numpy as np
 import pandas as pd
 import os
 import re
+import json
+import threading
 from . import config as cf
 from . import tools
+from . import tools_datenames as dnt
+from . import tools_duplicates as dup
+from . import tools_similarity as sim
+from . import tools_backup as bak
+from . import tools_exif as exif
+from . import tools_journal as jnl
+from . import tools_geo as geo
+from . import tools_folders as fld
+from . import tools_sqlite as sql
+from . import tools_keywords as kw
+from . import profiling as prof
 
+@prof.ProfileMethods
 class Archive():
     """Parent class for the media collection"""
-    def __init__(self):
+    def __init__(self, CollectionPath=None, csvPath=None,
+                 BackupPath=None, fields=None, ExcludeFolders=None,
+                 subfolders=None, verbose=None, cache=False,
+                 backend=None):
+        """
+        Settings not specified are taken from config, so that several
+        collections can be served by the same process.
+
+        Inputs:
+            CollectionPath (str) : Absolute path to the media collection
+            csvPath (str) : Absolute path of the metadatabase CSV files
+            BackupPath (str) : Absolute path of the backup location
+            fields (list) : Metadata fields of interest
+            ExcludeFolders (list) : Folders of the collection to exclude
+            subfolders (list) : Subfolders of the collection, default
+                    is to discover them on first use
+            verbose (bool) : Flag for printed function outputs
+            cache (bool) : If True, keep the csv tables in memory
+                    between searches, reading them again only when
+                    they change on disk. Useful for long-running
+                    processes, see MetaViz.server
+            backend (str) : 'csv' to search the csv files directly,
+                    or 'sqlite' to search and filter dates in a
+                    database mirroring them (csvPath/Metadata.sqlite),
+                    see MetaViz.tools_sqlite
+        """
         # Store details on collection location
-        self.CollectionPath = cf.CollectionPath
-        self.csvPath = cf.csvPath
-        self.BackupPath = cf.BackupPath
-        self.subfolders = cf.subfolders
-        self.fields = cf.fields
-        self.fields_short = cf.fields_short
+        self.CollectionPath = cf.CollectionPath if CollectionPath is None \
+                              else CollectionPath
+        self.csvPath = cf.csvPath if csvPath is None else csvPath
+        self.BackupPath = cf.BackupPath if BackupPath is None \
+                          else BackupPath
+        self.ExcludeFolders = cf.ExcludeFolders if ExcludeFolders is None \
+                              else ExcludeFolders
+        self._subfolders = subfolders
+        self._discover = subfolders is None
+        self.fields = cf.fields if fields is None else fields
+        self.fields_short = [f.split(':')[-1] for f in self.fields]
+        self.JournalPath = os.path.join(self.csvPath, 'Journal')
         
         # Set verbose flag for function printing
-        self.verbose = cf.verbose
+        self.verbose = cf.verbose if verbose is None else verbose
 
+        # In-memory tables, by subfolder
+        self.cache = cache
+        self._tables = {}
+        self._dates = None
+        self._lock = threading.Lock()
 
-    def UpdateCSV(self, subfolders=None):
+        # Storage used for searches
+        self.backend = cf.backend if backend is None else backend
+        if self.backend not in ['csv', 'sqlite']:
+            raise ValueError("backend must be 'csv' or 'sqlite'")
+        if self.backend == 'sqlite' and not sql.FTS5Available():
+            print("SQLite backend unavailable, requires sqlite3 with FTS5."\
+                  + " Searching the csv files instead")
+            self.backend = 'csv'
+        self.dbname = os.path.join(self.csvPath, 'Metadata.sqlite')
+        self._dblock = threading.Lock()
+
+
+    @property
+    def subfolders(self):
+        """
+        Subfolders of the collection, excluding any in ExcludeFolders.
+        Discovered on first access, and cached in 'Subfolders.json' in
+        csvPath so that later sessions only list changed directories.
+        Set to None to discover them again.
+        """
+        if self._subfolders is None:
+            cachefile = os.path.join(self.csvPath, 'Subfolders.json')
+            self._subfolders = fld.ScanFolders(self.CollectionPath,
+                                               self.ExcludeFolders,
+                                               cachefile=cachefile)
+        return self._subfolders
+
+
+    @subfolders.setter
+    def subfolders(self, value):
+        self._subfolders = value
+        self._discover = value is None
+
+
+    def UpdateCSV(self, subfolders=None, workers=1, incremental=False):
         """
         For a given list of subfolders, loop through and update the
         exiftool csv for that year. Must be called before later functions
@@ -32,6 +116,10 @@ class Archive():
 
         Inputs:
             subfolders (list) : subfolders to update, default is all
+            workers (int) : Number of exiftool processes to run at once,
+                    one subfolder each
+            incremental (bool) : If True, skip subfolders whose csv is
+                    newer than the folder and every file in it
         Outputs:
             Saves new csv files for specified folders in csvPath
         """
@@ -41,55 +129,169 @@ class Archive():
             subfolders = self.subfolders
         elif not isinstance(subfolders, list):
             subfolders = [subfolders]
+        if not os.path.exists(self.csvPath):
+            os.makedirs(self.csvPath)
+        if incremental:
+            subfolders = [sf for sf in subfolders if self._Outdated(sf)]
 
-        for sf in subfolders:
-            # Grab absolute path of this subfolder
-            foldername = os.path.join(self.CollectionPath, sf)
+        if workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(self._UpdateCSV, subfolders))
+        else:
+            for sf in subfolders:
+                self._UpdateCSV(sf)
+        return
 
-            # Create a name for csv preserving dir structure
-            csvname = os.path.join(self.csvPath,
-                                   sf.replace(os.sep,'__') + '.csv')
 
-            # Run exiftool through bash shell command
-            bashcmd = ('exiftool -csv %s > %s' % (foldername, csvname))
+    def _Outdated(self, sf):
+        """
+        Check if the csv of subfolder sf is missing, or older than
+        the subfolder or any file directly inside it
+        """
+        csvname = os.path.join(self.csvPath,
+                               sf.replace(os.sep,'__') + '.csv')
+        if not os.path.exists(csvname):
+            return True
+        csvtime = os.stat(csvname).st_mtime_ns
+        foldername = os.path.join(self.CollectionPath, sf)
+        if os.stat(foldername).st_mtime_ns > csvtime:
+            return True
+        with os.scandir(foldername) as it:
+            for entry in it:
+                if entry.is_file() and entry.stat().st_mtime_ns > csvtime:
+                    return True
+        return False
+
+
+    def _UpdateCSV(self, sf):
+        """Update the exiftool csv of a single subfolder"""
+        # Grab absolute path of this subfolder
+        foldername = os.path.join(self.CollectionPath, sf)
+
+        # Create a name for csv preserving dir structure
+        csvname = os.path.join(self.csvPath,
+                               sf.replace(os.sep,'__') + '.csv')
+
+        # Run exiftool through bash shell command
+        bashcmd = ('%s -csv %s > %s' % (cf.exiftool, foldername, csvname))
+        with prof.Subprocess():
             os.system(bashcmd) # Run
 
-            # Filter/rename columns based on fields in config
-            if self.fields is not None:
-                # Load in csv as dataframe
-                df = pd.read_csv(csvname, encoding = "ISO-8859-1",
-                                 low_memory=False)
-                headers = df.columns.to_list() # Grab headers
-                # Fields of interest that exist in CSV:
-                avail_fields_sh = [i for i in self.fields_short \
-                                   if i in headers]
-                # Longer name for those fields of interest
-                avail_fields = [i for i in self.fields if \
-                                i.split(':')[-1] in avail_fields_sh]
-                # Grab only fields of interest in order
-                df2 = df[avail_fields_sh]
-                # Change names to long-form
-                df2.columns = avail_fields
-                # Save new
-                df2.to_csv(csvname, index=False, encoding="ISO-8859-1")
+        # Filter/rename columns based on fields in config
+        if self.fields is not None:
+            # Load in csv as dataframe
+            df = prof.ReadCSV(csvname, encoding = "ISO-8859-1",
+                             low_memory=False)
+            headers = df.columns.to_list() # Grab headers
+            # Fields of interest that exist in CSV:
+            avail_fields_sh = [i for i in self.fields_short \
+                               if i in headers]
+            # Longer name for those fields of interest
+            avail_fields = [i for i in self.fields if \
+                            i.split(':')[-1] in avail_fields_sh]
+            # Grab only fields of interest in order
+            df2 = df[avail_fields_sh]
+            # Change names to long-form
+            df2.columns = avail_fields
+            # Save new
+            df2.to_csv(csvname, index=False, encoding="ISO-8859-1")
 
-            if self.verbose:
-                print('Updated csv for %s' % sf)
+        # Keep a copy as extracted, to diff against later edits
+        self._SaveExtracted(sf)
+
+        if self.verbose:
+            print('Updated csv for %s' % sf)
+        return
+
+
+    def _ExtractedName(self, sf):
+        """Name of the as-extracted copy of the csv of subfolder sf"""
+        return os.path.join(self.csvPath, 'Extracted',
+                            sf.replace(os.sep,'__') + '.csv')
+
+
+    def _SaveExtracted(self, sf):
+        """Copy the csv of subfolder sf to its as-extracted copy"""
+        import shutil
+        csvname = os.path.join(self.csvPath,
+                               sf.replace(os.sep,'__') + '.csv')
+        extracted = self._ExtractedName(sf)
+        os.makedirs(os.path.dirname(extracted), exist_ok=True)
+        shutil.copyfile(csvname, extracted)
         return
 
 
-    def UpdateMetadata(self, subfolders=None):
+    def DiffMetadata(self, subfolders=None):
+        """
+        List the metadata edits made to the csv files since they were
+        last extracted with UpdateCSV() (or written with
+        UpdateMetadata()), as the minimal set of changed files and tags.
+
+        Inputs:
+            subfolders (list) : subfolders in which to look for
+                    edits, default is all
+        Outputs:
+            changes (pandas DataFrame) : Output of
+                    tools_exif.DiffMetadata(), with an extra
+                    Subfolder column
+        """
+        # Check input
+        if subfolders is None:
+            subfolders = self.subfolders
+        elif not isinstance(subfolders, list):
+            subfolders = [subfolders]
+
+        frames = []
+        for sf in subfolders:
+            csvname = os.path.join(self.csvPath,
+                                   sf.replace(os.sep,'__') + '.csv')
+            extracted = self._ExtractedName(sf)
+            if not os.path.exists(extracted):
+                raise FileNotFoundError('No extracted copy of the csv '\
+                                        + 'for %s, run UpdateCSV()' % sf)
+            # Read as plain strings so values compare as written
+            old = prof.ReadCSV(extracted, encoding="ISO-8859-1",
+                              dtype=str, keep_default_na=False)
+            new = prof.ReadCSV(csvname, encoding="ISO-8859-1",
+                              dtype=str, keep_default_na=False)
+            changes = exif.DiffMetadata(old, new)
+            changes.insert(0, 'Subfolder', sf)
+            frames.append(changes)
+        changes = pd.concat(frames, ignore_index=True)
+        return changes
+
+
+    def UpdateMetadata(self, subfolders=None, diff=True,
+                       batch_size=1000, journal=True):
         """
         For a given list of subfolders, loop through and update
         the metadata in the files of that folder to match the CSV
         using the exiftool update from csv command.
 
+        By default, only the files and tags edited since the csv was
+        extracted (see DiffMetadata()) are written, using a single
+        exiftool call with files grouped by identical tag assignments.
+        Subfolders without an extracted copy of their csv are written
+        in full.
+
+        In diff mode, the original values of the edited tags are
+        recorded in a journal before writing, so the edit can be
+        undone with Rollback(). Cells cleared in the csv delete
+        their tag from the files.
+
         **WARNING**: Dangerous function, directly modifies files
         in archive. Make sure to keep backups!
 
         Inputs:
             subfolders (list) : subfolders in which to update
                     files, default is all
+            diff (bool) : If True, only write edited files and tags.
+                    If False, rewrite every file in the subfolders
+            batch_size (int) : Largest number of files written by one
+                    exiftool command in diff mode
+            journal (bool) : If True, record the edits in the journal
+                    in diff mode
         Outputs:
             Saves csv metadata into media files
         """
@@ -105,6 +307,37 @@ class Archive():
             print('Warning: Function directly modifies file metadata.\n'\
                    +'Make sure to keep a backup!')
 
+        # Write only edited files and tags where possible
+        if diff:
+            full = [sf for sf in subfolders \
+                    if not os.path.exists(self._ExtractedName(sf))]
+            partial = [sf for sf in subfolders if sf not in full]
+            if len(partial) > 0:
+                changes = self.DiffMetadata(partial)
+                argfile = os.path.join(self.csvPath, 'Extracted',
+                                       'UpdateMetadata.args')
+                jr = None
+                if journal and len(changes) > 0:
+                    jr = jnl.Journal(self.JournalPath, 'UpdateMetadata')
+                    jr.RecordTags(changes)
+                # Cells cleared in the csv delete their tag
+                result = exif.ApplyChanges(changes, argfile, batch_size,
+                                           delete_empty=True)
+                written = result is not None and result.returncode == 0
+                if result is not None and not written:
+                    print('exiftool reported errors, see output above')
+                elif len(changes) == 0 or written:
+                    for sf in partial:
+                        self._SaveExtracted(sf)
+                if jr is not None:
+                    jr.Close('done' if written else 'failed')
+                    if self.verbose:
+                        print('Journal batch ID: %s' % jr.batch_id)
+                if self.verbose:
+                    print('Updated %d tags in %d files' \
+                          % (len(changes), changes['SourceFile'].nunique()))
+            subfolders = full
+
         # Update metadata
         for sf in subfolders:
             # Grab absolute path of this subfolder
@@ -115,26 +348,278 @@ class Archive():
                                    sf.replace(os.sep,'__') + '.csv')
 
             # Run exiftool through bash shell command
-            bashcmd = ('exiftool -csv=%s %s -overwrite_original_in_place -P -F'\
-                       % (csvname, foldername))
-            os.system(bashcmd) # Run
+            bashcmd = ('%s -csv=%s %s -overwrite_original_in_place -P -F'\
+                       % (cf.exiftool, csvname, foldername))
+            with prof.Subprocess():
+                os.system(bashcmd) # Run
 
             if self.verbose:
                 print('Updated metadata in %s' % sf)
         return
 
 
-    def CreateBackup(self, subfolders=None, format='zip'):
+    def ListJournal(self):
+        """
+        List the batches of writes recorded in the journal, such as
+        edits made by UpdateMetadata(), or renames made by
+        tools.BatchRename() and tools_datenames.Dates2Names() when
+        given a journal (see Journal()).
+
+        Outputs:
+            batches (pandas DataFrame) : Output of
+                    tools_journal.ListBatches()
+        """
+        return jnl.ListBatches(self.JournalPath)
+
+
+    def Journal(self, description=''):
+        """
+        Start a new batch in the journal, to pass to the functions
+        which rename files, e.g. tools.BatchRename(..., journal=...)
+
+        Inputs:
+            description (str) : Short description of the batch
+        Outputs:
+            journal (tools_journal.Journal) : Journal of the batch
+        """
+        return jnl.Journal(self.JournalPath, description)
+
+
+    def Rollback(self, batch_id):
+        """
+        Undo a batch of writes recorded in the journal, restoring the
+        original tag values in the files and in the csv files, and
+        the original file names. Later batches touching the same
+        files should be rolled back first.
+
+        **WARNING**: Directly modifies files in archive
+
+        Inputs:
+            batch_id (str) : ID of the batch, see ListJournal()
+        Outputs:
+            Restores the files (and csv files) to their state
+            before the batch
+        """
+        records = jnl.Rollback(self.JournalPath, batch_id, self.verbose)
+
+        # Restore csv values of rolled back tags, so that the
+        # metadatabase still matches the files
+        tags = records[records['Action'] == 'tag']
+        tags = tags.iloc[::-1].drop_duplicates(['SourceFile', 'Tag'],
+                                               keep='last')
+        tags = tags.rename(columns={'OldValue': 'Value'})
+        self._PatchCSV(tags)
+
+        if self.verbose and (records['Action'] == 'rename').any():
+            print('Files were renamed back, run UpdateCSV() to refresh')
+        return
+
+
+    def _PatchCSV(self, changes):
+        """
+        Write changes (columns Subfolder, SourceFile, Tag and Value)
+        into both the csv files and their as-extracted copies, after
+        they were written into the files. The special Tag 'FileName'
+        changes the SourceFile itself.
+        """
+        for sf, df in changes.groupby('Subfolder'):
+            if sf == '':
+                continue
+            csvname = os.path.join(self.csvPath,
+                                   sf.replace(os.sep,'__') + '.csv')
+            for name in [csvname, self._ExtractedName(sf)]:
+                if not os.path.exists(name):
+                    continue
+                data = prof.ReadCSV(name, encoding="ISO-8859-1",
+                                   dtype=str, keep_default_na=False)
+                row = pd.Series(data.index, index=data['SourceFile'])
+                row = row[~row.index.duplicated()]
+                # Tags first, since renames change the SourceFile
+                df = pd.concat([df[df['Tag'] != 'FileName'],
+                                df[df['Tag'] == 'FileName']])
+                for src, tag, value in zip(df['SourceFile'], df['Tag'],
+                                           df['Value']):
+                    if src not in row.index:
+                        continue
+                    if tag == 'FileName':
+                        data.loc[row[src], 'SourceFile'] = value
+                    elif tag in data.columns:
+                        data.loc[row[src], tag] = value
+                data.to_csv(name, index=False, encoding="ISO-8859-1")
+        return
+
+
+    def ReadCSV(self, subfolders=None):
+        """
+        Read the csv files of the metadatabase as they are stored,
+        with long column names and all values as strings, as needed
+        to plan edits (see PlanNames2Dates() and PlanDates2Names()).
+
+        Inputs:
+            subfolders (list) : subfolders to read, default is all
+        Outputs:
+            data (pandas DataFrame) : Metadatabase, with an extra
+                    Subfolder column
+        """
+        # Check input
+        if subfolders is None:
+            subfolders = self.subfolders
+        elif not isinstance(subfolders, list):
+            subfolders = [subfolders]
+
+        frame = []
+        for sf in subfolders:
+            csvname = os.path.join(self.csvPath,
+                                   sf.replace(os.sep,'__') + '.csv')
+            df = prof.ReadCSV(csvname, encoding="ISO-8859-1",
+                             dtype=str, keep_default_na=False)
+            df.insert(0, 'Subfolder', sf)
+            frame.append(df)
+        data = pd.concat(frame, ignore_index=True)
+        return data
+
+
+    def PlanNames2Dates(self, subfolders=None,
+                        datefields=['CreateDate','FileModifyDate'],
+                        dt_format='%Y%m%d_%H%M%S', numChar=15,
+                        timedelta=None, select=None):
+        """
+        Plan the update of date fields from the dates in the
+        filenames, over the whole metadatabase at once. Apply the
+        plan with ApplyPlan(). See tools_datenames.PlanNames2Dates()
+
+        Inputs:
+            subfolders (list) : subfolders to include, default is all
+            datefields (list) : List of which date-related metadata
+                    fields to update
+            dt_format (str) : Datetime format of the filenames
+            numChar (int) : Number of date characters in dt_format
+            timedelta (str) : Constant timedelta to add to the dates
+                    of the selected files, e.g. "1hr"
+            select (list) : Filenames (with or without path) to which
+                    the plan applies, e.g. the output of FindSource().
+                    Default is every file
+        Outputs:
+            plan (pandas DataFrame) : Planned changes
+        """
+        data = self.ReadCSV(subfolders)
+        plan = dnt.PlanNames2Dates(data, datefields, dt_format, numChar,
+                                   timedelta, select)
+        return plan
+
+
+    def PlanDates2Names(self, subfolders=None, dt_format='%Y%m%d_%H%M%S',
+                        datesource='CreateDate', timedelta=None,
+                        select=None):
+        """
+        Plan the renaming of files after their dates, over the whole
+        metadatabase at once, optionally shifting the dates first.
+        Apply the plan with ApplyPlan(). See
+        tools_datenames.PlanDates2Names()
+
+        Inputs:
+            subfolders (list) : subfolders to include, default is all
+            dt_format (str) : Datetime format to use in the filenames
+            datesource (str) : Metadata field from which to grab the
+                    dates, e.g. CreateDate or FileModifyDate
+            timedelta (str) : Constant timedelta to add to the dates
+                    of the selected files, e.g. "1hr"
+            select (list) : Filenames (with or without path) to which
+                    the plan applies, e.g. the output of FindSource().
+                    Default is every file
+        Outputs:
+            plan (pandas DataFrame) : Planned changes and renames
+        """
+        data = self.ReadCSV(subfolders)
+        plan = dnt.PlanDates2Names(data, dt_format, datesource,
+                                   timedelta, select)
+        return plan
+
+
+    def ApplyPlan(self, plan, journal=True, batch_size=1000):
+        """
+        Apply a plan from PlanNames2Dates() or PlanDates2Names() (or
+        their concatenation) in a single batched pass: all tag writes
+        go through one exiftool call, then files are renamed. The csv
+        files are updated to match.
+
+        **WARNING**: Dangerous function, directly modifies files
+        in archive. Make sure to keep backups!
+
+        Inputs:
+            plan (pandas DataFrame) : Planned changes
+            journal (bool) : If True, record the changes in the journal
+                    so they can be undone with Rollback()
+            batch_size (int) : Largest number of files written by one
+                    exiftool command
+        Outputs:
+            Updates the files and csv files according to plan
+        """
+        tags = plan[plan['Tag'] != 'FileName']
+        renames = plan[plan['Tag'] == 'FileName'].copy()
+        if journal:
+            jr = jnl.Journal(self.JournalPath, 'ApplyPlan')
+            jr.RecordTags(tags)
+        else:
+            jr = None
+
+        # Write all tags in one exiftool call
+        argfile = os.path.join(self.csvPath, 'Extracted', 'ApplyPlan.args')
+        if not os.path.exists(os.path.dirname(argfile)):
+            os.makedirs(os.path.dirname(argfile))
+        result = exif.ApplyChanges(tags, argfile, batch_size)
+        if result is not None and result.returncode != 0:
+            print('exiftool reported errors, see output above')
+            if jr is not None:
+                jr.Close('failed')
+            return
+        self._PatchCSV(tags)
+
+        # Then rename files
+        if len(renames) > 0:
+            renames['Value'] = tools.BatchRename(renames['OldValue'].tolist(),
+                                                 renames['Value'].tolist(),
+                                                 journal=jr)
+            self._PatchCSV(renames)
+        elif jr is not None:
+            jr.Close()
+
+        if self.verbose:
+            print('Wrote %d tags and renamed %d files' \
+                  % (len(tags), len(renames)))
+            if jr is not None:
+                print('Journal batch ID: %s' % jr.batch_id)
+        return
+
+
+    def CreateBackup(self, subfolders=None, format='zip',
+                     skip_duplicates=False, incremental=False,
+                     workers=None):
         """
         Create a compressed backup of archive in secure folder
         Note: Function may fail for timestamps before 1980
 
+        With incremental=True, saves a snapshot into a content-addressed
+        store in BackupPath instead (see tools_backup.Snapshot()). Only
+        new or modified content is stored, already-compressed media is
+        not deflated again, and duplicates are stored once. Restore
+        snapshots with RestoreBackup()
+
         Inputs:
             subfolders (list) : subfolders to backup, default
                     is all, stored in containers one subdirectory
                     below CollectionPath
             format (str) : compression type to use with
                     shutil.make_archive(), e.g. 'zip', 'tar', 'gztar'
+            skip_duplicates (bool) : If True, files whose content is
+                    identical to a file already backed up are left out,
+                    and listed in a '__duplicates__.csv' entry of the
+                    zip instead. Uses and updates the content-hash
+                    index (see UpdateHashes). Only works with 'zip'
+            incremental (bool) : If True, save an incremental snapshot
+                    rather than one compressed file per subfolder
+            workers (int) : Number of threads used to hash and
+                    compress files in incremental mode
         Outputs:
             Saves a zip backup of the specified subfolders
         """
@@ -142,6 +627,15 @@ class Archive():
         if not os.path.exists(self.BackupPath):
             os.makedirs(self.BackupPath)
 
+        if incremental:
+            if subfolders is not None and not isinstance(subfolders, list):
+                subfolders = [subfolders]
+            bak.Snapshot(self.CollectionPath,
+                         os.path.join(self.BackupPath, 'store'),
+                         subfolders, workers=workers,
+                         verbose=self.verbose)
+            return
+
         # Check input
         if subfolders is None:
             subfolders = os.listdir(self.CollectionPath)
@@ -151,6 +645,14 @@ class Archive():
         elif not isinstance(subfolders, list):
             subfolders = [subfolders]
 
+        # Content-hash index of whole collection, to find duplicates
+        if skip_duplicates:
+            if format != 'zip':
+                raise ValueError("skip_duplicates requires format='zip'")
+            index = self.UpdateHashes(self._AllFolders(subfolders))
+            index = index.set_index('SourceFile')
+            seen = {}
+
         # Zip folders
         for sf in subfolders:
             # Grab paths for this subfolder
@@ -160,10 +662,285 @@ class Archive():
             # Compress files
             if self.verbose:
                 print('Zipping ' + sf)
-            shutil.make_archive(backupname, format, foldername)
+            if skip_duplicates:
+                self._ZipUnique(foldername, backupname + '.zip',
+                                index, seen)
+            else:
+                shutil.make_archive(backupname, format, foldername)
+        return
+
+
+    def RestoreBackup(self, dst, snapshot=None, paths=None,
+                      workers=None):
+        """
+        Restore files from an incremental backup made with
+        CreateBackup(incremental=True).
+
+        Inputs:
+            dst (str) : Folder in which to restore the files. Files are
+                    restored with their path relative to CollectionPath
+            snapshot (str) : Name of the snapshot to restore, default
+                    is the latest. See tools_backup.ListSnapshots()
+            paths (list) : Paths relative to CollectionPath (files or
+                    subfolders) to restore, default is everything
+            workers (int) : Number of threads used to restore files
+        Outputs:
+            Restores the files of the snapshot into dst
+        """
+        n = bak.Restore(os.path.join(self.BackupPath, 'store'), dst,
+                        snapshot, paths, workers)
+        if self.verbose:
+            print('Restored %d files into %s' % (n, dst))
+        return
+
+
+    def _AllFolders(self, subfolders):
+        """
+        Expand a list of top-level subfolders into the absolute
+        paths of every directory below them (inclusive)
+        """
+        folders = []
+        for sf in subfolders:
+            for root, dirs, files in os.walk(os.path.join(
+                                         self.CollectionPath, sf)):
+                folders.append(root)
+        return folders
+
+
+    def _ZipUnique(self, foldername, zipname, index, seen):
+        """
+        Zip the contents of foldername, skipping files whose content
+        is already in the backup (tracked across calls in seen)
+        """
+        import zipfile
+        skipped = []
+        with zipfile.ZipFile(zipname, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for root, dirs, files in os.walk(foldername):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    arcname = os.path.relpath(path, foldername)
+                    h = index['Hash'].get(path, '')
+                    if h != '':
+                        key = (h, index['Size'][path])
+                        if key in seen:
+                            skipped.append((arcname, seen[key]))
+                            continue
+                        seen[key] = path
+                    zf.write(path, arcname)
+            if len(skipped) > 0:
+                dupcsv = pd.DataFrame(skipped, columns=['SourceFile',
+                                                        'DuplicateOf'])
+                zf.writestr('__duplicates__.csv',
+                            dupcsv.to_csv(index=False))
+        return
+
+
+    def UpdateHashes(self, folders=None, workers=None):
+        """
+        Update the content-hash index of the collection, saved as
+        'ContentHashes.csv' in csvPath. Only files sharing their size
+        with another file are hashed, and hashes of files whose size
+        and modification time are unchanged since the last call are
+        reused, so repeated calls are cheap.
+
+        Inputs:
+            folders (list) : Absolute paths of the folders to index,
+                    default is every subfolder of the collection.
+                    Entries of other folders in the index are kept.
+            workers (int) : Number of threads used for hashing
+        Outputs:
+            index (pandas DataFrame) : Content-hash index, see
+                    tools_duplicates.HashFiles()
+        """
+        csvname = os.path.join(self.csvPath, 'ContentHashes.csv')
+        if folders is None:
+            folders = [os.path.join(self.CollectionPath, sf)
+                       for sf in self.subfolders]
+
+        # Load previous index, if any
+        if os.path.exists(csvname):
+            old = prof.ReadCSV(csvname, encoding="ISO-8859-1",
+                              dtype={'Hash': str},
+                              keep_default_na=False)
+        else:
+            old = None
+
+        files = dup.ListFiles(folders)
+        if old is not None:
+            # Keep entries of folders outside this update, so sizes
+            # shared with files elsewhere still trigger hashing
+            scanned = old['SourceFile'].map(os.path.dirname)
+            folders_abs = set(os.path.normpath(f) for f in folders)
+            outside = old[~scanned.map(os.path.normpath).isin(folders_abs)]
+            files = pd.concat([files, outside[['SourceFile', 'Size',
+                                                'ModifyTime']]])
+        index = dup.HashFiles(files, index=old, workers=workers)
+        index.to_csv(csvname, index=False, encoding="ISO-8859-1")
+
+        if self.verbose:
+            print('Updated content hashes for %d files' % len(index))
+        return index
+
+
+    def FindDuplicates(self, update=True, summary=False):
+        """
+        Report files in the collection with exactly identical content.
+
+        Inputs:
+            update (bool) : If True, update the content-hash index
+                    first, otherwise use the existing index
+            summary (bool) : If True, return one line per group of
+                    duplicates rather than one line per file
+        Outputs:
+            dups (pandas DataFrame) : Output of
+                    tools_duplicates.FindDuplicates(), or of
+                    tools_duplicates.DuplicateSummary() if summary
+        """
+        if update:
+            index = self.UpdateHashes()
+        else:
+            csvname = os.path.join(self.csvPath, 'ContentHashes.csv')
+            index = prof.ReadCSV(csvname, encoding="ISO-8859-1",
+                                dtype={'Hash': str},
+                                keep_default_na=False)
+        dups = dup.FindDuplicates(index)
+        if summary:
+            dups = dup.DuplicateSummary(dups)
+        return dups
+
+
+    def _LoadCSV(self, sf, fields=None):
+        """
+        Read the csv of subfolder sf, only the columns of the
+        shorthand fields if given. With cache=True, the whole table
+        is kept in memory and only read again when the csv changes.
+        Cached tables are shared, and must not be modified in place
+        """
+        csvname = os.path.join(self.csvPath,
+                               sf.replace(os.sep,'__') + '.csv')
+        if not self.cache:
+            return prof.ReadCSV(csvname, **self._ReadOptions(csvname,
+                                                             fields))
+        mtime = os.stat(csvname).st_mtime_ns
+        with self._lock:
+            cached = self._tables.get(sf)
+        if cached is not None and cached[0] == mtime:
+            df = cached[1]
+        else:
+            df = prof.ReadCSV(csvname, encoding = "ISO-8859-1",
+                              low_memory=False)
+            df = _ParseDurations(df)
+            with self._lock:
+                self._tables[sf] = (mtime, df)
+        if fields is not None:
+            df = df[_Columns(df.columns, fields)]
+        return df
+
+
+    def _ReadOptions(self, csvname, fields=None):
+        """
+        Arguments of read_csv() for a metadatabase csv. With fields,
+        only the columns of those shorthand fields are parsed, with
+        the same types as when reading the whole csv
+        """
+        options = {'encoding': "ISO-8859-1", 'low_memory': False}
+        if fields is not None:
+            header = pd.read_csv(csvname, encoding="ISO-8859-1",
+                                 nrows=0).columns
+            options['usecols'] = _Columns(header, fields)
+        return options
+
+
+    def _DateRanges(self):
+        """
+        First and last CreateDate of each subfolder, with the mtime
+        of its csv, kept in csvPath/DateRanges.json. Lets searches
+        with date bounds skip subfolders entirely outside of them
+        """
+        with self._lock:
+            if self._dates is None:
+                name = os.path.join(self.csvPath, 'DateRanges.json')
+                self._dates = {}
+                if os.path.exists(name):
+                    with open(name) as f:
+                        self._dates = json.load(f)
+            return self._dates
+
+
+    def _SaveDateRanges(self):
+        name = os.path.join(self.csvPath, 'DateRanges.json')
+        with self._lock:
+            text = json.dumps(self._dates, indent=1)
+            try:
+                with open(name + '.tmp', 'w') as f:
+                    f.write(text)
+                os.replace(name + '.tmp', name)
+            except OSError:
+                # Read-only metadatabase, ranges are kept in memory
+                pass
         return
 
 
+    def Reload(self):
+        """
+        Forget the cached tables, and the subfolders unless they
+        were given, so they are read again on the next search
+        """
+        with self._lock:
+            self._tables = {}
+        if self._discover:
+            self._subfolders = None
+        return
+
+
+    def UpdateDatabase(self):
+        """
+        Mirror the csv files into the SQLite database used by the
+        'sqlite' backend, copying only the subfolders whose csv
+        changed since the last update. Called before each search
+        when backend='sqlite'
+
+        Outputs:
+            n_changed (int) : Number of subfolders copied or removed
+        """
+        with self._dblock:
+            n_changed = sql.Sync(self.dbname, self.csvPath, self.subfolders,
+                                 self.fields_short, self.verbose)
+        return n_changed
+
+
+    def Search(self, query, fields=None, subfolders=None, limit=None,
+               withPath=False):
+        """
+        Full-text search of the text fields (Title, Description,
+        Notes, Subject, ...), best matches first. Uses the SQLite
+        database, whatever the backend. Matching is case-insensitive
+        and query follows the FTS5 syntax, e.g.
+            '"birthday party"'      (phrase)
+            'moun*'                 (prefix)
+            'beach AND NOT dog'     (boolean operators)
+            'NEAR(cake candles, 5)' (proximity)
+
+        Inputs:
+            query (str) : Full-text query
+            fields (list) : Metadata fields in which to look.
+                    Shorthand expected. Default is all text fields
+            subfolders (list) : Subfolders in which to search,
+                    default is all
+            limit (int) : Largest number of results
+            withPath (bool) : Returns just filenames if False,
+                    returns full path if true
+        Outputs:
+            FileNames (list) : List of matching file names
+        """
+        self.UpdateDatabase()
+        results = sql.Search(self.dbname, query, fields, subfolders, limit)
+        FileNames = list(dict.fromkeys(results['SourceFile']))
+        if withPath is False:
+            FileNames = [f.split(os.sep)[-1] for f in FileNames]
+        return FileNames
+
+
     def FindSource(self, searchterms, fields=None,
                    subfolders=None, include_all=False,
                    withPath=False):
@@ -178,6 +955,10 @@ class Archive():
         reliable intersection, use multiple single-term
         searches with IntersectLists()
 
+        With backend='sqlite', terms without wildcards are looked
+        up in the full-text index for the indexed text fields (see
+        tools_sqlite.TEXT_FIELDS), with the same results
+
         Inputs:
             searchterms (list) : Terms for which to search.
                     Expects whole words!
@@ -214,24 +995,43 @@ class Archive():
             return []
 
         FileNames = []
+        if self.backend == 'sqlite' and not wildcard_border \
+           and all(any(c.isalnum() for c in t) for t in searchterms):
+            # Whole-word search in the full-text index, checking the
+            # candidates with the expression used for the csv below
+            self.UpdateDatabase()
+            indexed = sql.TextFields(self.dbname)
+            if len(searchterms) == 1:
+                pattern = r'\b%s\b' % re.escape(searchterms[0])
+            elif include_all:
+                pattern = ''.join(r'(?=.*\b%s\b)' % re.escape(t)
+                                  for t in searchterms)
+            else:
+                pattern = '|'.join(r'\b%s\b' % re.escape(t)
+                                   for t in searchterms)
+            FileNames = sql.FindSource(self.dbname, searchterms, fields,
+                                       subfolders, include_all, pattern)
+            # Fields not in the index are still read from the csv
+            fields = [f for f in fields if f not in indexed]
+            if len(fields) == 0:
+                subfolders = []
+
         for sf in subfolders:
-            # Recreate csv name from dir structure
-            csvname = os.path.join(self.csvPath,
-                                   sf.replace(os.sep,'__') + '.csv')
-            # Read in csv
-            df = pd.read_csv(csvname, encoding = "ISO-8859-1",
-                             low_memory=False)
+            # Read in the columns searched
+            df = self._LoadCSV(sf, ['SourceFile'] + list(fields))
 
             # Loop through fields of interest:
             for jj in fields:
                 # Find column name from shorthand
                 xmp_col = [col for col in df.columns \
                            if jj == col.split(':')[-1]]
-                # Skip if field not in csv
+                # Skip if field not in csv, or empty in this csv
                 if len(xmp_col) < 1:
                     continue
                 else:
                     xmp_col = xmp_col[0]
+                if df[xmp_col].isnull().all():
+                    continue
 
                 if len(searchterms) == 1:
                     # Check for special wildcards around edges of term
@@ -279,15 +1079,19 @@ class Archive():
 
     def GrabData(self, sourcefiles=None, fields=None,
                  startdate=None, enddate=None,
-                 withPath=False):
+                 withPath=False, subfolders=None):
         """
         Function will grab any metadata of interest for the
         specified list of files and return a pandas DataFrame.
-        By default, returns all metadata in archive.
+        By default, returns all metadata in archive. Only the
+        requested fields are read, and subfolders outside of
+        the date bounds are skipped.
         
         Inputs:
             sourcefiles (list) : Files for which we want metadata.
                     Default is None, which will return everything.
+                    With backend='sqlite', names must be whole file
+                    names or full paths
             fields (list) : Metadata fields to return in DataFrame.
                     If None specified, returns default options.
             startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
@@ -296,80 +1100,638 @@ class Archive():
                     to return data.
             withPath (bool) : Returns just filenames in SourceFile
                     if False, returns full path if true
+            subfolders (list) : Subfolders from which to return
+                    data, default is all
         Outputs:
             data (pandas DataFrame) : Dataframe of requested metadata.
         """
-        # Load all metadata into dataframe
-        frame = []
-        for sf in self.subfolders:
-            # Recreate csv name from dir structure
-            csvname = os.path.join(self.csvPath,
-                                   sf.replace(os.sep,'__') + '.csv')
-            # Read in csv
-            df = pd.read_csv(csvname, encoding = "ISO-8859-1",
-                             low_memory=False)
-            frame.append(df)
-        df = pd.concat(frame)
+        if self.backend == 'sqlite':
+            # Filter files and dates on the indexed columns
+            self.UpdateDatabase()
+            df = sql.GrabData(self.dbname,
+                              self.fields_short if fields is None else fields,
+                              sourcefiles, subfolders, startdate, enddate)
+            if not withPath and ('SourceFile' in df.columns):
+                df['SourceFile'] = [s.split(os.sep)[-1] \
+                                    for s in df['SourceFile']]
+            return df
 
-        # Filter for the requested files, if specified
+        # Filter each subfolder as it is read, then combine
+        if fields is None:
+            fields = self.fields_short
+        frames = list(self.IterData(sourcefiles, fields, startdate, enddate,
+                                    withPath, subfolders=subfolders))
+        if len(frames) == 0:
+            return pd.DataFrame(columns=fields)
+        df = pd.concat(frames)
+        # Grab only fields of interest in order
+        df = df[[i for i in fields if i in df.columns]]
+        df.reset_index(drop=True, inplace=True)
+        return df
+
+
+    def IterData(self, sourcefiles=None, fields=None,
+                 startdate=None, enddate=None,
+                 withPath=False, chunksize=None, subfolders=None):
+        """
+        Same as GrabData(), but yields the metadata one subfolder
+        (or chunksize rows) at a time, so that memory stays bounded
+        whatever the size of the archive, e.g.
+            for df in archive.IterData(fields=['CreateDate']):
+                ...
+
+        Inputs:
+            sourcefiles (list) : Files for which we want metadata.
+                    Default is None, which will return everything.
+            fields (list) : Metadata fields to return in DataFrame.
+                    If None specified, returns default options.
+            startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
+                    to return data.
+            enddate (str) : Datetime (YYYYmmdd_HHMMSS) before which
+                    to return data.
+            withPath (bool) : Returns just filenames in SourceFile
+                    if False, returns full path if true
+            chunksize (int) : Largest number of rows read at once,
+                    default is a whole subfolder. Ignored with
+                    backend='sqlite'
+            subfolders (list) : Subfolders from which to return
+                    data, default is all
+        Outputs:
+            data (pandas DataFrame) : Requested metadata of one chunk,
+                    possibly empty
+        """
+        if fields is None:
+            fields = self.fields_short
+        if subfolders is None:
+            subfolders = self.subfolders
+        if self.backend == 'sqlite':
+            self.UpdateDatabase()
+            for sf in subfolders:
+                df = sql.GrabData(self.dbname, fields, sourcefiles, [sf],
+                                  startdate, enddate)
+                yield self._FilterData(df, None, None, withPath)
+            return
+
+        # Prepare filters once for all chunks
         if sourcefiles is not None:
             sourcefiles = '|'.join(map(re.escape, sourcefiles))
-            df = df[df['SourceFile'].str.contains(sourcefiles)]
+        if startdate is not None:
+            startdate = pd.to_datetime(startdate, format="%Y%m%d_%H%M%S")
+        if enddate is not None:
+            enddate = pd.to_datetime(enddate, format="%Y%m%d_%H%M%S")
+        bounded = startdate is not None or enddate is not None
+        # Read only the columns needed to filter and return
+        columns = ['SourceFile'] + list(fields) \
+                  + (['CreateDate'] if bounded else []) \
+                  + (['Duration'] if 'DurationSeconds' in fields else [])
+        ranges = self._DateRanges()
+        changed = False
+        for sf in subfolders:
+            csvname = os.path.join(self.csvPath,
+                                   sf.replace(os.sep,'__') + '.csv')
+            mtime = os.stat(csvname).st_mtime_ns
+            known = ranges.get(sf)
+            if bounded and known is not None and known[0] == mtime:
+                # Skip subfolders with no dates within bounds
+                first, last = known[1:]
+                if first is None \
+                   or (startdate is not None and pd.Timestamp(last) < startdate) \
+                   or (enddate is not None and pd.Timestamp(first) > enddate):
+                    continue
+
+            if chunksize is None:
+                chunks = [self._LoadCSV(sf, columns)]
+            else:
+                chunks = prof.ReadCSV(csvname, chunksize=chunksize,
+                                      **self._ReadOptions(csvname, columns))
+            lows, highs = [], []
+            for df in chunks:
+                df = df.set_axis([col.split(':')[-1] for col in df.columns],
+                                 axis=1)
+                # Filter for the requested files, if specified
+                if sourcefiles is not None:
+                    df = df[df['SourceFile'].str.contains(sourcefiles)]
+                df = _ParseDurations(_ParseDates(df))
+                if sourcefiles is None and 'CreateDate' in df.columns:
+                    lows.append(df['CreateDate'].min())
+                    highs.append(df['CreateDate'].max())
+                yield self._FilterData(df, startdate, enddate, withPath,
+                                       fields)
+            if len(lows) > 0:
+                dates = [pd.Series(lows).min(), pd.Series(highs).max()]
+                entry = [mtime] + [None if pd.isnull(d) else d.isoformat() \
+                                   for d in dates]
+                if entry != known:
+                    with self._lock:
+                        ranges[sf] = entry
+                    changed = True
+        if changed:
+            self._SaveDateRanges()
+
 
-        # Make sure dates are recognizable as datetime
-        df['CreateDate'] = pd.to_datetime(
-                               df['CreateDate'].str.split('.',1).str[0],
-                               format='%Y:%m:%d %H:%M:%S')
+    def _FilterData(self, df, startdate, enddate, withPath, fields=None):
+        """
+        Filter one table of shorthand columns for IterData(). Tables
+        may be cached, so they are never modified in place
+        """
         # If filtering by date bounds:
         if startdate is not None:
-            startdate = pd.to_datetime(startdate, format="%Y%m%d_%H%M%S")
             df = df[df['CreateDate'] >= startdate]
         if enddate is not None:
-            enddate = pd.to_datetime(enddate, format="%Y%m%d_%H%M%S")
             df = df[df['CreateDate'] <= enddate]
 
-        # Filter by requested fields
-        if fields is None:
-            fields = self.fields_short
-        # Shorten column names to shorthand
-        df.columns = [col.split(':')[-1] for col in df.columns]
-        # Fields of interest that exist in CSV:
-        avail_fields_sh = [i for i in fields \
-                           if i in df.columns]
-        # Grab only fields of interest in order
-        df = df[avail_fields_sh]
-        
+        # Fields of interest that exist in CSV, in order
+        if fields is not None:
+            df = df[[i for i in fields if i in df.columns]]
+
         # Remove path from SourceFile if necessary
         if not withPath and ('SourceFile' in df.columns):
-            SourceFiles = df['SourceFile'].tolist()
-            SourceFiles = [s.split(os.sep)[-1] \
-                           for s in SourceFiles]
-            df['SourceFile'] = SourceFiles
+            df = df.assign(SourceFile=[s.split(os.sep)[-1] \
+                                       for s in df['SourceFile']])
+        return df
+
 
+    def Query(self, conditions, fields=None, startdate=None, enddate=None,
+              withPath=False):
+        """
+        Filter the metadata with conditions over the shorthand fields,
+        all of which must hold, e.g.
+            [('Creator', '==', 'Kyle Wright'),
+             ('CreateDate', '<', '20000101_000000'),
+             ('Subject', 'contains', 'beach')]
+
+        Inputs:
+            conditions (list) : (field, op, value) conditions, with op
+                    one of ==, !=, <, <=, >, >=, in, not in, contains,
+                    isnull, notnull (value is ignored for the last two).
+                    Values compared to CreateDate are datetimes or
+                    YYYYmmdd_HHMMSS strings
+            fields (list) : Metadata fields to return, default options
+                    if None
+            startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
+                    to return data.
+            enddate (str) : Datetime (YYYYmmdd_HHMMSS) before which
+                    to return data.
+            withPath (bool) : Returns just filenames in SourceFile
+                    if False, returns full path if true
+        Outputs:
+            data (pandas DataFrame) : Rows of the metadata matching
+                    all conditions
+        """
+        conditions = [tuple(c) for c in conditions]
+        for c in conditions:
+            if len(c) not in [2, 3] or c[1] not in _OPS:
+                raise ValueError('Invalid condition %r, expected '
+                                 '(field, op, value) with op in %s'
+                                 % (c, list(_OPS)))
+        if fields is None:
+            fields = self.fields_short
+        # Read the fields used by the conditions too
+        needed = list(fields) + [c[0] for c in conditions \
+                                 if c[0] not in fields]
+        df = self.GrabData(None, needed, startdate, enddate, withPath)
+        mask = np.ones(len(df), dtype=bool)
+        for c in conditions:
+            field, op = c[0], c[1]
+            value = c[2] if len(c) > 2 else None
+            if field not in df.columns:
+                mask[:] = op == 'isnull'
+                continue
+            column = df[field]
+            if pd.api.types.is_datetime64_any_dtype(column) \
+               and isinstance(value, str):
+                value = pd.to_datetime(value, format="%Y%m%d_%H%M%S")
+            mask &= np.asarray(_OPS[op](column, value), dtype=bool)
+        df = df[mask][[f for f in fields if f in df.columns]]
         df.reset_index(drop=True, inplace=True)
         return df
 
 
+    def CountUnique(self, field, delimiter=', ', chunksize=None):
+        """
+        Count unique entries of a field over the whole archive,
+        see tools.CountUnique(). Values of the field are tallied one
+        subfolder (or chunksize rows) at a time, so only distinct
+        values are kept in memory
+
+        Inputs:
+            field (str) : Metadata field (shorthand) to count
+            delimiter (str) : String delimiter used to
+                    separate entries in the field
+            chunksize (int) : Largest number of rows read at once,
+                    default is a whole subfolder
+        Outputs:
+            uq (pandas DataFrame) : All unique entries and their
+                    appearance counts, sorted by appearance
+        """
+        values = pd.Series(dtype=int)
+        for df in self.IterData(None, [field], chunksize=chunksize):
+            if field in df.columns:
+                values = values.add(df[field].dropna().astype(str)
+                                    .value_counts(), fill_value=0)
+        if len(values) == 0:
+            return pd.DataFrame(columns=['Entry', 'Count'])
+        uq = tools.CountUnique(pd.Series(values.index, dtype=str),
+                               delimiter=delimiter,
+                               weights=values.to_numpy())
+        return uq
+
+
+    def KeywordIndex(self, field, delimiter=', ', withPath=False,
+                     chunksize=None):
+        """
+        Encode a keyword field of the whole archive into integer IDs,
+        one subfolder (or chunksize rows) at a time, for fast searches,
+        counts and co-occurrence, see tools_keywords.KeywordIndex
+
+        Inputs:
+            field (str) : Metadata field (shorthand), e.g. 'Subject'
+            delimiter (str) : String delimiter used to
+                    separate entries in the field
+            withPath (bool) : Names files by their full path if True
+            chunksize (int) : Largest number of rows read at once,
+                    default is a whole subfolder
+        Outputs:
+            index (tools_keywords.KeywordIndex) : Encoded field
+        """
+        indexes = []
+        for df in self.IterData(None, ['SourceFile', field],
+                                withPath=withPath, chunksize=chunksize):
+            if field not in df.columns:
+                df = df.assign(**{field: np.nan})
+            indexes.append(kw.KeywordIndex(df[field], delimiter,
+                                           df['SourceFile']))
+        return kw.KeywordIndex.Concat(indexes, delimiter)
+
+
+    def KeywordTree(self, field='Subject', separator='|', delimiter=', '):
+        """
+        Index the hierarchical keywords of a field, e.g.
+        'Places|USA|Texas|Austin', into a prefix tree with the files
+        and rolled-up counts of each node, see
+        tools_keywords.KeywordTree. For example, everything under
+        Texas is tree.Files('Places|USA|Texas'), and the top places
+        are tree.Children('Places'), ready for BarChart()
+
+        Inputs:
+            field (str) : Metadata field (shorthand) to index
+            separator (str) : Separator between levels of a keyword
+            delimiter (str) : String delimiter used to
+                    separate keywords in the field
+        Outputs:
+            tree (tools_keywords.KeywordTree) : Keyword hierarchy
+        """
+        tree = kw.KeywordTree(self.KeywordIndex(field, delimiter),
+                              separator)
+        return tree
+
+
+    def Count(self, field=None, startdate=None, enddate=None,
+              chunksize=None):
+        """
+        Count files, either in total or by value of a field, reading
+        one subfolder (or chunksize rows) at a time
+
+        Inputs:
+            field (str) : Metadata field (shorthand) whose values are
+                    counted, default is to count all files
+            startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
+                    to count files.
+            enddate (str) : Datetime (YYYYmmdd_HHMMSS) before which
+                    to count files.
+            chunksize (int) : Largest number of rows read at once,
+                    default is a whole subfolder
+        Outputs:
+            count (int or pandas Series) : Number of files, or
+                    number of files by value of field, largest first
+        """
+        fields = ['SourceFile'] if field is None else [field]
+        if field is None:
+            return sum(len(df) for df in self.IterData(None, fields,
+                                                       startdate, enddate,
+                                                       chunksize=chunksize))
+        count = pd.Series(dtype=int)
+        for df in self.IterData(None, fields, startdate, enddate,
+                                chunksize=chunksize):
+            if field in df.columns:
+                count = count.add(df[field].value_counts(), fill_value=0)
+        count = count.astype(int).sort_values(ascending=False, kind='stable')
+        count.name = 'Count'
+        return count
+
+
+    def DateHistogram(self, freq='Y', startdate=None, enddate=None,
+                      chunksize=None):
+        """
+        Number of files created in each period, reading one subfolder
+        (or chunksize rows) at a time
+
+        Inputs:
+            freq (str) : pandas period frequency, e.g. 'Y' for years,
+                    'M' for months, 'W' for weeks, 'D' for days
+            startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
+                    to count files.
+            enddate (str) : Datetime (YYYYmmdd_HHMMSS) before which
+                    to count files.
+            chunksize (int) : Largest number of rows read at once,
+                    default is a whole subfolder
+        Outputs:
+            hist (pandas Series) : Number of files in each period,
+                    including empty periods, indexed by period
+        """
+        hist = pd.Series(dtype=int)
+        for df in self.IterData(None, ['CreateDate'], startdate, enddate,
+                                chunksize=chunksize):
+            dates = df['CreateDate'].dropna()
+            if len(dates) > 0:
+                counts = dates.dt.to_period(freq).value_counts()
+                hist = hist.add(counts, fill_value=0)
+        if len(hist) > 0:
+            hist = hist.reindex(pd.period_range(hist.index.min(),
+                                                hist.index.max(),
+                                                freq=freq), fill_value=0)
+        hist = hist.astype(int)
+        hist.name = 'Count'
+        return hist
+
+
+    def TotalDuration(self, startdate=None, enddate=None, chunksize=None):
+        """
+        Total duration of all video files, see tools.TotalDuration(),
+        reading one subfolder (or chunksize rows) at a time
+
+        Inputs:
+            startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
+                    to add up durations.
+            enddate (str) : Datetime (YYYYmmdd_HHMMSS) before which
+                    to add up durations.
+            chunksize (int) : Largest number of rows read at once,
+                    default is a whole subfolder
+        Outputs:
+            dur (str) : Total duration of the video files
+        """
+        total = 0.0
+        for df in self.IterData(None, ['DurationSeconds'], startdate,
+                                enddate, chunksize=chunksize):
+            if 'DurationSeconds' in df.columns:
+                total += df['DurationSeconds'].sum()
+        dur = str(pd.Timedelta(seconds=round(total, 6)))
+        return dur
+
+
+    def DurationStats(self, by='year', percentiles=[0.5, 0.9],
+                      delimiter=', ', startdate=None, enddate=None):
+        """
+        Statistics of the durations of video files by group, computed
+        in one groupby pass over the parsed durations
+
+        Durations are parsed from the Duration strings as each table
+        is read, since the csv files only hold the exiftool output.
+        With cache=True this happens once per table, otherwise on
+        every call, at about the cost of reading the Duration column
+
+        Inputs:
+            by (str) : Groups, either 'year', 'month', 'subfolder',
+                    or a metadata field (shorthand) such as 'Subject',
+                    in which case each keyword is a group
+            percentiles (list) : Percentiles to compute, between 0 and 1
+            delimiter (str) : String delimiter used to
+                    separate keywords in the field
+            startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
+                    to include files.
+            enddate (str) : Datetime (YYYYmmdd_HHMMSS) before which
+                    to include files.
+        Outputs:
+            stats (pandas DataFrame) : Files, Total, Mean and one
+                    column per percentile (e.g. P50, P90), with
+                    durations in seconds, indexed by group
+        """
+        fields = ['SourceFile', 'CreateDate', 'DurationSeconds']
+        if by not in ['year', 'month', 'subfolder']:
+            fields.append(by)
+        frames = []
+        # Keep only the group and duration of video files
+        for df in self.IterData(None, fields, startdate, enddate,
+                                withPath=True):
+            if 'DurationSeconds' not in df.columns:
+                continue
+            df = df[df['DurationSeconds'].notnull()]
+            if by == 'year':
+                group = df['CreateDate'].dt.year
+            elif by == 'month':
+                group = df['CreateDate'].dt.to_period('M')
+            elif by == 'subfolder':
+                group = [os.path.relpath(os.path.dirname(f),
+                                         self.CollectionPath) \
+                         for f in df['SourceFile']]
+            elif by in df.columns:
+                group = df[by].astype('string').str.split(delimiter)
+            else:
+                continue
+            frames.append(pd.DataFrame({'Group': group,
+                                        'Seconds': df['DurationSeconds']}))
+
+        columns = ['Files', 'Total', 'Mean'] \
+                  + ['P%g' % (100*p) for p in percentiles]
+        if len(frames) == 0:
+            return pd.DataFrame(columns=columns)
+        data = pd.concat(frames, ignore_index=True)
+        if by not in ['year', 'month', 'subfolder']:
+            data = data.explode('Group')
+        data = data[data['Group'].notnull() & (data['Group'] != '')]
+
+        grouped = data.groupby('Group')['Seconds']
+        stats = grouped.agg(['count', 'sum', 'mean'])
+        quantiles = grouped.quantile(percentiles).unstack()
+        stats = pd.concat([stats, quantiles], axis=1)
+        stats.columns = columns
+        stats.index.name = by
+        return stats
+
+
+    def UpdateFeatures(self, workers=None, cluster=False,
+                       n_clusters=None):
+        """
+        Compute colour/texture feature vectors for every image in
+        the metadatabase, used by FindSimilar(). Vectors are stored
+        as a float16 array in 'ImageFeatures.npy' in csvPath, one row
+        per row of GrabData(), alongside an 'ImageFeatures.csv' index.
+        Vectors of unchanged files are reused from the previous call.
+        Requires Pillow
+
+        Inputs:
+            workers (int) : Number of worker processes used for
+                    feature extraction, default is the number of CPUs
+            cluster (bool) : If True, also build a coarse clustering
+                    index to speed up queries on large archives
+            n_clusters (int) : Number of clusters, see
+                    tools_similarity.ClusterFeatures()
+        Outputs:
+            Saves ImageFeatures.npy and ImageFeatures.csv in csvPath
+        """
+        # Check if pillow is available
+        try:
+            from PIL import Image
+        except ImportError:
+            print("Function unavailable, requires installation of Pillow")
+            print("Perform full setup for auxilary packages")
+            return
+        npyname = os.path.join(self.csvPath, 'ImageFeatures.npy')
+        csvname = os.path.join(self.csvPath, 'ImageFeatures.csv')
+
+        # Rows of the metadatabase, and their modification times
+        df = self.GrabData(fields=['SourceFile'], withPath=True)
+        mtimes = []
+        for name in df['SourceFile']:
+            try:
+                mtimes.append(os.stat(name).st_mtime_ns)
+            except OSError:
+                mtimes.append(-1)
+        df['ModifyTime'] = mtimes
+        df['Valid'] = False
+        # Filled in place on disk, then moved over the previous file
+        tmpname = npyname + '.tmp.npy'
+        features = sim.CreateFeatures(tmpname, len(df))
+
+        # Reuse vectors for unchanged files
+        todo = np.ones(len(df), dtype=bool)
+        if os.path.exists(npyname) and os.path.exists(csvname):
+            old = prof.ReadCSV(csvname, encoding="ISO-8859-1")
+            oldfeat = sim.LoadFeatures(npyname)
+            oldrow = pd.Series(np.arange(len(old)),
+                               index=pd.MultiIndex.from_frame(
+                                   old[['SourceFile', 'ModifyTime']]))
+            oldrow = oldrow[~oldrow.index.duplicated()]
+            match = oldrow.reindex(pd.MultiIndex.from_frame(
+                        df[['SourceFile', 'ModifyTime']])).to_numpy()
+            found = ~np.isnan(match)
+            rows = match[found].astype(np.int64)
+            dest = np.flatnonzero(found)
+            for start in range(0, len(dest), 65536):
+                features[dest[start:start+65536]] = \
+                    oldfeat[rows[start:start+65536]]
+            df.loc[found, 'Valid'] = old['Valid'].to_numpy()[rows]
+            todo = ~found
+            del oldfeat
+
+        # Extract features of new or modified images
+        ext = df['SourceFile'].str.rsplit('.', n=1).str[-1].str.lower()
+        todo &= ext.isin(sim.IMAGE_TYPES).to_numpy()
+        features, valid = sim.ExtractFeatures(
+                              df.loc[todo, 'SourceFile'].tolist(), workers,
+                              out=features, rows=np.flatnonzero(todo))
+        df.loc[todo, 'Valid'] = valid
+
+        # Optionally build the coarse clustering index
+        if cluster and df['Valid'].any():
+            centroids, labels = sim.ClusterFeatures(features, n_clusters)
+            labels[~df['Valid'].to_numpy()] = -1
+            df['Cluster'] = labels
+            np.save(os.path.join(self.csvPath, 'ImageClusters.npy'),
+                    centroids)
+
+        features.flush()
+        del features
+        os.replace(tmpname, npyname)
+        df.to_csv(csvname, index=False, encoding="ISO-8859-1")
+        if self.verbose:
+            print('Updated features for %d of %d images' \
+                  % (todo.sum(), df['Valid'].sum()))
+        return
+
+
+    def FindSimilar(self, file, k=10, n_probe=None, withPath=False):
+        """
+        Find the images in the collection that look most like a
+        given image, based on the feature vectors saved by
+        UpdateFeatures(). Requires Pillow for images outside
+        the collection.
+
+        Inputs:
+            file (str) : Path to the query image, which does not
+                    need to be part of the collection
+            k (int) : Number of matches to return
+            n_probe (int) : If a clustering index exists, number of
+                    nearest clusters in which to look. Default (None)
+                    scores every image in the collection
+            withPath (bool) : Returns just filenames if False,
+                    returns full path if true
+        Outputs:
+            matches (pandas DataFrame) : DataFrame with columns
+                    SourceFile and Similarity (1 is identical)
+        """
+        npyname = os.path.join(self.csvPath, 'ImageFeatures.npy')
+        csvname = os.path.join(self.csvPath, 'ImageFeatures.csv')
+        index = prof.ReadCSV(csvname, encoding="ISO-8859-1")
+        features = sim.LoadFeatures(npyname)
+
+        # Use the stored vector if the image is in the collection
+        itself = (index['SourceFile'] == file).to_numpy()
+        row = np.flatnonzero(itself & index['Valid'].to_numpy())
+        if len(row) > 0:
+            query = np.asarray(features[row[0]], dtype=np.float32)
+        else:
+            query = sim.ImageFeatures(file)
+            if query is None:
+                raise ValueError("Can't read image " + file)
+
+        # Candidate rows, from nearby clusters or everything valid
+        clustername = os.path.join(self.csvPath, 'ImageClusters.npy')
+        if (n_probe is not None) and ('Cluster' in index.columns) \
+           and os.path.exists(clustername):
+            centroids = np.load(clustername)
+            near = np.argsort(-(centroids @ query))[:n_probe]
+            rows = np.flatnonzero(index['Cluster'].isin(near).to_numpy())
+        else:
+            rows = np.flatnonzero(index['Valid'].to_numpy())
+        # The query image is not a match of itself
+        rows = rows[~itself[rows]]
+
+        best, scores = sim.TopK(features, query, k, rows)
+        matches = pd.DataFrame({'SourceFile': index['SourceFile'].to_numpy()[best],
+                                'Similarity': scores})
+        if not withPath:
+            matches['SourceFile'] = [s.split(os.sep)[-1] \
+                                     for s in matches['SourceFile']]
+        return matches
+
+
     def DownloadCoverage(self, delimiter=', ',
-                         overwrite_existing=False):
+                         overwrite_existing=False,
+                         incremental=False, subfolders=None):
         """
         ~~~GEOSPATIAL FUNCTIONS STILL IN BETA~~~
         Function will save a 'LocationCoords.csv' file in the
         metadata repository based on the Coverage field for use
         with the geospatial plotting routines.
+
+        With incremental=True, only the Coverage entries of subfolders
+        whose csv changed since the last call are counted again (counts
+        per subfolder are kept in 'CoverageCounts.csv', and replace the
+        previous counts of those subfolders). Appearances are updated,
+        new locations are appended, locations no longer in any file are
+        dropped, and the coordinates of existing locations are kept, so
+        geocoding never starts over.
         
         Inputs:
             delimiter (str) : String delimiter used to
                 separate entries in the Coverage column
             overwrite_existing (bool) : Flag to enable overwriting
                 an existing coverage file, which defaults to false
+            incremental (bool) : Flag to update an existing coverage
+                file in place rather than rebuild it
+            subfolders (list) : In incremental mode, subfolders to
+                count again regardless of their csv modification
+                time, default is only those which changed
         Outputs:
             Saves a LocationCoords.csv file in the metadata folder
                 containing the output of a call to tools.CountUnique()
         """
         csvname = os.path.join(self.csvPath, 'LocationCoords.csv')
-        
-        if overwrite_existing or not os.path.exists(csvname):
+
+        if incremental:
+            self._UpdateCoverage(delimiter, subfolders)
+        elif overwrite_existing or not os.path.exists(csvname):
             df = self.GrabData(None, ['Coverage'])
             df = tools.CountUnique(df['Coverage'],
                                    delimiter=delimiter)
@@ -382,5 +1744,285 @@ class Archive():
             df.to_csv(csvname, index=False, encoding="ISO-8859-1")
         else:
             print('Coverage CSV already exists. \nTo overwrite'+ \
-                  ' existing file, set overwrite_existing=True')
-        return
\ No newline at end of file
+                  ' existing file, set overwrite_existing=True,'+ \
+                  ' or update it with incremental=True')
+        return
+
+
+    def _UpdateCoverage(self, delimiter, subfolders=None):
+        """
+        Incremental version of DownloadCoverage(), see its docstring
+        """
+        csvname = os.path.join(self.csvPath, 'LocationCoords.csv')
+        countname = os.path.join(self.csvPath, 'CoverageCounts.csv')
+
+        # Modification time of each subfolder csv
+        mtimes = {}
+        for sf in self.subfolders:
+            name = os.path.join(self.csvPath,
+                                sf.replace(os.sep,'__') + '.csv')
+            mtimes[sf] = os.stat(name).st_mtime_ns
+
+        # Previous counts, dropping subfolders which no longer exist
+        if os.path.exists(countname):
+            counts = prof.ReadCSV(countname, encoding="ISO-8859-1",
+                                 dtype={'Subfolder': str, 'Location': str},
+                                 keep_default_na=False)
+            counts = counts[counts['Subfolder'].isin(mtimes.keys())]
+        else:
+            counts = pd.DataFrame(columns=['Subfolder', 'Location',
+                                           'Count', 'CsvModifyTime'])
+        known = counts.groupby('Subfolder')['CsvModifyTime'].first()
+        changed = [sf for sf in self.subfolders \
+                   if known.get(sf) != mtimes[sf]]
+        if subfolders is not None:
+            if not isinstance(subfolders, list):
+                subfolders = [subfolders]
+            changed = list(dict.fromkeys(changed + subfolders))
+
+        # Count entries of the changed subfolders
+        frames = [counts[~counts['Subfolder'].isin(changed)]]
+        for sf in changed:
+            name = os.path.join(self.csvPath,
+                                sf.replace(os.sep,'__') + '.csv')
+            df = prof.ReadCSV(name, encoding="ISO-8859-1", dtype=str,
+                             usecols=lambda c: c.split(':')[-1] \
+                                               == 'Coverage')
+            if df.shape[1] > 0:
+                entries = df.iloc[:, 0].dropna().str.split(delimiter)
+                entries = entries.explode()
+                entries = entries[entries.str.len() > 0].value_counts()
+            else:
+                entries = pd.Series(dtype=int)
+            # Empty entry marks the subfolder as counted
+            entries[''] = 0
+            frames.append(pd.DataFrame({'Subfolder': sf,
+                                        'Location': entries.index,
+                                        'Count': entries.values,
+                                        'CsvModifyTime': mtimes[sf]}))
+        counts = pd.concat(frames, ignore_index=True)
+        counts.to_csv(countname, index=False, encoding="ISO-8859-1")
+
+        # Merge totals into existing coordinates
+        totals = counts[counts['Location'] != '']
+        totals = totals.groupby('Location')['Count'].sum()
+        if os.path.exists(csvname):
+            coords = prof.ReadCSV(csvname, encoding="ISO-8859-1",
+                                 low_memory=False)
+        else:
+            coords = pd.DataFrame(columns=['Location', 'Appearances',
+                                           'Latitude', 'Longitude'])
+        new = totals.index.difference(coords['Location'])
+        coords = pd.concat([coords, pd.DataFrame({'Location': new})],
+                           ignore_index=True)
+        coords['Appearances'] = coords['Location'].map(totals) \
+                                .fillna(0).astype(int).values
+        # Locations removed from every file are dropped, as in a rebuild
+        gone = coords['Appearances'] == 0
+        coords = coords[~gone]
+        coords = coords.sort_values('Appearances', ascending=False,
+                                    kind='stable')
+        coords.to_csv(csvname, index=False, encoding="ISO-8859-1")
+        if self.verbose:
+            print('Counted coverage in %d subfolders, ' % len(changed) \
+                  + 'added %d new locations, ' % len(new) \
+                  + 'removed %d' % gone.sum())
+        return
+
+
+    def SpatialIndex(self, delimiter=', ', cell_deg=0.5):
+        """
+        ~~~GEOSPATIAL FUNCTIONS STILL IN BETA~~~
+        Build a spatial index over the files in the collection, by
+        joining their Coverage entries to the coordinates in
+        LocationCoords.csv. Requires that DownloadCoverage() and
+        tools.Coverage2Coords() have been called prior.
+
+        Inputs:
+            delimiter (str) : String delimiter used to
+                separate entries in the Coverage column
+            cell_deg (float) : Size of the grid cells of the
+                index, in degrees
+        Outputs:
+            index (tools_geo.SpatialIndex) : Spatial index, with
+                Radius(), BoundingBox() and Density() queries
+        """
+        csvname = os.path.join(self.csvPath, 'LocationCoords.csv')
+        coords = prof.ReadCSV(csvname, encoding="ISO-8859-1",
+                             low_memory=False)
+        data = self.GrabData(None, ['SourceFile', 'Coverage'],
+                             withPath=True)
+        located = geo.LocateFiles(data, coords, delimiter)
+        index = geo.SpatialIndex(located, cell_deg)
+        return index
+
+
+# Operators allowed in Archive.Query() conditions
+_OPS = {'==': lambda c, v: (c == v).fillna(False),
+        '!=': lambda c, v: (c != v).fillna(True),
+        '<': lambda c, v: (c < v).fillna(False),
+        '<=': lambda c, v: (c <= v).fillna(False),
+        '>': lambda c, v: (c > v).fillna(False),
+        '>=': lambda c, v: (c >= v).fillna(False),
+        'in': lambda c, v: c.isin(list(v)),
+        'not in': lambda c, v: ~c.isin(list(v)),
+        'contains': lambda c, v: c.astype('string').str.contains(
+                                     str(v), regex=False).fillna(False),
+        'isnull': lambda c, v: c.isnull(),
+        'notnull': lambda c, v: c.notnull()}
+
+
+def _Subfolders(archive, subfolders):
+    """Subfolders of archive among subfolders, all if None"""
+    if subfolders is None:
+        return None
+    return [sf for sf in subfolders if sf in archive.subfolders]
+
+
+def _Columns(columns, fields):
+    """Stored columns whose shorthand is in fields, in stored order"""
+    fields = set(fields)
+    return [col for col in columns if col.split(':')[-1] in fields]
+
+
+def _ParseDates(df):
+    """Make sure CreateDate is recognizable as datetime"""
+    if 'CreateDate' in df.columns \
+       and not pd.api.types.is_datetime64_any_dtype(df['CreateDate']):
+        # Drop sub-seconds and time zone, and use dashes in the date,
+        # which pandas parses several times faster than colons
+        dates = df['CreateDate'].astype('string')
+        dates = dates.str.slice(0, 10).str.replace(':', '-') \
+                + dates.str.slice(10, 19)
+        df = df.assign(CreateDate=pd.to_datetime(dates,
+                                                 format='%Y-%m-%d %H:%M:%S'))
+    return df
+
+
+def _ParseDurations(df):
+    """Add Duration in seconds, as the float column DurationSeconds"""
+    if 'Duration' in df.columns and 'DurationSeconds' not in df.columns:
+        df = df.assign(DurationSeconds=tools.ParseDuration(df['Duration']))
+    return df
+
+
+def _SumCounts(counts):
+    """Add up the counts of several CountUnique() tables"""
+    if len(counts) == 0:
+        return pd.DataFrame(columns=['Entry', 'Count'])
+    counts = pd.concat(counts, ignore_index=True)
+    counts['Count'] = counts['Count'].astype(int)
+    uq = counts.groupby('Entry', sort=False)['Count'].sum()
+    uq = uq.reset_index().sort_values('Count', ascending=False,
+                                      kind='stable')
+    uq.reset_index(drop=True, inplace=True)
+    return uq
+
+
+@prof.ProfileMethods
+class FederatedArchive():
+    """
+    Combined view of several collections, each its own Archive.
+    Searches are fanned out to every archive in parallel and the
+    results merged, so it can be used in place of an Archive in
+    the plotting routines.
+    """
+    def __init__(self, archives, names=None, workers=None):
+        """
+        Inputs:
+            archives (list) : Archive instances to combine
+            names (list) : Name of each archive, used to label the
+                    output of GrabData(). Default is the name of each
+                    CollectionPath
+            workers (int) : Number of threads, default is one per archive
+        """
+        self.archives = list(archives)
+        if names is None:
+            names = [os.path.basename(os.path.normpath(a.CollectionPath)) \
+                     for a in self.archives]
+        self.names = list(names)
+        self.workers = len(self.archives) if workers is None else workers
+        self.verbose = any(a.verbose for a in self.archives)
+
+
+    @property
+    def fields_short(self):
+        """Union of the fields of interest of all archives"""
+        fields = []
+        for a in self.archives:
+            fields.extend(a.fields_short)
+        return list(dict.fromkeys(fields))
+
+
+    def _Map(self, func):
+        """Call func(archive) for every archive in parallel"""
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as pool:
+            results = list(pool.map(func, self.archives))
+        return results
+
+
+    def FindSource(self, searchterms, fields=None,
+                   subfolders=None, include_all=False,
+                   withPath=False):
+        """
+        Search every archive, see Archive.FindSource()
+
+        Inputs:
+            subfolders (list) : Subfolders in which to search, in
+                    any of the archives, default is all
+        Outputs:
+            FileNames (list) : Sorted union of the file names
+                    found in all archives
+        """
+        results = self._Map(lambda a: a.FindSource(searchterms, fields,
+                                                   _Subfolders(a, subfolders),
+                                                   include_all, withPath))
+        FileNames = []
+        for names in results:
+            FileNames.extend(names)
+        FileNames = sorted(dict.fromkeys(FileNames))
+        return FileNames
+
+
+    def GrabData(self, sourcefiles=None, fields=None,
+                 startdate=None, enddate=None,
+                 withPath=False, subfolders=None, label=False):
+        """
+        Grab metadata from every archive, see Archive.GrabData()
+
+        Inputs:
+            subfolders (list) : Subfolders to read, in any of the
+                    archives, default is all
+            label (bool) : If True, add an 'Archive' column with the
+                    name of the archive each row comes from
+        Outputs:
+            data (pandas DataFrame) : Concatenated metadata of all
+                    archives, in the order of the archives
+        """
+        results = self._Map(lambda a: a.GrabData(sourcefiles, fields,
+                                                 startdate, enddate,
+                                                 withPath,
+                                                 _Subfolders(a, subfolders)))
+        if label:
+            for name, df in zip(self.names, results):
+                df['Archive'] = name
+        data = pd.concat(results, ignore_index=True)
+        return data
+
+
+    def CountUnique(self, field, delimiter=', '):
+        """
+        Count unique entries of a field across all archives, with
+        each archive counted in parallel by Archive.CountUnique()
+
+        Inputs:
+            field (str) : Metadata field (shorthand) to count
+            delimiter (str) : String delimiter used to
+                    separate entries in the field
+        Outputs:
+            uq (pandas DataFrame) : All unique entries and their
+                    total appearance counts, sorted by appearance
+        """
+        counts = self._Map(lambda a: a.CountUnique(field, delimiter))
+        return _SumCounts(counts)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Command-line interface, installed as 'metaviz'. Paths not given on
+the command line are taken from config.
+
+    metaviz serve [--port 8765] [--socket PATH] [--csvPath PATH]
+"""
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='metaviz',
+                                     description='MetaViz command-line tools')
+    commands = parser.add_subparsers(dest='command')
+
+    serve = commands.add_parser('serve', help='Serve the metadatabase '
+                                'to local clients, see MetaViz.server')
+    serve.add_argument('--host', default='127.0.0.1',
+                       help='Address to listen on (default: %(default)s)')
+    serve.add_argument('--port', type=int, default=8765,
+                       help='Port to listen on (default: %(default)s)')
+    serve.add_argument('--socket', default=None,
+                       help='Listen on this Unix socket instead of a port')
+    serve.add_argument('--CollectionPath', default=None,
+                       help='Path to the media collection')
+    serve.add_argument('--csvPath', default=None,
+                       help='Path of the metadatabase csv files')
+    serve.add_argument('--quiet', action='store_true',
+                       help='Do not log requests')
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        from .archive import Archive
+        from .server import Serve
+        archive = Archive(CollectionPath=args.CollectionPath,
+                          csvPath=args.csvPath, cache=True,
+                          verbose=not args.quiet)
+        Serve(archive, args.host, args.port, args.socket)
+    else:
+        parser.print_help()
+    return
+
+
+if __name__ == '__main__':
+    main()
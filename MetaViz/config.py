@@ -38,6 +38,18 @@ fields = ['SourceFile',
 # Set global verbose flag for printed function outputs
 verbose = True
 
+# Command used to call exiftool, e.g. a full path to the executable
+exiftool = 'exiftool'
+
+# Set global flag to record timings of Archive and plotting calls,
+# see MetaViz.profiling
+profile = False
+
+# Storage used for searches: 'csv' reads the csv files directly,
+# 'sqlite' mirrors them into an indexed database with full-text
+# search, see MetaViz.tools_sqlite
+backend = 'csv'
+
 #---------------------------------------------------------
 # Grabbing additional information
 #---------------------------------------------------------
@@ -45,12 +57,15 @@ if fields is not None:
     # Shorthand for metadata fields
     fields_short = [f.split(':')[-1] for f in fields]
 
-# Create CSV path if it doesn't exist yet
-if not os.path.exists(csvPath):
-    os.makedirs(csvPath)
-
-# Grab all sub-directory names, excluding any specified above
-subfolders = [x[0] for x in os.walk(CollectionPath)]
-for ex_fold in ExcludeFolders:
-    subfolders = [s for s in subfolders if ex_fold not in s]
-subfolders = [s.replace(CollectionPath,'')[1:] for s in subfolders[1:]]
+# Subfolders of the collection are discovered lazily, on first
+# access of config.subfolders or Archive.subfolders, so that
+# importing the package does not walk the whole collection
+def __getattr__(name):
+    if name == 'subfolders':
+        from .tools_folders import ScanFolders
+        global subfolders
+        subfolders = ScanFolders(CollectionPath, ExcludeFolders,
+                                 cachefile=os.path.join(csvPath,
+                                                        'Subfolders.json'))
+        return subfolders
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
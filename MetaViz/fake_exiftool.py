@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Stand-in for exiftool, for benchmarks and for trying out the package
+without real media files. It supports the subset of exiftool used by
+MetaViz:
+    exiftool -csv FOLDER                      (read, Archive.UpdateCSV)
+    exiftool -csv=FILE.csv FOLDER             (write, UpdateMetadata)
+    exiftool -TAG=VALUE ... FILES             (write, tools_exif)
+    exiftool -@ ARGFILE -common_args ...      (argfiles with -execute)
+    exiftool -d FMT "-filename<TAG" FOLDER    (rename, Dates2Names)
+    exiftool -d FMT "-testname<TAG" FOLDER    (dry-run rename)
+
+Metadata of the files in a folder are kept in a hidden sidecar file
+('.fake_exiftool.json'). Tags never written are derived from a hash
+of the file name, so the output is deterministic for a given tree.
+Uses only the standard library, and is run as a script so that each
+call is cheap, e.g. set in config:
+    exiftool = fake_exiftool.Command(latency=0.001)
+"""
+import os
+import sys
+import csv
+import json
+import html
+import time
+import zlib
+import datetime
+
+SIDECAR = '.fake_exiftool.json'
+KEYWORDS = ['family', 'beach', 'birthday', 'hiking', 'snow', 'dog',
+            'wedding', 'city', 'garden', 'concert', 'school', 'boat']
+PLACES = ['Austin', 'Paris', 'Denver', 'Kyoto', 'Lima', 'Oslo']
+VIDEO_TYPES = ['mp4', 'mov', 'm4v', 'avi']
+
+
+def Command(latency=0.0):
+    """
+    Command to set as config.exiftool to use this stand-in.
+
+    Inputs:
+        latency (float) : Seconds spent per file read or written,
+            to mimic the cost of parsing real media files
+    Outputs:
+        cmd (str) : Command calling this script
+    """
+    return '"%s" "%s" --latency %g' % (sys.executable,
+                                      os.path.abspath(__file__), latency)
+
+
+def DefaultTags(path):
+    """
+    Deterministic tags of a file that was never written to
+
+    Inputs:
+        path (str) : Path to the file
+    Outputs:
+        tags (dict) : Tag names and values
+    """
+    name = os.path.basename(path)
+    h = zlib.crc32(name.encode('utf-8'))
+    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    st = os.stat(path)
+    created = datetime.datetime(1990, 1, 1) \
+              + datetime.timedelta(seconds=h % (35*365*86400))
+    modified = datetime.datetime.fromtimestamp(st.st_mtime)
+    tags = {'FileName': name,
+            'Directory': os.path.dirname(path) or '.',
+            'FileSize': '%d bytes' % st.st_size,
+            'FileModifyDate': modified.strftime('%Y:%m:%d %H:%M:%S-00:00'),
+            'FileType': ext.upper(),
+            'CreateDate': created.strftime('%Y:%m:%d %H:%M:%S'),
+            'Subject': ', '.join(KEYWORDS[(h >> s) % len(KEYWORDS)] \
+                                 for s in range(0, 1 + h % 3)),
+            'Coverage': PLACES[(h >> 8) % len(PLACES)],
+            'Creator': 'Camera %d' % (h % 4)}
+    if ext in VIDEO_TYPES:
+        tags['Duration'] = '%.2f s' % ((h % 30000) / 100)
+    return tags
+
+
+class Folder():
+    """Tags of the files of one folder, backed by its sidecar file"""
+    def __init__(self, folder):
+        self.sidecar = os.path.join(folder, SIDECAR)
+        self.written = {}
+        if os.path.exists(self.sidecar):
+            with open(self.sidecar) as f:
+                self.written = json.load(f)
+        self.changed = False
+
+    def Tags(self, path):
+        tags = DefaultTags(path)
+        tags.update(self.written.get(os.path.basename(path), {}))
+        return tags
+
+    def Write(self, path, assignments):
+        tags = self.written.setdefault(os.path.basename(path), {})
+        for tag, value in assignments.items():
+            tags[tag] = value
+        self.changed = True
+
+    def Rename(self, old, new):
+        tags = self.written.pop(os.path.basename(old), None)
+        if tags is not None:
+            self.written[os.path.basename(new)] = tags
+        self.changed = True
+
+    def Save(self):
+        if self.changed:
+            with open(self.sidecar, 'w') as f:
+                json.dump(self.written, f)
+            self.changed = False
+
+
+def _Files(targets):
+    """Expand target files and folders (not recursive) into files"""
+    files = []
+    for t in targets:
+        if os.path.isdir(t):
+            for name in sorted(os.listdir(t)):
+                path = os.path.join(t, name)
+                if not name.startswith('.') and os.path.isfile(path):
+                    files.append(path)
+        elif os.path.isfile(t):
+            files.append(t)
+        else:
+            sys.stderr.write('Error: File not found - %s\n' % t)
+    return files
+
+
+def _Expand(args):
+    """Expand -@ argfiles, then split into -execute sections"""
+    expanded = []
+    i = 0
+    while i < len(args):
+        if args[i] == '-@':
+            with open(args[i+1], encoding='utf-8') as f:
+                expanded.extend(line.rstrip('\n') for line in f \
+                                if line.strip() and not line.startswith('#'))
+            i += 2
+        else:
+            expanded.append(args[i])
+            i += 1
+    common = []
+    if '-common_args' in expanded:
+        k = expanded.index('-common_args')
+        expanded, common = expanded[:k], expanded[k+1:]
+    sections, current = [], []
+    for a in expanded:
+        if a == '-execute':
+            sections.append(current + common)
+            current = []
+        else:
+            current.append(a)
+    sections.append(current + common)
+    return sections
+
+
+def _FormatName(date, fmt, path, taken):
+    """New file name from a -d format with exiftool's %e and %-c codes"""
+    name = date.strftime(fmt)
+    ext = path.rsplit('.', 1)[-1] if '.' in os.path.basename(path) else ''
+    folder = os.path.dirname(path)
+    n = 0
+    while True:
+        copy = '' if n == 0 else '-%d' % n
+        new = name.replace('%-c', copy).replace('%c', copy[1:]) \
+                  .replace('%e', ext)
+        new = os.path.join(folder, new)
+        if new == path or (new not in taken and not os.path.exists(new)):
+            return new
+        n += 1
+
+
+def Run(args, latency=0.0, out=sys.stdout):
+    """
+    Run one fake exiftool command line.
+
+    Inputs:
+        args (list) : Command-line arguments, as for exiftool
+        latency (float) : Seconds spent per file read or written
+        out (file) : Where to print the output
+    Outputs:
+        code (int) : Exit code, 0 on success
+    """
+    code = 0
+    for section in _Expand(args):
+        read_csv, write_csv, dt_fmt, rename = False, None, None, None
+        escaped, verbose = False, False
+        assignments, targets = {}, []
+        i = 0
+        while i < len(section):
+            a = section[i]
+            if a == '-csv':
+                read_csv = True
+            elif a.startswith('-csv='):
+                write_csv = a[5:]
+            elif a in ('-d', '-charset'):
+                if a == '-d':
+                    dt_fmt = section[i+1]
+                i += 1
+            elif a == '-E':
+                escaped = True
+            elif a == '-v':
+                verbose = True
+            elif a.lower().startswith(('-filename<', '-testname<')):
+                tag = a.split('<', 1)[1]
+                rename = (tag, a.lower().startswith('-testname'))
+            elif a.startswith('-') and '=' in a:
+                tag, value = a[1:].split('=', 1)
+                assignments[tag.split(':')[-1]] = value
+            elif a.startswith('-'):
+                pass
+            else:
+                targets.append(a)
+            i += 1
+        if escaped:
+            assignments = {k: html.unescape(v) for k, v in assignments.items()}
+
+        files = _Files(targets)
+        folders = {}
+        def folder(path):
+            d = os.path.dirname(path)
+            if d not in folders:
+                folders[d] = Folder(d)
+            return folders[d]
+
+        if read_csv:
+            rows = []
+            for path in files:
+                time.sleep(latency)
+                rows.append(dict(SourceFile=path, **folder(path).Tags(path)))
+            header = ['SourceFile']
+            for row in rows:
+                header.extend(k for k in row if k not in header)
+            w = csv.DictWriter(out, header, lineterminator='\n')
+            w.writeheader()
+            w.writerows(rows)
+        elif write_csv is not None:
+            with open(write_csv, encoding='ISO-8859-1', newline='') as f:
+                table = {os.path.normpath(r['SourceFile']): r \
+                         for r in csv.DictReader(f)}
+            n = 0
+            for path in files:
+                row = table.get(os.path.normpath(path))
+                if row is None:
+                    continue
+                time.sleep(latency)
+                folder(path).Write(path, {k.split(':')[-1]: v \
+                                          for k, v in row.items() \
+                                          if k != 'SourceFile' and v})
+                n += 1
+            out.write('%8d image files updated\n' % n)
+        elif rename is not None:
+            tag, dry = rename
+            taken = set()
+            n = 0
+            for path in files:
+                time.sleep(latency)
+                value = folder(path).Tags(path).get(tag, '')
+                try:
+                    date = datetime.datetime.strptime(value[:19],
+                                                      '%Y:%m:%d %H:%M:%S')
+                except ValueError:
+                    sys.stderr.write("Warning: No writable tags set from %s\n"
+                                     % path)
+                    code = 1
+                    continue
+                new = _FormatName(date, (dt_fmt or '%Y:%m:%d %H:%M:%S%%-c.%%e'),
+                                  path, taken)
+                if new == path:
+                    continue
+                taken.add(new)
+                if dry or verbose:
+                    out.write("'%s' --> '%s'\n" % (path, new))
+                if not dry:
+                    os.rename(path, new)
+                    folder(path).Rename(path, new)
+                    n += 1
+            if not dry:
+                out.write('%8d image files updated\n' % n)
+        elif len(assignments) > 0:
+            for path in files:
+                time.sleep(latency)
+                folder(path).Write(path, assignments)
+            out.write('%8d image files updated\n' % len(files))
+
+        for f in folders.values():
+            f.Save()
+    return code
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    latency = float(os.environ.get('FAKE_EXIFTOOL_LATENCY', 0))
+    if len(args) > 1 and args[0] == '--latency':
+        latency = float(args[1])
+        args = args[2:]
+    sys.exit(Run(args, latency))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Stand-in for a geopy geocoder, for tests and for trying out the
+geospatial functions without an API key or network access:
+
+    geolocator = fake_geolocator.Geolocator(unknown=['Atlantis'])
+    MetaViz.Coverage2Coords(csvPath, geolocator, min_delay_seconds=0)
+
+Coordinates are derived from a hash of the query, so the output is
+deterministic. Every query is recorded with its time, to check the
+caching and rate limiting of tools_geo.GeocodeLocations().
+"""
+import time
+import zlib
+import threading
+
+
+class Location():
+    """Result of a query, with the attributes of geopy's Location"""
+    def __init__(self, address, latitude, longitude):
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @property
+    def point(self):
+        return (self.latitude, self.longitude, 0.0)
+
+    def __str__(self):
+        return self.address
+
+
+class Geolocator():
+    """
+    Geocoder with a geocode(query) method, as the classes inside
+    geopy.geocoders
+    """
+    def __init__(self, unknown=[], errors={}, latency=0.0):
+        """
+        Inputs:
+            unknown (list) : Queries which are not found (None)
+            errors (dict) : Number of times each query raises a
+                    TimeoutError before succeeding
+            latency (float) : Seconds spent per query
+        """
+        self.unknown = set(unknown)
+        self.errors = dict(errors)
+        self.latency = latency
+        self.queries = []  # (time.monotonic(), query) of every call
+        self._lock = threading.Lock()
+
+    def geocode(self, query):
+        """
+        Inputs:
+            query (str) : Location name
+        Outputs:
+            location (Location) : Coordinates of the query, or None
+                if it is unknown
+        """
+        with self._lock:
+            self.queries.append((time.monotonic(), query))
+            failing = self.errors.get(query, 0) > 0
+            if failing:
+                self.errors[query] -= 1
+        time.sleep(self.latency)
+        if failing:
+            raise TimeoutError('Service timed out for %s' % query)
+        if query in self.unknown:
+            return None
+        h = zlib.crc32(query.encode('utf-8'))
+        latitude = (h % 18000) / 100 - 90
+        longitude = (h // 18000 % 36000) / 100 - 180
+        return Location('%s (fake)' % query, latitude, longitude)
+
+    def Queried(self):
+        """
+        Outputs:
+            queries (list) : Queries made so far, in order
+        """
+        with self._lock:
+            return [q for t, q in self.queries]
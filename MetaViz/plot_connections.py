@@ -10,11 +10,13 @@ import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib import cm
 from . import tools
+from . import profiling as prof
 # from chord import Chord
 
 #--------------------------------------
 # Connections Plots
 #--------------------------------------
+@prof.profiled
 def ChordChart(archive, keywords, fields):
     """
     Plots a chord chart showing the degree to which the specified
@@ -56,11 +58,13 @@ def ChordChart(archive, keywords, fields):
     # Make symmetric:
     matrix = (matrix + matrix.T - np.diag(np.diag(matrix))).tolist()
 
+    prof.Mark('draw')
     # Plot
     Chord(matrix, keywords, width=600).show()
     return
 
 
+@prof.profiled
 def Heatmap1(archive, field, N=20, cmap='CMRmap',
              exclude=None, include=None):
     """
@@ -109,6 +113,7 @@ def Heatmap1(archive, field, N=20, cmap='CMRmap',
     # Make symmetric:
     matrix = (matrix + matrix.T - np.diag(np.diag(matrix))).tolist()
 
+    prof.Mark('draw')
     # Do plotting
     fig = plt.figure(figsize=(0.4*N, 0.4*N), dpi=300)
     plt.imshow(matrix, cmap=cmap)
@@ -122,6 +127,7 @@ def Heatmap1(archive, field, N=20, cmap='CMRmap',
     return
 
 
+@prof.profiled
 def Heatmap2(archive, field_x, field_y, 
              N_x=20, N_y=20, cmap='CMRmap',
              exclude_x=None, exclude_y=None, 
@@ -183,6 +189,7 @@ def Heatmap2(archive, field_x, field_y,
             AB = tools.IntersectLists([A, B])
             matrix[ii, jj] = len(AB)/(len(A)+len(B)-len(AB))
 
+    prof.Mark('draw')
     # Do plotting
     fig = plt.figure(figsize=(0.4*N_x, 0.4*N_y), dpi=300)
     plt.imshow(matrix.T, cmap=cmap)
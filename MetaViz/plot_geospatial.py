@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+~~~GEOSPATIAL FUNCTIONS STILL IN BETA~~~
+Plotting routines dedicated to the geographic distribution of
+files, based on the coordinates of the Coverage field
+"""
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from . import profiling as prof
+
+#--------------------------------------
+# Geospatial Plots
+#--------------------------------------
+@prof.profiled
+def MapDensity(index, cell_deg=1, bbox=None,
+               uselog=True, cmap='viridis'):
+    """
+    Plot a 2D map of the number of located files in each cell of a
+    regular latitude/longitude grid. Color axis defaults to log
+    scale to show relative structure.
+
+    Inputs:
+        index (obj) : tools_geo.SpatialIndex object, the output of
+            Archive.SpatialIndex()
+        cell_deg (float) : Size of the grid cells, in degrees
+        bbox (list) : Bounds [south, west, north, east] of the map,
+            default is the whole globe
+        uselog (bool) : Flag decides whether to show color axis in
+            linear or log10 space
+        cmap (str) : Matplotlib colormap to be used for the map
+    """
+    counts, lat_edges, lon_edges = index.Density(cell_deg, bbox)
+    counts = np.ma.masked_equal(counts, 0)
+    if uselog:
+        counts = np.ma.log10(counts)
+
+    prof.Mark('draw')
+    # Create figure
+    fig = plt.figure(figsize=(8,4), dpi=200)
+    plt.imshow(counts, cmap=cmap, origin='lower', interpolation='nearest',
+               extent=[lon_edges[0], lon_edges[-1],
+                       lat_edges[0], lat_edges[-1]])
+    ax = plt.gca()
+    ax.set_facecolor('whitesmoke')
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ti = plt.title('Media Files by Location')
+
+    cbar = plt.colorbar(fraction=0.0235)
+    if uselog:
+        cticks = [c for c in cbar.ax.get_yticks() if c.is_integer()]
+        fig.delaxes(cbar.ax)
+        cbar = plt.colorbar(fraction=0.0235, ticks=cticks)
+        cbar.ax.set_yticklabels([str(int(10.**c)) for c in cticks])
+    ax.grid(color='gray', alpha=0.3)
+    return
@@ -6,11 +6,13 @@ import os
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
+from . import profiling as prof
 # from PIL import Image
 
 #--------------------------------------
 # Image Plots
 #--------------------------------------
+@prof.profiled
 def ShowImage(file, showTitle=True):
     """
     Generates a figure of the specified image.
@@ -21,6 +23,7 @@ def ShowImage(file, showTitle=True):
     """
     img = matplotlib.image.imread(file)
     
+    prof.Mark('draw')
     # Make figure
     fig = plt.figure(figsize=(5,5), dpi=200)
     imgplot = plt.imshow(img)
@@ -33,6 +36,7 @@ def ShowImage(file, showTitle=True):
     return
 
 
+@prof.profiled
 def ShowThumbnails(files, res=64, showTitle=True, size='x-small'):
     """
     Generate a plot of image thumbnails for a given list of files.
@@ -65,6 +69,7 @@ def ShowThumbnails(files, res=64, showTitle=True, size='x-small'):
     # Create a Position index
     position = list(range(1, N+1))
 
+    prof.Mark('draw')
     # Plot thumbnails
     fig = plt.figure(1, figsize=(5,5), dpi=200)
     for k in list(range(N)):
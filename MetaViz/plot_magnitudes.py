@@ -8,10 +8,12 @@ import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib import cm
+from . import profiling as prof
 
 #--------------------------------------
 # Magnitude Plots
 #--------------------------------------
+@prof.profiled
 def BarChart(data, N=40, exclude=None, include=None):
     """
     Horizontal bar chart showing relative magnitudes
@@ -42,6 +44,7 @@ def BarChart(data, N=40, exclude=None, include=None):
         y = [y[i] for i in list(range(len(y))) if x[i] in include]
         x = [x[i] for i in list(range(len(x))) if x[i] in include]
 
+    prof.Mark('draw')
     colors = cm.jet((np.log(y)-1) / float(np.log(max(y))))
 
     # Do plotting
@@ -57,6 +60,7 @@ def BarChart(data, N=40, exclude=None, include=None):
     return
 
 
+@prof.profiled
 def PieChart(data, N=20, exclude=None, include=None):
     """
     Regular pie chart showing relative magnitudes
@@ -87,6 +91,7 @@ def PieChart(data, N=20, exclude=None, include=None):
         y = [y[i] for i in list(range(len(y))) if x[i] in include]
         x = [x[i] for i in list(range(len(x))) if x[i] in include]
     
+    prof.Mark('draw')
     # Do plotting
     fig, ax = plt.subplots(1,1,figsize=(5,5), dpi=150)
     mypie = ax.pie(y, labels=x, startangle=45)
@@ -7,10 +7,12 @@ import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
 from . import tools
+from . import profiling as prof
 
 #--------------------------------------
 # Statistics Plots
 #--------------------------------------
+@prof.profiled
 def FileTypes(archive=None, files=None):
     """
     Plot a bar chart of file types (e.g. png, tiff), either in
@@ -34,6 +36,7 @@ def FileTypes(archive=None, files=None):
     y = data['Count'].tolist()
     N = len(data['Entry'])
 
+    prof.Mark('draw')
     # Do plotting
     colors = matplotlib.cm.Set3(np.arange(len(x))/float(len(x)))
     np.random.shuffle(colors)
@@ -48,6 +51,7 @@ def FileTypes(archive=None, files=None):
     return
 
 
+@prof.profiled
 def HistogramYear(data, datefield='CreateDate', color='k'):
     """
     Plot a histogram of the CreateDate of files in data sorted by year
@@ -63,6 +67,7 @@ def HistogramYear(data, datefield='CreateDate', color='k'):
     low = float(min(year))
     high = float(max(year))
 
+    prof.Mark('draw')
     if len(plt.get_fignums()) < 1:
         fig, ax = plt.subplots(figsize=(5,2), dpi=200)
     else:
@@ -75,6 +80,7 @@ def HistogramYear(data, datefield='CreateDate', color='k'):
     return
 
 
+@prof.profiled
 def HistogramMonth(data, datefield='CreateDate', color='k'):
     """
     Plot a histogram of the CreateDate of files in data sorted by month
@@ -88,6 +94,7 @@ def HistogramMonth(data, datefield='CreateDate', color='k'):
     """
     mon = data[datefield].dt.month
 
+    prof.Mark('draw')
     if len(plt.get_fignums()) < 1:
         fig, ax = plt.subplots(figsize=(5,2), dpi=200)
     else:
@@ -103,6 +110,7 @@ def HistogramMonth(data, datefield='CreateDate', color='k'):
     return
 
 
+@prof.profiled
 def HistogramWeek(data, datefield='CreateDate', color='k'):
     """
     Plot a histogram of the CreateDate of files in data sorted
@@ -115,8 +123,9 @@ def HistogramWeek(data, datefield='CreateDate', color='k'):
         color (str) : Color of the bars of the histogram, must be
             recognizable to matplotlib.pyplot.hist()
     """
-    week = data[datefield].dt.weekofyear
+    week = data[datefield].dt.isocalendar().week.astype(float)
 
+    prof.Mark('draw')
     if len(plt.get_fignums()) < 1:
         fig, ax = plt.subplots(figsize=(5,2), dpi=200)
     else:
@@ -129,6 +138,7 @@ def HistogramWeek(data, datefield='CreateDate', color='k'):
     return
 
 
+@prof.profiled
 def HistogramDay(data, datefield='CreateDate', color='k'):
     """
     Plot a histogram of the CreateDate of files in data sorted
@@ -149,6 +159,7 @@ def HistogramDay(data, datefield='CreateDate', color='k'):
         if (leaps[ii]) & (day[ii] >= 60):
             day[ii] -= 1
 
+    prof.Mark('draw')
     if len(plt.get_fignums()) < 1:
         fig, ax = plt.subplots(figsize=(5,2), dpi=200)
     else:
@@ -162,6 +173,7 @@ def HistogramDay(data, datefield='CreateDate', color='k'):
     return
 
 
+@prof.profiled
 def TemporalStats(data, datefield='CreateDate', color='k'):
     """
     Plot all temporal histograms together in a series of subplots.
@@ -174,6 +186,7 @@ def TemporalStats(data, datefield='CreateDate', color='k'):
         color (str) : Color of the bars of the histogram, must be
             recognizable to matplotlib.pyplot.hist()
     """
+    prof.Mark('draw')
     fig, (ax1,ax2,ax3,ax4) = plt.subplots(4,1,figsize=(5,8),dpi=300)
     # Year
     plt.sca(ax1)
@@ -198,6 +211,7 @@ def TemporalStats(data, datefield='CreateDate', color='k'):
     return
 
 
+@prof.profiled
 def HeatmapMonth(data, datefield='CreateDate',
                  uselog=True, cmap='magma'):
     """
@@ -230,6 +244,7 @@ def HeatmapMonth(data, datefield='CreateDate',
         yr_mon_sorted[yr_mon_sorted==0] = 0.5
         yr_mon_sorted = np.log10(yr_mon_sorted)
 
+    prof.Mark('draw')
     # Create figure
     fig = plt.figure(figsize=(5,5), dpi=200)
     plt.imshow(yr_mon_sorted, cmap=cmap,
@@ -254,6 +269,7 @@ def HeatmapMonth(data, datefield='CreateDate',
     return
 
 
+@prof.profiled
 def HeatmapWeek(data, datefield='CreateDate',
                 uselog=True, cmap='gnuplot2'):
     """
@@ -271,7 +287,7 @@ def HeatmapWeek(data, datefield='CreateDate',
     """
     # Isolate important date information
     years = data[datefield].dt.year.to_numpy()
-    weeks = data[datefield].dt.weekofyear.to_numpy()
+    weeks = data[datefield].dt.isocalendar().week.astype(float).to_numpy()
 
     yr_week_sorted = np.zeros((52, (max(years)+1-min(years))), dtype=float)
     # Loop through years
@@ -286,6 +302,7 @@ def HeatmapWeek(data, datefield='CreateDate',
         yr_week_sorted[yr_week_sorted==0] = 0.5
         yr_week_sorted = np.log10(yr_week_sorted)
 
+    prof.Mark('draw')
     # Create figure
     fig = plt.figure(figsize=(5,5), dpi=200)
     plt.imshow(yr_week_sorted, cmap=cmap,
@@ -310,6 +327,7 @@ def HeatmapWeek(data, datefield='CreateDate',
     return
 
 
+@prof.profiled
 def HeatmapDay(data, datefield='CreateDate',
                uselog=True, cmap='inferno'):
     """
@@ -330,7 +348,7 @@ def HeatmapDay(data, datefield='CreateDate',
     """
     # Isolate important date information, correct leaps
     years = data[datefield].dt.year.to_numpy()
-    days = data[datefield].dt.dayofyear.to_numpy()
+    days = data[datefield].dt.dayofyear.to_numpy(copy=True)
     leaps = data[datefield].dt.is_leap_year.tolist()
     for ii in list(range(len(days))):
         if (leaps[ii]) & (days[ii] >= 60):
@@ -349,6 +367,7 @@ def HeatmapDay(data, datefield='CreateDate',
         yr_day_sorted[yr_day_sorted==0] = 0.5
         yr_day_sorted = np.log10(yr_day_sorted)
 
+    prof.Mark('draw')
     # Create figure
     fig = plt.figure(figsize=(5,5), dpi=700)
     plt.imshow(yr_day_sorted, cmap=cmap,
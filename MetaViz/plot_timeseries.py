@@ -7,11 +7,13 @@ import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib import cm
+from . import profiling as prof
 # import seaborn as sns
 
 #--------------------------------------
 # Time-Series Plots
 #--------------------------------------
+@prof.profiled
 def OccurancePlot(archive,
                   searchterms,
                   fields=None,
@@ -42,13 +44,16 @@ def OccurancePlot(archive,
                       / float(len(searchterms)))
     np.random.shuffle(colors)
 
-    for ii, term in enumerate(searchterms):
+    datas = []
+    for term in searchterms:
         # Find filenames with search terms in field
         sourcefiles = archive.FindSource([term], fields)
         # Grab and filter by datetimes 
-        data = archive.GrabData(sourcefiles, ['CreateDate'],
-                                startdate=startdate,
-                                enddate=enddate)
+        datas.append(archive.GrabData(sourcefiles, ['CreateDate'],
+                                      startdate=startdate,
+                                      enddate=enddate))
+    prof.Mark('draw')
+    for ii, data in enumerate(datas):
         # Plot scatterplot w/ default spacing settings
         plt.scatter(data['CreateDate'],
                     np.ones(len(data['CreateDate']))*(len(searchterms)-ii),
@@ -59,6 +64,7 @@ def OccurancePlot(archive,
     return
 
 
+@prof.profiled
 def OccuranceMagnitude(archive,
                        searchterms,
                        fields=None,
@@ -94,7 +100,8 @@ def OccuranceMagnitude(archive,
     colors[:,3] = alpha
     np.random.shuffle(colors)
 
-    for ii, term in enumerate(searchterms):
+    allcounts = []
+    for term in searchterms:
         # Find filenames with search terms in field
         sourcefiles = archive.FindSource([term], fields)
         # Grab and filter by datetimes 
@@ -102,7 +109,9 @@ def OccuranceMagnitude(archive,
                                 startdate=startdate,
                                 enddate=enddate)
         # Count totals by day
-        counts = data['CreateDate'].dt.normalize().value_counts()
+        allcounts.append(data['CreateDate'].dt.normalize().value_counts())
+    prof.Mark('draw')
+    for ii, counts in enumerate(allcounts):
         dates = counts.index.to_series()
         # Plot scatterplot w/ default spacing settings
         plt.scatter(dates, np.ones(len(dates))*(len(searchterms)-ii),
@@ -114,6 +123,7 @@ def OccuranceMagnitude(archive,
     return
 
 
+@prof.profiled
 def ViolinPlot(archive, terms, fields,
                startdate=None, enddate=None,
                refdate='19800101_000000',
@@ -166,6 +176,7 @@ def ViolinPlot(archive, terms, fields,
     # Append all the dates into a new dataframe
     df = pd.concat(dates, axis=1, keys=terms)
 
+    prof.Mark('draw')
     # Show each distribution with both violins and points
     fig, ax = plt.subplots(figsize=(3,len(terms)/1.5), dpi=200)
     ax = sns.violinplot(data=df, ax=ax, width=0.95, orient='h',
@@ -174,6 +185,7 @@ def ViolinPlot(archive, terms, fields,
     return
 
 
+@prof.profiled
 def RidgePlot(archive, terms, fields,
               startdate=None, enddate=None,
               refdate='19800101_000000',
@@ -231,6 +243,7 @@ def RidgePlot(archive, terms, fields,
     # Append all the dates into a new dataframe
     df = pd.concat(dates)
 
+    prof.Mark('draw')
     # Initialize the FacetGrid object
     g = sns.FacetGrid(df, row="term", hue="term",
                       aspect=aspect, height=height, palette=palette)
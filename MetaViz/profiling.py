@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Opt-in timing instrumentation of Archive methods and plotting
+routines. For each call, records the wall time, the rows and bytes
+of csv read, the time spent in exiftool subprocesses, the peak memory,
+and for plots the split between data preparation and drawing. Turned
+on either for a block of code:
+
+    with MetaViz.profiling.Profile() as p:
+        MetaViz.Heatmap1(archive, 'Subject')
+    p.Results()
+
+or for the whole session by setting config.profile = True, in which
+case the latest records are kept in memory, see Results(). When off,
+the cost is a single flag check per call. Peak memory is the increase
+of the peak resident memory of the process during the call, which is
+zero for calls staying under an earlier peak; Profile(trace_memory=True)
+also records the peak of the memory allocated during each call.
+"""
+import os
+import time
+import json
+import inspect
+import threading
+import functools
+import tracemalloc
+from collections import deque
+import pandas as pd
+from . import config as cf
+
+COLUMNS = ['Call', 'Depth', 'Start', 'Seconds', 'PrepSeconds',
+           'DrawSeconds', 'Rows', 'Bytes', 'Subprocesses',
+           'SubprocessSeconds', 'PeakRSSIncrease_MB', 'PeakTraced_MB', 'Error']
+
+# Records of the session when config.profile is set
+LOG = deque(maxlen=10000)
+
+_lock = threading.Lock()
+_sessions = []  # Active Profile() blocks
+_local = threading.local()  # Records of the calls in progress, per thread
+
+
+def _Active():
+    return getattr(cf, 'profile', False) or len(_sessions) > 0
+
+
+def _Stack():
+    """Records of the calls in progress in the current thread"""
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def _PeakRSS():
+    """Peak resident memory of the process so far, in MB"""
+    try:
+        import resource
+    except ImportError:
+        # Windows, peak working set
+        try:
+            import psutil
+        except ImportError:
+            return None
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        return None if peak is None else peak / 1024**2
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kB elsewhere
+    return peak / 1024**2 if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def _TracePeak(stack):
+    """
+    Fold the traced peak since the last reset into the calls in
+    progress, and start a new peak
+    """
+    peak = tracemalloc.get_traced_memory()[1]
+    for rec in stack:
+        if '_traced' in rec:
+            rec['_traced'] = max(rec['_traced'], peak)
+    tracemalloc.reset_peak()
+    return
+
+
+def profiled(func):
+    """
+    Decorator recording each call of func while profiling is on.
+    Records of calls made inside func are kept too, with a larger
+    Depth, and their rows, bytes and subprocesses also count
+    towards the enclosing calls.
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _Active():
+            return func(*args, **kwargs)
+        stack = _Stack()
+        rec = {'Call': name, 'Depth': len(stack),
+               'Start': time.strftime('%Y-%m-%d %H:%M:%S'),
+               'Rows': 0, 'Bytes': 0, 'Subprocesses': 0,
+               'SubprocessSeconds': 0.0, 'Error': ''}
+        rss0 = _PeakRSS()
+        if tracemalloc.is_tracing():
+            _TracePeak(stack)
+            rec['_traced'] = rec['_traced0'] = \
+                tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        stack.append(rec)
+        try:
+            return func(*args, **kwargs)
+        except Exception as err:
+            rec['Error'] = repr(err)
+            raise
+        finally:
+            t1 = time.perf_counter()
+            if '_traced' in rec and tracemalloc.is_tracing():
+                _TracePeak(stack)
+                rec['PeakTraced_MB'] = (rec['_traced'] - rec['_traced0']) \
+                                       / 1024**2
+            rec.pop('_traced', None)
+            rec.pop('_traced0', None)
+            stack.remove(rec)
+            rec['Seconds'] = t1 - t0
+            draw = rec.pop('_draw', None)
+            if draw is not None:
+                rec['PrepSeconds'] = draw - t0
+                rec['DrawSeconds'] = t1 - draw
+            rss1 = _PeakRSS()
+            rec['PeakRSSIncrease_MB'] = None if rss0 is None \
+                or rss1 is None else rss1 - rss0
+            _Record(rec)
+    return wrapper
+
+
+def ProfileMethods(cls):
+    """
+    Class decorator applying profiled() to every public method,
+    except generators, whose work happens after they return
+    """
+    for name, attr in list(vars(cls).items()):
+        if callable(attr) and not name.startswith('_') \
+           and not inspect.isgeneratorfunction(attr):
+            setattr(cls, name, profiled(attr))
+    return cls
+
+
+def _Record(rec):
+    with _lock:
+        if getattr(cf, 'profile', False):
+            LOG.append(rec)
+        for session in _sessions:
+            session.records.append(rec)
+    return
+
+
+def _Add(key, value):
+    """Add value to a counter of every call in progress in this thread"""
+    for rec in _Stack():
+        rec[key] += value
+    return
+
+
+def Mark(phase='draw'):
+    """
+    Mark the end of the data preparation of the innermost plot in
+    progress, and the start of its drawing
+    """
+    stack = _Stack()
+    if len(stack) > 0 and phase == 'draw':
+        stack[-1].setdefault('_draw', time.perf_counter())
+    return
+
+
+def ReadCSV(path, **kwargs):
+    """
+    pandas.read_csv(path, **kwargs), counting the rows and bytes read
+    for the calls in progress. With chunksize, returns an iterator
+    over the chunks, as pandas does
+    """
+    if kwargs.get('chunksize') is not None:
+        return _ReadChunks(path, **kwargs)
+    df = pd.read_csv(path, **kwargs)
+    if len(_Stack()) > 0:
+        _Add('Rows', len(df))
+        _Add('Bytes', os.path.getsize(path))
+    return df
+
+
+def _ReadChunks(path, **kwargs):
+    with pd.read_csv(path, **kwargs) as reader:
+        if len(_Stack()) > 0:
+            _Add('Bytes', os.path.getsize(path))
+        for df in reader:
+            if len(_Stack()) > 0:
+                _Add('Rows', len(df))
+            yield df
+
+
+class Subprocess():
+    """Context manager timing an exiftool subprocess"""
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if len(_Stack()) > 0:
+            _Add('Subprocesses', 1)
+            _Add('SubprocessSeconds', time.perf_counter() - self.t0)
+        return False
+
+
+class Profile():
+    """
+    Context manager recording the profiled calls made inside it
+    """
+    def __init__(self, trace_memory=False):
+        """
+        Inputs:
+            trace_memory (bool) : If True, also record the peak of
+                    the memory allocated by Python during each call
+                    (PeakTraced_MB) with tracemalloc, which slows
+                    down the calls. Peaks are only exact when a
+                    single thread is profiled
+        """
+        self.records = []
+        self.trace_memory = trace_memory
+        self._tracing = False
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        with _lock:
+            _sessions.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with _lock:
+            _sessions.remove(self)
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        return False
+
+    def Results(self):
+        """
+        Outputs:
+            results (pandas DataFrame) : One row per call, in the
+                order in which the calls finished
+        """
+        return pd.DataFrame(self.records, columns=COLUMNS)
+
+    def ToJSON(self, filename=None):
+        """
+        Export the records as JSON, to a file or as a string
+
+        Inputs:
+            filename (str) : File in which to save the records,
+                default is to return them as a string
+        """
+        return ToJSON(filename, self.records)
+
+
+def Results():
+    """
+    Records kept while config.profile is set
+
+    Outputs:
+        results (pandas DataFrame) : One row per call, latest last
+    """
+    with _lock:
+        return pd.DataFrame(list(LOG), columns=COLUMNS)
+
+
+def ToJSON(filename=None, records=None):
+    """
+    Export records (default, those kept while config.profile is set)
+    as JSON, to a file or as a string
+    """
+    if records is None:
+        with _lock:
+            records = list(LOG)
+    text = json.dumps([{k: rec.get(k) for k in COLUMNS} for rec in records],
+                      indent=1)
+    if filename is None:
+        return text
+    with open(filename, 'w') as f:
+        f.write(text)
+    return
+
+
+def Clear():
+    """Forget the records kept while config.profile is set"""
+    with _lock:
+        LOG.clear()
+    return
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Long-running query server keeping the metadatabase in memory, and
+a thin client to query it. The server answers FindSource, GrabData,
+Query and CountUnique requests over HTTP, either on localhost or on
+a Unix socket, with one thread per request. Tables are read again
+whenever their csv changes on disk (e.g. after UpdateCSV), and
+everything is reloaded on a Reload request.
+
+Start a server from the shell with 'metaviz serve', then:
+
+    client = MetaViz.server.Client('http://127.0.0.1:8765')
+    files = client.FindSource(['beach'], ['Subject'])
+
+The client has the same search methods as Archive, so it can be
+passed to the plotting routines in place of an Archive.
+"""
+import os
+import json
+import socket
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+
+METHODS = ['FindSource', 'GrabData', 'Query', 'CountUnique']
+
+
+def _Encode(result):
+    """Encode the output of an Archive method as JSON"""
+    if isinstance(result, pd.DataFrame):
+        dates = [c for c in result.columns \
+                 if pd.api.types.is_datetime64_any_dtype(result[c])]
+        df = result.copy()
+        for c in dates:
+            df[c] = df[c].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        df = df.astype(object).where(df.notnull(), None)
+        body = {'columns': list(df.columns), 'dates': dates,
+                'data': df.values.tolist()}
+    else:
+        body = {'result': result}
+    return json.dumps(body, default=lambda x: x.item() \
+                      if isinstance(x, np.generic) else str(x))
+
+
+def _Decode(text):
+    """Decode the JSON of _Encode() back into a list or DataFrame"""
+    body = json.loads(text)
+    if 'result' in body:
+        return body['result']
+    df = pd.DataFrame(body['data'], columns=body['columns'])
+    for c in body['dates']:
+        df[c] = pd.to_datetime(df[c], format='%Y-%m-%dT%H:%M:%S')
+    return df
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Handle POST /<Method> requests, whose JSON body holds the keyword
+    arguments of the Archive method, and GET /status
+    """
+    def _Send(self, code, text):
+        data = text.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        archive = self.server.archive
+        if self.path.strip('/') == 'status':
+            self._Send(200, json.dumps({'csvPath': archive.csvPath,
+                                        'subfolders': len(archive.subfolders),
+                                        'cached': len(archive._tables)}))
+        else:
+            self._Send(404, json.dumps({'error': 'Unknown path'}))
+
+    def do_POST(self):
+        archive = self.server.archive
+        name = self.path.strip('/')
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            kwargs = json.loads(self.rfile.read(length) or b'{}')
+            if name == 'Reload':
+                archive.Reload()
+                self._Send(200, json.dumps({'result': True}))
+            elif name in METHODS:
+                result = getattr(archive, name)(**kwargs)
+                self._Send(200, _Encode(result))
+            else:
+                self._Send(404, json.dumps({'error': 'Unknown method %s'
+                                                     % name}))
+        except Exception as err:
+            self._Send(400, json.dumps({'error': repr(err)}))
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else ''
+
+    def log_message(self, format, *args):
+        if self.server.archive.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket, with one thread per request"""
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = socketserver.UnixStreamServer.get_request(self)
+        return request, ('', 0)
+
+
+def Serve(archive, host='127.0.0.1', port=8765, path=None):
+    """
+    Serve an archive until interrupted. The archive's tables are
+    loaded once and kept in memory (archive.cache is turned on).
+
+    Inputs:
+        archive (Archive) : Archive to serve
+        host (str) : Address to listen on, keep to localhost unless
+            the network is trusted, as requests are not authenticated
+        port (int) : Port to listen on
+        path (str) : Path of a Unix socket to listen on instead of
+            host and port
+    """
+    archive.cache = True
+    if path is not None:
+        if os.path.exists(path):
+            os.remove(path)
+        server = UnixHTTPServer(path, Handler)
+        where = path
+    else:
+        server = ThreadingHTTPServer((host, port), Handler)
+        where = 'http://%s:%d' % (host, port)
+    server.archive = archive
+
+    # Warm up the cache before accepting requests
+    for sf in archive.subfolders:
+        archive._LoadCSV(sf)
+    print('Serving %d subfolders of %s on %s' % (len(archive.subfolders),
+                                                 archive.csvPath, where))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+    return
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix socket"""
+    def __init__(self, path, timeout=None):
+        http.client.HTTPConnection.__init__(self, 'localhost',
+                                            timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class Client():
+    """
+    Thin client of a query server, with the search methods of Archive
+    """
+    def __init__(self, url='http://127.0.0.1:8765', timeout=None):
+        """
+        Inputs:
+            url (str) : Address of the server, either
+                'http://host:port' or 'unix:///path/to/socket'
+            timeout (float) : Seconds to wait for an answer
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def _Connection(self):
+        if self.url.startswith('unix://'):
+            return _UnixConnection(self.url[len('unix://'):], self.timeout)
+        host = self.url.split('://', 1)[-1].rstrip('/')
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def _Call(self, name, **kwargs):
+        conn = self._Connection()
+        try:
+            conn.request('POST', '/' + name, json.dumps(kwargs),
+                         {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            text = response.read().decode('utf-8')
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise RuntimeError('Server error: %s'
+                               % json.loads(text).get('error'))
+        return _Decode(text)
+
+    def FindSource(self, searchterms, fields=None, subfolders=None,
+                   include_all=False, withPath=False):
+        """See Archive.FindSource()"""
+        return self._Call('FindSource', searchterms=searchterms,
+                          fields=fields, subfolders=subfolders,
+                          include_all=include_all, withPath=withPath)
+
+    def GrabData(self, sourcefiles=None, fields=None, startdate=None,
+                 enddate=None, withPath=False, subfolders=None):
+        """See Archive.GrabData()"""
+        return self._Call('GrabData', sourcefiles=sourcefiles,
+                          fields=fields, startdate=startdate,
+                          enddate=enddate, withPath=withPath,
+                          subfolders=subfolders)
+
+    def Query(self, conditions, fields=None, startdate=None, enddate=None,
+              withPath=False):
+        """
+        See Archive.Query(). Values of conditions on CreateDate are
+        sent as YYYYmmdd_HHMMSS strings
+        """
+        return self._Call('Query', conditions=conditions, fields=fields,
+                          startdate=startdate, enddate=enddate,
+                          withPath=withPath)
+
+    def CountUnique(self, field, delimiter=', ', chunksize=None):
+        """See Archive.CountUnique()"""
+        return self._Call('CountUnique', field=field, delimiter=delimiter,
+                          chunksize=chunksize)
+
+    def Reload(self):
+        """Ask the server to read every table again"""
+        return self._Call('Reload')
@@ -51,61 +51,324 @@ def DifferenceLists(entries):
     return diff
 
 
-def CopyFiles(sourcefiles, dst_folder):
+def _FastCopy(src, dst):
     """
-    Copy a list of sourcefiles to a destination folder.
+    Copy the contents and metadata of src to dst, using the zero-copy
+    os.copy_file_range or os.sendfile where the platform allows,
+    and falling back to a regular buffered copy otherwise. Data is
+    written to a temporary file which then replaces dst.
+    """
+    import shutil
+    tmp = dst + '.part'
+    with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        for fastcopy in ('copy_file_range', 'sendfile'):
+            if not hasattr(os, fastcopy):
+                continue
+            try:
+                while copied < size:
+                    if fastcopy == 'copy_file_range':
+                        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(),
+                                               size - copied)
+                    else:
+                        n = os.sendfile(fdst.fileno(), fsrc.fileno(),
+                                        copied, size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+                break
+            except OSError:
+                # Not supported for this pair of files, start over
+                copied = 0
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        if copied < size:
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            shutil.copyfileobj(fsrc, fdst, 1024**2)
+    shutil.copystat(src, tmp)
+    os.replace(tmp, dst)
+    return
+
+
+def _SameFile(src, dst, compare):
+    """
+    Check whether dst already holds a copy of src, by size and
+    modification time or by content hash
+    """
+    try:
+        s_dst = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    s_src = os.stat(src)
+    if s_src.st_size != s_dst.st_size:
+        return False
+    if compare == 'hash':
+        from .tools_duplicates import HashFile
+        return HashFile(src) == HashFile(dst)
+    # Allow 2 seconds of slack for coarse filesystem timestamps
+    return abs(s_src.st_mtime_ns - s_dst.st_mtime_ns) < 2e9
+
+
+def CopyFiles(sourcefiles, dst_folder, skip_duplicates=False,
+              skip_unchanged=True, compare='mtime',
+              collisions='rename', workers=8):
+    """
+    Copy a list of sourcefiles to a destination folder, using a
+    thread pool. Files already present in the destination with the
+    same size and modification time (or content) are not copied
+    again, so repeated exports only transfer what changed.
     
     Inputs:
         sourcefiles (list) : List of paths to sourcefiles to copy,
             specified as strings, e.g. the output of 
             Archive.FindSource([...], withPath=True)
         dst_folder (str) : Destination folder to which to copy
+        skip_duplicates (bool) : If True, files whose content is
+            identical to an earlier file in sourcefiles are not copied
+        skip_unchanged (bool) : If True, skip files whose destination
+            already matches the source
+        compare (str) : How to decide a destination matches, either
+            'mtime' (same size and modification time) or 'hash'
+            (same content, slower)
+        collisions (str) : What to do with sourcefiles sharing the
+            same filename, either 'rename' (append -1, -2, ... to the
+            later ones), 'skip' (only copy the first) or
+            'overwrite' (last one wins)
+        workers (int) : Number of threads used for copying
     Outputs:
-        Copies each sourcefile to the specified folder
+        result (pandas DataFrame) : One row per sourcefile, with columns
+            SourceFile, Destination, Status ('copied', 'unchanged',
+            'duplicate', 'collision' or an error message) and Bytes
     """
-    import shutil
+    from concurrent.futures import ThreadPoolExecutor
 
+    if compare not in ['mtime', 'hash']:
+        raise ValueError("compare must be 'mtime' or 'hash'")
+    if collisions not in ['rename', 'skip', 'overwrite']:
+        raise ValueError("collisions must be 'rename', 'skip' or 'overwrite'")
     if not os.path.exists(dst_folder):
         os.makedirs(dst_folder)
 
+    sourcefiles = list(dict.fromkeys(sourcefiles))
+    status = dict.fromkeys(sourcefiles, '')
+    if skip_duplicates:
+        from .tools_duplicates import UniqueFiles
+        unique, skipped = UniqueFiles(sourcefiles)
+        for name in skipped:
+            status[name] = 'duplicate'
+
+    # Assign destination names in input order, resolving collisions
+    dests = {}
+    taken = {}
     for name in sourcefiles:
-        shutil.copy2(name, os.path.join(dst_folder,
-                                        name.split(os.sep)[-1]))
+        base = os.path.basename(name)
+        if status[name] != '':
+            dests[name] = ''
+            continue
+        if base.lower() in taken:
+            if collisions == 'skip':
+                status[name] = 'collision'
+                dests[name] = ''
+                continue
+            elif collisions == 'rename':
+                stem, dot, ext = base.rpartition('.')
+                if not dot:
+                    stem, ext = base, ''
+                count = taken[base.lower()]
+                while True:
+                    count += 1
+                    newbase = '%s-%d%s%s' % (stem, count, dot, ext)
+                    if newbase.lower() not in taken:
+                        break
+                taken[base.lower()] = count
+                base = newbase
+        taken.setdefault(base.lower(), 0)
+        dests[name] = os.path.join(dst_folder, base)
+
+    def copy_one(name):
+        dst = dests[name]
+        if status[name] != '':
+            return status[name], 0
+        try:
+            if skip_unchanged and _SameFile(name, dst, compare):
+                return 'unchanged', 0
+            _FastCopy(name, dst)
+            return 'copied', os.path.getsize(dst)
+        except OSError as err:
+            return 'error: %s' % err, 0
+
+    # Copy in parallel (only the last of overwritten names survives)
+    jobs = [n for n in sourcefiles if status[n] == '']
+    if collisions == 'overwrite':
+        last = {dests[n]: n for n in jobs}
+        jobs = list(last.values())
+        for n in sourcefiles:
+            if status[n] == '' and last[dests[n]] != n:
+                status[n] = 'collision'
+    nbytes = dict.fromkeys(sourcefiles, 0)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for name, res in zip(jobs, pool.map(copy_one, jobs)):
+            status[name], nbytes[name] = res
+
+    result = pd.DataFrame({'SourceFile': sourcefiles,
+                           'Destination': [dests[n] for n in sourcefiles],
+                           'Status': [status[n] for n in sourcefiles],
+                           'Bytes': [nbytes[n] for n in sourcefiles]})
+    return result
+
+
+def PlanRename(oldNames, newNames):
+    """
+    Plan the renaming of a list of files given in oldNames to the
+    newName of the same index, resolving name collisions in memory.
+    Each target directory is listed only once, and a name already
+    taken (by another file or another target) gets a digit appended
+    before its extension, e.g. name-1.jpg, name-2.jpg, using one
+    counter per name. Names freed by files renamed in the same plan
+    can be reused.
+
+    Inputs:
+        oldNames (list) : List of absolute or relative paths to
+            existing files to be renamed
+        newNames (list) : List of absolute or relative paths to
+            new names for the files in oldNames
+    Outputs:
+        plan (pandas DataFrame) : DataFrame with columns OldName and
+            NewName, the collision-free name of each file
+    """
+    if len(oldNames) != len(newNames):
+        raise ValueError('oldNames and newNames must have the same length')
+    oldNames = [str(n) for n in oldNames]
+    newNames = [str(n) for n in newNames]
+    moving = set(o for o, n in zip(oldNames, newNames) if o != n)
+    moving_keys = set(os.path.normpath(o).lower() for o in moving)
+
+    # Names in each target directory that stay occupied
+    occupied = {}
+    for new in newNames:
+        folder = os.path.dirname(new)
+        if folder in occupied:
+            continue
+        try:
+            entries = os.listdir(folder if folder else '.')
+        except FileNotFoundError:
+            entries = []
+        occupied[folder] = set(e.lower() for e in entries \
+                               if os.path.normpath(os.path.join(folder,
+                               e)).lower() not in moving_keys)
+    # Files which don't move keep their name
+    for old, new in zip(oldNames, newNames):
+        if old == new:
+            occupied.setdefault(os.path.dirname(old),
+                                set()).add(os.path.basename(old).lower())
+
+    # Assign final names, with one suffix counter per name
+    counters = {}
+    finalNames = []
+    for old, new in zip(oldNames, newNames):
+        if old == new:
+            finalNames.append(new)
+            continue
+        folder, base = os.path.split(new)
+        taken = occupied[folder]
+        if base.lower() in taken:
+            stem, ext = os.path.splitext(base)
+            key = (folder, stem.lower(), ext.lower())
+            suffix = counters.get(key, 0)
+            while True:
+                suffix += 1
+                base = '%s-%d%s' % (stem, suffix, ext)
+                if base.lower() not in taken:
+                    break
+            counters[key] = suffix
+        taken.add(base.lower())
+        finalNames.append(os.path.join(folder, base))
+
+    plan = pd.DataFrame({'OldName': oldNames, 'NewName': finalNames})
+    return plan
+
+
+def ApplyRename(plan, journal=None):
+    """
+    Rename files according to the output of PlanRename(). Renames
+    are ordered so that no file is overwritten when files take each
+    other's names, and cycles of renames (e.g. swapping two names)
+    are broken with a temporary name.
+
+    Inputs:
+        plan (pandas DataFrame) : Output of PlanRename()
+        journal (tools_journal.Journal) : Optional journal in which
+            the renames are recorded before they are made
+    Outputs:
+        Changes the name of each file in the plan
+    """
+    pending = {o: n for o, n in zip(plan['OldName'], plan['NewName']) \
+               if o != n}
+
+    # Order renames so each target is free when its turn comes
+    steps = []
+    done = set()
+    for start in pending:
+        if start in done:
+            continue
+        path = []
+        on_path = set()
+        x = start
+        while x in pending and x not in done and x not in on_path:
+            path.append(x)
+            on_path.add(x)
+            x = pending[x]
+        if x in on_path:
+            # Cycle: targets are unique, so the path is the cycle
+            tmp = path[0] + '.renaming'
+            steps.append((path[0], tmp))
+            for src in reversed(path[1:]):
+                steps.append((src, pending[src]))
+            steps.append((tmp, pending[path[0]]))
+        else:
+            # Chain: rename from the end
+            for src in reversed(path):
+                steps.append((src, pending[src]))
+        done.update(path)
+
+    if journal is not None:
+        journal.RecordRenames([s[0] for s in steps], [s[1] for s in steps])
+    for src, dst in steps:
+        # Never overwrite a file which appeared since planning
+        if os.path.exists(dst) and not os.path.samefile(src, dst):
+            raise FileExistsError('Rename target exists: %s' % dst)
+        os.rename(src, dst)
+    if journal is not None:
+        journal.Close()
     return
 
 
-def BatchRename(oldNames, newNames):
+def BatchRename(oldNames, newNames, journal=None):
     """
     Rename a list of files given in oldNames to the newName
-    of the same index.
+    of the same index. If a new name is already taken, a digit
+    is appended to it, e.g. name-1.jpg. See PlanRename()
     
     Inputs:
         oldNames (list) : List of absolute or relative paths to
             existing files to be renamed
         newNames (list) : List of absolute or relative paths to
             new names for the files in oldNames
+        journal (tools_journal.Journal) : Optional journal in which
+            each rename is recorded before it is made, so the batch
+            can be undone, e.g. Archive.Journal('BatchRename')
     Outputs:
         Changes the name of each file in oldNames to match newNames
+        finalNames (list) : Names actually given to the files, which
+            differ from newNames where a digit had to be appended
     """
-    for ii in list(range(0, len(oldNames))):
-        # Don't rename a file already in the correct format
-        if oldNames[ii] == newNames[ii]:
-            continue
-        
-        # Check if another file of same name as newName exists:
-        if not os.path.exists(newNames[ii]):
-            os.rename(oldNames[ii], newNames[ii])
-        else: # If so, append name with a digit
-            suffix = 1
-            while True:
-                filetype = oldNames[ii].split('.')[-1]
-                appendedName = newNames[ii].split('.')[0] + '-' \
-                               + str(suffix) + filetype
-                if not os.path.exists(appendedName):
-                    os.rename(oldNames[ii], appendedName)
-                    break
-                suffix += 1
-    return
+    plan = PlanRename(oldNames, newNames)
+    ApplyRename(plan, journal)
+    finalNames = plan['NewName'].tolist()
+    return finalNames
 
 
 def BatchTimedelta(oldDates, timedelta, dt_format='%Y%m%d_%H%M%S'):
@@ -131,7 +394,7 @@ def BatchTimedelta(oldDates, timedelta, dt_format='%Y%m%d_%H%M%S'):
     return newDates
 
 
-def CountUnique(series, delimiter=', '):
+def CountUnique(series, delimiter=', ', weights=None):
     """
     Count unique entries in a column of a pandas series.
     Returns a new DataFrame with unique labels and
@@ -142,6 +405,9 @@ def CountUnique(series, delimiter=', '):
                 e.g. df['A']
         delimiter (str) : String delimiter used to
                 separate entries in column of interest.
+        weights (array) : Number of times each row of series
+                is counted, e.g. from value_counts(). Default
+                is once
     Outputs:
         uq (pandas DataFrame) : New dataframe containing
                 all unique entries and their appearance
@@ -162,9 +428,12 @@ def CountUnique(series, delimiter=', '):
     # Create new DataFrame
     uq = pd.DataFrame(unique_list, columns=['Entry'])
     # Count appearances of each entry in original dataframe
+    if weights is None:
+        weights = 1
     uq['Count'] = uq.apply(lambda row: \
                            np.nansum(series.str.count(\
-                           r'%s' % re.escape(row['Entry'])).values),
+                           r'%s' % re.escape(row['Entry'])).values \
+                           * weights),
                            axis=1)
     # Now fix double-counting of entries contained
     # inside other entries
@@ -220,10 +489,32 @@ def StitchPanorama(images, outfile, mode=1):
         print("Can't stitch images, error code = %d" % status)
     else:
         cv2.imwrite(outfile, pano)
-        print("Stitching successful, %s saved" % output_file)
+        print("Stitching successful, %s saved" % outfile)
     return
 
 
+def ParseDuration(values):
+    """
+    Convert exiftool Duration strings into seconds, in one vectorized
+    pass. Understands the formats written by exiftool, e.g.
+    '12.34 s', '12.34 s (approx)', '0:01:23', '1:02:03.5', and plain
+    numbers of seconds
+
+    Inputs:
+        values (pandas series) : Duration strings, e.g. df['Duration']
+    Outputs:
+        seconds (pandas series) : Durations in seconds (float),
+            NaN where missing or not understood
+    """
+    values = pd.Series(values).astype('string').str.strip()
+    # [[h:]m:]s, with or without units
+    clock = values.str.extract(r'^(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d*)?)'
+                               r'\s*(?:s|sec|seconds?)?(?:\s*\(approx\))?$')
+    clock = clock.astype(float)
+    seconds = clock[0].fillna(0) * 3600 + clock[1].fillna(0) * 60 + clock[2]
+    return seconds.astype(float)
+
+
 def TotalDuration(series, field='Duration'):
     """
     Find total duration of all video viles from a Pandas series
@@ -236,10 +527,9 @@ def TotalDuration(series, field='Duration'):
     Outputs:
         dur (str) : Total duration length for all files in series
     """
-    # Eliminate NaN durations
-    series = series[series[field].notnull()]
-    # Convert to timedelta and add up
-    dur = str(pd.to_timedelta(series[field]).sum())
+    # Parse into seconds, ignoring NaN durations, and add up
+    seconds = ParseDuration(series[field]).sum()
+    dur = str(pd.Timedelta(seconds=round(seconds, 6)))
     return dur
 
 
@@ -256,7 +546,8 @@ def CountFiles(path):
     return file_count
 
 
-def Coverage2Coords(csvPath, geolocator, min_delay_seconds=2):
+def Coverage2Coords(csvPath, geolocator, min_delay_seconds=2,
+                    workers=4, use_cache=True, retry_failed=True):
     """
     ~~~GEOSPATIAL FUNCTIONS STILL IN BETA~~~
     Using GeoPy geolocator, try to convert Location names in
@@ -264,6 +555,12 @@ def Coverage2Coords(csvPath, geolocator, min_delay_seconds=2):
     Archive.DownloadCoverage() has been called prior to this
     function. Built around the example provided at
     https://geopy.readthedocs.io/en/latest/#usage-with-pandas
+
+    Only locations without coordinates are looked up, and results
+    are kept in a local cache ('GeocodeCache.sqlite' in csvPath), so
+    each location is only queried once across runs. Independent
+    lookups run concurrently under a shared rate limit. See
+    tools_geo.GeocodeLocations()
     
     NOTE: Function is not perfect, and almost certainly will
     require manual cleaning after the fact! However, can
@@ -276,27 +573,22 @@ def Coverage2Coords(csvPath, geolocator, min_delay_seconds=2):
         csvPath (str) : Path to metadata CSV files
         geolocator (obj) : A geolocator instance of one of
             the classes inside geopy.geocoders, such as
-            OpenMapQuest(api_key = 'user_api_key_here')
-        min_delay_seconds (float) : Time delay fed into the
-            geopy.extra.rate_limiter.RateLimiter to keep
-            repeated queries from overloading the servers and
-            violating the user's ToS with the geocoding service
+            OpenMapQuest(api_key = 'user_api_key_here'), or any
+            object with a compatible geocode() method
+        min_delay_seconds (float) : Shortest time between two
+            queries, to keep repeated queries from overloading
+            the servers and violating the user's ToS with the
+            geocoding service
+        workers (int) : Number of concurrent queries
+        use_cache (bool) : If True, use and update the local cache
+        retry_failed (bool) : If True, query again locations which
+            could not be found in previous runs
     Outputs:
         Updates the LocationCoords.csv file with coordinates
             for each Location found using a GeoPy search
     """
-    # Check if GeoPy is available
-    try:
-        from geopy.extra.rate_limiter import RateLimiter
-    except ImportError:
-        print("Function unavailable, requires installation of GeoPy")
-        print("Perform full setup for auxilary packages")
-        return
+    from .tools_geo import GeocodeCache, GeocodeLocations
 
-    # Set a rate limiter by default to keep within geolocator ToS
-    geocode = RateLimiter(geolocator.geocode,
-                          min_delay_seconds=min_delay_seconds)
-    
     # Load in csv of coverage
     csvname = os.path.join(csvPath, 'LocationCoords.csv')
     if not os.path.exists(csvname):
@@ -305,42 +597,36 @@ def Coverage2Coords(csvPath, geolocator, min_delay_seconds=2):
         return
     df = pd.read_csv(csvname, encoding = "ISO-8859-1",
                      low_memory=False)
-    
-    # Call GeoPy geocode function on the Location field of df
-    df['Details'] = df['Location'].apply(geocode)
-    df['Coord'] = df['Details'].apply(lambda loc: tuple(loc.point) if loc else None)
-    
-    # Sometimes default XMP syntax is bad for searches.
-    # For queries which failed, try again with simplified syntax
-    # Create sub-df of modified names, eliminate parenthetical
-    df['LocationMod'] = df['Location'].str.replace(r'\([^()]*\)', '')
-    df2 = df.loc[df['Coord'].isnull(), ['LocationMod']]
-
-    # Feed sub-df back into geocode
-    df2['Details'] = df2['LocationMod'].apply(geocode)
-    df2['Coord'] = df2['Details'].apply(lambda loc: tuple(loc.point) if loc else None)
-    
-    # Update original df with new data
-    df.update(df2) 
-
-    # Fix any remaining nulls in coordinates column with (0, 0, 0)
-    df2 = df.loc[df['Coord'].isnull(), ['Location']]
-    df2['Coord'] = [(0, 0, 0)] * len(df2)
-    df.update(df2) 
-
-    # Extract lat long from Coord
-    coord = df['Coord'].tolist()
-    lat = [p[0] for p in coord]
-    lon = [p[1] for p in coord]
-
-    df['Latitude'] = lat
-    df['Longitude'] = lon
-
-    # Delete extra columns no longer needed
-    df.drop(columns=['LocationMod', 'Coord'], inplace=True)
+    for col in ['Latitude', 'Longitude']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    if 'Details' not in df.columns:
+        df['Details'] = ''
+    df['Details'] = df['Details'].fillna('').astype(str)
+
+    # Only look up rows without coordinates, (0, 0) marks failures
+    todo = df['Latitude'].isnull() | df['Longitude'].isnull() \
+           | ((df['Latitude'] == 0) & (df['Longitude'] == 0))
+
+    cache = None
+    if use_cache:
+        cache = GeocodeCache(os.path.join(csvPath, 'GeocodeCache.sqlite'))
+    coords = GeocodeLocations(df.loc[todo, 'Location'].tolist(),
+                              geolocator, cache, min_delay_seconds,
+                              workers, retry_failed)
+    if cache is not None:
+        cache.Close()
+    coords = coords.set_index('Location')
+    for col in ['Latitude', 'Longitude', 'Details']:
+        df.loc[todo, col] = df.loc[todo, 'Location'].map(coords[col]).values
+
+    # Fix any remaining nulls in coordinates with (0, 0)
+    df[['Latitude', 'Longitude']] = df[['Latitude', 'Longitude']].fillna(0)
+    df['Details'] = df['Details'].fillna('')
+    print('Geocoded %d of %d new locations' \
+          % (int((todo & (df['Latitude'] != 0)).sum()), int(todo.sum())))
 
     # Query often returns complex characters, revert to default encoding
-    df = df.applymap(lambda x: str(x).encode("ISO-8859-1",
+    df['Details'] = df['Details'].map(lambda x: str(x).encode("ISO-8859-1",
              errors="ignore").decode("ISO-8859-1", errors="ignore"))
     # Save csv
     df.to_csv(csvname, index=False, encoding="ISO-8859-1")
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Tools for incremental, content-addressed backups of the collection.
+Each file's content is stored once as a blob named after its hash,
+and each snapshot is a manifest referencing those blobs, so a new
+snapshot only needs to store the files that changed.
+"""
+import os
+import gzip
+import time
+import shutil
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from .tools_duplicates import HashFile
+
+# File extensions (lowercase) that are already compressed, and
+# are stored as-is instead of deflated again
+COMPRESSED_TYPES = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'heic', 'heif',
+                    'mp4', 'm4v', 'mov', 'mkv', 'webm', '3gp', 'avi',
+                    'mp3', 'm4a', 'aac', 'ogg', 'flac', 'zip', 'gz',
+                    'bz2', 'xz', '7z', 'rar', 'pdf', 'cr2', 'nef', 'dng']
+
+
+def _BlobPath(store, h, stored):
+    """Path of the blob for hash h, sharded by its first two digits"""
+    ext = '.gz' if stored == 'gz' else ''
+    return os.path.join(store, 'objects', h[:2], h + ext)
+
+
+def _StoreBlob(job):
+    """
+    Copy (or compress) one file into the store, if its blob is
+    not there yet. Used as the worker of Snapshot()
+    """
+    path, blob, stored, level = job
+    if os.path.exists(blob):
+        return 0
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    tmp = blob + '.part'
+    with open(path, 'rb') as fsrc:
+        if stored == 'gz':
+            with gzip.open(tmp, 'wb', compresslevel=level) as fdst:
+                shutil.copyfileobj(fsrc, fdst, 1024**2)
+        else:
+            with open(tmp, 'wb') as fdst:
+                shutil.copyfileobj(fsrc, fdst, 1024**2)
+    os.replace(tmp, blob)
+    return os.path.getsize(blob)
+
+
+def ListSnapshots(store):
+    """
+    List the snapshots saved in a backup store, oldest first.
+
+    Inputs:
+        store (str) : Path to the backup store
+    Outputs:
+        snapshots (list) : Names of the snapshots
+    """
+    folder = os.path.join(store, 'snapshots')
+    if not os.path.exists(folder):
+        return []
+    snapshots = sorted(f[:-4] for f in os.listdir(folder) \
+                       if f.endswith('.csv'))
+    return snapshots
+
+
+def LoadSnapshot(store, snapshot=None):
+    """
+    Load the manifest of a snapshot.
+
+    Inputs:
+        store (str) : Path to the backup store
+        snapshot (str) : Name of the snapshot, default is the latest
+    Outputs:
+        manifest (pandas DataFrame) : DataFrame with columns Path
+            (relative to the backed-up root), Size, ModifyTime,
+            Hash and Stored ('raw' or 'gz')
+    """
+    if snapshot is None:
+        snapshots = ListSnapshots(store)
+        if len(snapshots) == 0:
+            raise FileNotFoundError('No snapshots in %s' % store)
+        snapshot = snapshots[-1]
+    csvname = os.path.join(store, 'snapshots', snapshot + '.csv')
+    manifest = pd.read_csv(csvname, encoding="ISO-8859-1",
+                           dtype={'Hash': str, 'Path': str})
+    return manifest
+
+
+def Snapshot(root, store, folders=None, workers=None,
+             compresslevel=6, verbose=True):
+    """
+    Save a new snapshot of the files below root into the store.
+    Files whose size and modification time match the previous
+    snapshot are not read again, and content already in the store
+    is not copied again. New content is compressed in parallel,
+    except for already-compressed media (see COMPRESSED_TYPES).
+
+    Inputs:
+        root (str) : Folder to back up, e.g. the CollectionPath
+        store (str) : Path to the backup store, created if needed
+        folders (list) : Subfolders of root to include, default is
+            everything below root
+        workers (int) : Number of threads used to hash and compress
+        compresslevel (int) : gzip compression level, from 1 to 9
+        verbose (bool) : If True, print a summary of the snapshot
+    Outputs:
+        name (str) : Name of the new snapshot
+    """
+    if folders is None:
+        folders = ['']
+    elif not isinstance(folders, list):
+        folders = [folders]
+
+    # List files below root
+    rows = []
+    for sf in folders:
+        for dirpath, dirs, files in os.walk(os.path.join(root, sf)):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                rows.append((os.path.relpath(path, root),
+                             st.st_size, st.st_mtime_ns))
+    manifest = pd.DataFrame(rows, columns=['Path', 'Size', 'ModifyTime'])
+    manifest['Hash'] = ''
+
+    # Reuse hashes of unchanged files from the previous snapshot
+    if len(ListSnapshots(store)) > 0:
+        old = LoadSnapshot(store)
+        old = old.set_index(['Path', 'Size', 'ModifyTime'])['Hash']
+        old = old[~old.index.duplicated()]
+        key = pd.MultiIndex.from_frame(manifest[['Path', 'Size',
+                                                 'ModifyTime']])
+        manifest['Hash'] = old.reindex(key).fillna('').values
+
+    # Hash new or modified files
+    todo = manifest['Hash'] == ''
+    paths = [os.path.join(root, p) for p in manifest.loc[todo, 'Path']]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        manifest.loc[todo, 'Hash'] = list(pool.map(HashFile, paths))
+
+    # Decide which blobs are stored raw or compressed
+    ext = manifest['Path'].str.rsplit('.', n=1).str[-1].str.lower()
+    manifest['Stored'] = 'gz'
+    manifest.loc[ext.isin(COMPRESSED_TYPES), 'Stored'] = 'raw'
+
+    # Store missing blobs in parallel
+    jobs = {}
+    for path, h, stored in zip(manifest['Path'], manifest['Hash'],
+                               manifest['Stored']):
+        blob = _BlobPath(store, h, stored)
+        if blob not in jobs and not os.path.exists(blob):
+            jobs[blob] = (os.path.join(root, path), blob,
+                          stored, compresslevel)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        written = sum(pool.map(_StoreBlob, jobs.values()))
+
+    # Save the manifest
+    name = time.strftime('%Y%m%d_%H%M%S')
+    os.makedirs(os.path.join(store, 'snapshots'), exist_ok=True)
+    while os.path.exists(os.path.join(store, 'snapshots', name + '.csv')):
+        time.sleep(1)
+        name = time.strftime('%Y%m%d_%H%M%S')
+    manifest.to_csv(os.path.join(store, 'snapshots', name + '.csv'),
+                    index=False, encoding="ISO-8859-1")
+    if verbose:
+        print('Snapshot %s: %d files, %d new blobs (%.1f MB written)' \
+              % (name, len(manifest), len(jobs), written / 1024**2))
+    return name
+
+
+def Restore(store, dst, snapshot=None, paths=None, workers=None):
+    """
+    Restore the files of a snapshot into a destination folder,
+    with their original modification times.
+
+    Inputs:
+        store (str) : Path to the backup store
+        dst (str) : Folder in which to restore the files
+        snapshot (str) : Name of the snapshot, default is the latest
+        paths (list) : Relative paths (files or folders) to restore,
+            default is everything in the snapshot
+        workers (int) : Number of threads used to restore files
+    Outputs:
+        restored (int) : Number of files restored
+    """
+    manifest = LoadSnapshot(store, snapshot)
+    if paths is not None:
+        if not isinstance(paths, list):
+            paths = [paths]
+        keep = pd.Series(False, index=manifest.index)
+        for p in paths:
+            p = os.path.normpath(p)
+            keep |= (manifest['Path'] == p) \
+                    | manifest['Path'].str.startswith(p + os.sep)
+        manifest = manifest[keep]
+
+    def restore_one(row):
+        path, h, stored, mtime = row
+        out = os.path.join(dst, path)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        blob = _BlobPath(store, h, stored)
+        opener = gzip.open if stored == 'gz' else open
+        with opener(blob, 'rb') as fsrc, open(out, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, 1024**2)
+        os.utime(out, ns=(mtime, mtime))
+        return
+
+    rows = zip(manifest['Path'], manifest['Hash'], manifest['Stored'],
+               manifest['ModifyTime'].astype('int64'))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(restore_one, rows))
+    return len(manifest)
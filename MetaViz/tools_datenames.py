@@ -4,11 +4,15 @@ Tools designed specifically for collections whose
 filenames are datetime strings
 """
 import os
+import re
 import pandas as pd
+from . import config as cf
+from . import tools_exif as exif
+from . import profiling as prof
 
 
 def Dates2Names(folder, dt_format='%Y%m%d_%H%M%S',
-                datesource='CreateDate'):
+                datesource='CreateDate', journal=None):
     """
     Send datetimes from the metadata field datesource into
     the filenames of the sourcefiles in the specified folder,
@@ -19,17 +23,56 @@ def Dates2Names(folder, dt_format='%Y%m%d_%H%M%S',
         dt_format (str) : Datetime format to use in the exiftool call
         datesource (str) : Metadate field from which to grab the dates,
             e.g. CreateDate or FileModifyDate
+        journal (tools_journal.Journal) : Optional journal in which
+            the renames are recorded, so the batch can be undone,
+            e.g. Archive.Journal('Dates2Names')
     Outputs:
         Updates the filenames in folder using exiftool
     """
-    # Run exiftool through bash shell command
-    cmd = ('exiftool -d %s%%%%-c.%%%%e "-filename<%s" %s' % (dt_format,
-                                                             datesource,
-                                                             folder))
-    os.system(cmd) # Run
+    if journal is None:
+        # Run exiftool through bash shell command
+        cmd = ('%s -d %s%%%%-c.%%%%e "-filename<%s" %s' % (cf.exiftool,
+                                                           dt_format,
+                                                           datesource,
+                                                           folder))
+        with prof.Subprocess():
+            os.system(cmd) # Run
+        return
+
+    # Dry run first, to record the planned renames ahead of time
+    args = ['-d', dt_format + '%%-c.%%e', folder]
+    result = exif.RunExiftool(['-testname<' + datesource] + args,
+                              capture=True)
+    oldNames, newNames = _ParseRenames(result.stdout)
+    journal.RecordRenames(oldNames, newNames)
+
+    # Rename, and record the actual renames if they differ
+    result = exif.RunExiftool(['-v', '-filename<' + datesource] + args,
+                              capture=True)
+    actual = _ParseRenames(result.stdout)
+    if actual != (oldNames, newNames):
+        planned = dict(zip(oldNames, newNames))
+        extra = [(o, n) for o, n in zip(*actual) if planned.get(o) != n]
+        journal.RecordRenames([e[0] for e in extra], [e[1] for e in extra])
+    journal.Close('done' if result.returncode == 0 else 'failed')
+    print('Renamed %d files' % len(actual[0]))
     return
 
 
+def _ParseRenames(output):
+    """
+    Parse the "'old' --> 'new'" lines printed by exiftool when
+    renaming files, into lists of old and new names
+    """
+    oldNames, newNames = [], []
+    for line in output.splitlines():
+        m = re.match(r"^\s*'(.+)' --> '(.+)'\s*$", line)
+        if m:
+            oldNames.append(m.group(1))
+            newNames.append(m.group(2))
+    return oldNames, newNames
+
+
 def Names2Dates(csvName,
                 datefields=['CreateDate','FileModifyDate'],
                 dt_format = '%Y%m%d_%H%M%S', numChar=15):
@@ -67,4 +110,177 @@ def Names2Dates(csvName,
     
     # Re-save CSV
     df.to_csv(csvName, index=False, encoding = "ISO-8859-1")
-    return
\ No newline at end of file
+    return
+
+#--------------------------------------
+# Archive-wide plans
+#--------------------------------------
+def NameDates(sourcefiles, dt_format='%Y%m%d_%H%M%S', numChar=15):
+    """
+    Parse datetimes from a column of filenames, using vectorized
+    string operations. Filenames which don't match dt_format
+    give NaT.
+
+    Inputs:
+        sourcefiles (pandas Series) : Filenames, with or without path
+        dt_format (str) : Datetime format of the filenames, given as
+            one of the formats recognized by pandas.to_datetime()
+        numChar (int) : Number of date characters in dt_format
+    Outputs:
+        dates (pandas Series) : Datetimes parsed from the filenames
+    """
+    names = sourcefiles.astype(str).str.rsplit(os.sep, n=1).str[-1]
+    names = names.str.split('.', n=1).str[0].str.slice(0, numChar)
+    dates = pd.to_datetime(names, format=dt_format, errors='coerce')
+    return dates
+
+
+def ExifDates(series):
+    """
+    Parse exiftool date strings (e.g. '2001:02:03 04:05:06.00+01:00')
+    into datetimes, ignoring subseconds and timezones. Invalid
+    dates give NaT.
+
+    Inputs:
+        series (pandas Series) : Dates as written by exiftool
+    Outputs:
+        dates (pandas Series) : Parsed datetimes
+    """
+    dates = pd.to_datetime(series.astype(str).str.slice(0, 19),
+                           format='%Y:%m:%d %H:%M:%S', errors='coerce')
+    return dates
+
+
+def _Selected(data, select):
+    """Boolean mask of the rows of data whose SourceFile is in select"""
+    if select is None:
+        return pd.Series(True, index=data.index)
+    select = set(select)
+    names = data['SourceFile'].str.rsplit(os.sep, n=1).str[-1]
+    mask = data['SourceFile'].isin(select) | names.isin(select)
+    return mask
+
+
+def _ShiftDates(dates, timedelta, mask):
+    """Shift the masked dates by timedelta, BatchTimedelta-style"""
+    if timedelta is not None:
+        dates = dates.where(~mask, dates + pd.Timedelta(timedelta))
+    return dates
+
+
+def _JoinPlan(frames, data):
+    """Concatenate parts of a plan, carrying the Subfolder of each file"""
+    plan = pd.concat(frames)
+    if 'Subfolder' in data.columns:
+        plan.insert(0, 'Subfolder', data['Subfolder'].loc[plan.index].values)
+    plan.reset_index(drop=True, inplace=True)
+    return plan
+
+
+def PlanNames2Dates(data, datefields=['CreateDate','FileModifyDate'],
+                    dt_format='%Y%m%d_%H%M%S', numChar=15,
+                    timedelta=None, select=None):
+    """
+    Plan the update of the date fields of every file from the date in
+    its filename, like Names2Dates(), but over a whole metadatabase
+    at once. Optionally shift the dates of some files by a constant
+    time-delta, like BatchTimedelta().
+
+    Inputs:
+        data (pandas DataFrame) : Metadatabase with a SourceFile column
+            and the datefields, with long column names, as read from
+            the csv files (e.g. Archive.ReadCSV())
+        datefields (list) : List of which date-related metadata
+            fields to update
+        dt_format (str) : Datetime format of the filenames, given as
+            one of the formats recognized by pandas.to_datetime()
+        numChar (int) : Number of date characters in dt_format
+        timedelta (str) : Constant timedelta to add to the dates of
+            the selected files, specified in a format recognized by
+            pandas.Timedelta(), such as "1hr"
+        select (list) : Filenames (with or without path) to which
+            the plan applies, default is every file
+    Outputs:
+        plan (pandas DataFrame) : Changes in the format of
+            tools_exif.DiffMetadata(), only for dates that differ
+    """
+    mask = _Selected(data, select)
+    dates = _ShiftDates(NameDates(data['SourceFile'], dt_format, numChar),
+                        timedelta, mask)
+    mask &= dates.notnull()
+    newvals = dates.dt.strftime('%Y:%m:%d %H:%M:%S')
+
+    frames = []
+    for field in datefields:
+        if field in data.columns:
+            oldvals = data[field].fillna('').astype(str)
+        else:
+            oldvals = pd.Series('', index=data.index)
+        changed = mask & (oldvals != newvals)
+        frames.append(pd.DataFrame({'SourceFile': data['SourceFile'][changed],
+                                    'Tag': field,
+                                    'OldValue': oldvals[changed],
+                                    'Value': newvals[changed]}))
+    plan = _JoinPlan(frames, data)
+    return plan
+
+
+def PlanDates2Names(data, dt_format='%Y%m%d_%H%M%S',
+                    datesource='CreateDate', timedelta=None,
+                    select=None):
+    """
+    Plan the renaming of every file after the date in its datesource
+    field, like Dates2Names(), but over a whole metadatabase at once.
+    Optionally shift the dates of some files by a constant time-delta
+    first, like BatchTimedelta(), which also updates datesource.
+    Name collisions are resolved when the plan is applied.
+
+    Inputs:
+        data (pandas DataFrame) : Metadatabase with a SourceFile column
+            and the datesource field, with long column names, as read
+            from the csv files (e.g. Archive.ReadCSV())
+        dt_format (str) : Datetime format to use in the filenames
+        datesource (str) : Metadata field from which to grab the
+            dates, e.g. CreateDate or FileModifyDate
+        timedelta (str) : Constant timedelta to add to the dates of
+            the selected files, specified in a format recognized by
+            pandas.Timedelta(), such as "1hr"
+        select (list) : Filenames (with or without path) to which
+            the plan applies, default is every file
+    Outputs:
+        plan (pandas DataFrame) : Changes in the format of
+            tools_exif.DiffMetadata(), where renames use the special
+            Tag 'FileName' with the old and new paths as values
+    """
+    mask = _Selected(data, select)
+    olddates = ExifDates(data[datesource])
+    dates = _ShiftDates(olddates, timedelta, mask)
+    mask &= dates.notnull()
+
+    frames = []
+    # Shifted dates
+    if timedelta is not None:
+        shifted = mask & (dates != olddates)
+        frames.append(pd.DataFrame({'SourceFile': data['SourceFile'][shifted],
+                                    'Tag': datesource,
+                                    'OldValue': data[datesource][shifted],
+                                    'Value': dates[shifted].dt.strftime(
+                                        '%Y:%m:%d %H:%M:%S')}))
+
+    # New filenames, keeping folder and extension
+    src = data['SourceFile'].astype(str)
+    parts = src.str.rsplit(os.sep, n=1)
+    folder = parts.str[0].where(parts.str.len() > 1, '')
+    name = parts.str[-1]
+    ext = name.str.rsplit('.', n=1).str[1].where(name.str.contains('.',
+                                                  regex=False), '')
+    newname = dates.dt.strftime(dt_format) \
+              + ext.map(lambda e: '.' + e if e else '')
+    newpath = (folder + os.sep).where(folder != '', '') + newname
+    renamed = mask & (newpath != src)
+    frames.append(pd.DataFrame({'SourceFile': src[renamed],
+                                'Tag': 'FileName',
+                                'OldValue': src[renamed],
+                                'Value': newpath[renamed]}))
+    plan = _JoinPlan(frames, data)
+    return plan
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Tools to detect files with identical content in the collection,
+using streaming BLAKE2 content hashes
+"""
+import os
+import mmap
+import hashlib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# Files above this size (bytes) are hashed through a memory map
+MMAP_THRESHOLD = 64 * 1024**2
+# Size of the chunks read for smaller files
+CHUNK_SIZE = 1024**2
+
+
+def HashFile(path, digest_size=20):
+    """
+    Compute the BLAKE2b content hash of a single file. Large files
+    are read through a memory map, smaller ones in fixed chunks, so
+    memory use stays constant regardless of file size.
+
+    Inputs:
+        path (str) : Path to the file to hash
+        digest_size (int) : Size of the digest in bytes
+    Outputs:
+        digest (str) : Hexadecimal content hash of the file
+    """
+    h = hashlib.blake2b(digest_size=digest_size)
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for start in range(0, size, CHUNK_SIZE):
+                    h.update(mm[start:start + CHUNK_SIZE])
+        else:
+            buf = bytearray(CHUNK_SIZE)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    return h.hexdigest()
+
+
+def ListFiles(folders):
+    """
+    List the files directly inside each of the given folders,
+    along with their size and modification time.
+
+    Inputs:
+        folders (list) : List of paths to folders to scan
+            (not recursive)
+    Outputs:
+        files (pandas DataFrame) : DataFrame with columns
+            SourceFile, Size and ModifyTime (ns since epoch)
+    """
+    rows = []
+    for folder in folders:
+        try:
+            entries = list(os.scandir(folder))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                rows.append((entry.path, st.st_size, st.st_mtime_ns))
+    files = pd.DataFrame(rows, columns=['SourceFile', 'Size', 'ModifyTime'])
+    return files
+
+
+def HashFiles(files, index=None, workers=None, hash_all=False):
+    """
+    Build a content-hash index for a set of files. Files are first
+    grouped by size, and only files sharing their size with at least
+    one other file are hashed (a file with a unique size cannot have
+    a duplicate). Hashes from a previous index are reused for files
+    whose size and modification time have not changed.
+
+    Inputs:
+        files (list or pandas DataFrame) : List of file paths, or
+            the output of ListFiles()
+        index (pandas DataFrame) : Previous output of HashFiles(),
+            whose hashes are reused where still valid
+        workers (int) : Number of threads used for hashing, default
+            lets concurrent.futures decide
+        hash_all (bool) : If True, hash every file, even those
+            with a unique size
+    Outputs:
+        index (pandas DataFrame) : DataFrame with columns SourceFile,
+            Size, ModifyTime and Hash (empty for unhashed files)
+    """
+    if not isinstance(files, pd.DataFrame):
+        rows = []
+        for name in files:
+            st = os.stat(name)
+            rows.append((name, st.st_size, st.st_mtime_ns))
+        files = pd.DataFrame(rows, columns=['SourceFile', 'Size',
+                                            'ModifyTime'])
+    df = files[['SourceFile', 'Size', 'ModifyTime']].copy()
+    df['Hash'] = ''
+
+    # Reuse hashes from the previous index where file is unchanged
+    if index is not None and len(index) > 0:
+        old = index[index['Hash'].fillna('') != '']
+        old = old.set_index(['SourceFile', 'Size', 'ModifyTime'])['Hash']
+        old = old[~old.index.duplicated()]
+        key = pd.MultiIndex.from_frame(df[['SourceFile', 'Size',
+                                           'ModifyTime']])
+        df['Hash'] = old.reindex(key).fillna('').values
+
+    # Only hash same-size candidates which don't have a hash yet
+    if hash_all:
+        candidates = df['Hash'] == ''
+    else:
+        candidates = df['Size'].duplicated(keep=False) & (df['Hash'] == '')
+    todo = df.loc[candidates, 'SourceFile'].tolist()
+
+    if len(todo) > 0:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashes = list(pool.map(HashFile, todo))
+        df.loc[candidates, 'Hash'] = hashes
+
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def FindDuplicates(index):
+    """
+    Report groups of files with identical content from a
+    content-hash index.
+
+    Inputs:
+        index (pandas DataFrame) : Output of HashFiles()
+    Outputs:
+        dups (pandas DataFrame) : DataFrame with columns Group, Hash,
+            Size, SourceFile and Original, with one row per file that
+            has at least one exact duplicate. Within each group, the
+            first file (by path) is flagged as the Original.
+    """
+    df = index[index['Hash'].fillna('') != '']
+    df = df[df.duplicated(['Hash', 'Size'], keep=False)]
+    df = df.sort_values(['Hash', 'SourceFile'])
+    df = df[['Hash', 'Size', 'SourceFile']].reset_index(drop=True).copy()
+    df.insert(0, 'Group', df.groupby(['Hash', 'Size'], sort=False).ngroup())
+    df['Original'] = ~df.duplicated(['Hash', 'Size'])
+    return df
+
+
+def DuplicateSummary(dups):
+    """
+    Summarize the output of FindDuplicates() into a single line
+    per group, with the wasted space of each group.
+
+    Inputs:
+        dups (pandas DataFrame) : Output of FindDuplicates()
+    Outputs:
+        summary (pandas DataFrame) : DataFrame with columns Group,
+            Original, Copies and Wasted (bytes), sorted by Wasted
+    """
+    g = dups.groupby('Group')
+    summary = pd.DataFrame({'Original': g['SourceFile'].first(),
+                            'Copies': g.size() - 1,
+                            'Size': g['Size'].first()})
+    summary['Wasted'] = summary['Copies'] * summary['Size']
+    summary = summary.drop(columns='Size').reset_index()
+    summary = summary.sort_values('Wasted', ascending=False)
+    summary.reset_index(drop=True, inplace=True)
+    return summary
+
+
+def UniqueFiles(sourcefiles, workers=None):
+    """
+    Drop files whose content is identical to an earlier file in
+    the given list, keeping the first occurrence of each.
+
+    Inputs:
+        sourcefiles (list) : List of paths to files
+        workers (int) : Number of threads used for hashing
+    Outputs:
+        unique (list) : Files with distinct content, in input order
+        skipped (dict) : Mapping of each skipped duplicate to the
+            file it duplicates
+    """
+    index = HashFiles(list(dict.fromkeys(sourcefiles)), workers=workers)
+    kept = {}
+    unique = []
+    skipped = {}
+    for name, size, h in zip(index['SourceFile'], index['Size'],
+                             index['Hash']):
+        if h == '':
+            unique.append(name)
+        elif (h, size) in kept:
+            skipped[name] = kept[(h, size)]
+        else:
+            kept[(h, size)] = name
+            unique.append(name)
+    return unique, skipped
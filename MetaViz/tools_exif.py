@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tools to interface with exiftool, including finding the minimal
+set of metadata changes between two versions of a metadatabase CSV
+and writing only those changes back into the media files
+"""
+import html
+import shlex
+import subprocess
+import pandas as pd
+from . import config as cf
+from . import profiling as prof
+
+
+def ExiftoolCommand():
+    """
+    Split the exiftool command from config into a list of arguments
+
+    Outputs:
+        cmd (list) : Command used to call exiftool
+    """
+    return shlex.split(cf.exiftool)
+
+
+def RunExiftool(args, capture=False):
+    """
+    Run exiftool with a list of arguments.
+
+    Inputs:
+        args (list) : Arguments to pass to exiftool
+        capture (bool) : If True, capture and return the output
+            instead of printing it
+    Outputs:
+        result (subprocess.CompletedProcess) : Completed exiftool call
+    """
+    with prof.Subprocess():
+        result = subprocess.run(ExiftoolCommand() + list(args),
+                                capture_output=capture, text=capture)
+    return result
+
+
+def DiffMetadata(old, new, key='SourceFile'):
+    """
+    Compare two versions of a metadatabase table and list every
+    tag value that differs. Values are compared as strings, with
+    missing values treated as empty. Rows of new which are not in
+    old are ignored, as their files were not extracted.
+
+    Inputs:
+        old (pandas DataFrame) : Table as last extracted by exiftool
+        new (pandas DataFrame) : Edited version of the same table
+        key (str) : Column identifying the files
+    Outputs:
+        changes (pandas DataFrame) : Long-form DataFrame with columns
+            SourceFile, Tag, OldValue and Value, one row per changed
+            tag of each file
+    """
+    old = old.drop_duplicates(key).set_index(key)
+    new = new.drop_duplicates(key).set_index(key)
+    new = new[new.index.isin(old.index)]
+    old = old.reindex(new.index)
+
+    frames = []
+    for tag in new.columns:
+        after = new[tag].astype(object).where(new[tag].notnull(), '')
+        after = after.astype(str)
+        if tag in old.columns:
+            before = old[tag].astype(object).where(old[tag].notnull(), '')
+            before = before.astype(str)
+        else:
+            before = pd.Series('', index=old.index)
+        changed = before != after
+        if changed.any():
+            frames.append(pd.DataFrame({'SourceFile': new.index[changed],
+                                        'Tag': tag,
+                                        'OldValue': before[changed].values,
+                                        'Value': after[changed].values}))
+    if len(frames) == 0:
+        return pd.DataFrame(columns=['SourceFile', 'Tag',
+                                     'OldValue', 'Value'])
+    changes = pd.concat(frames, ignore_index=True)
+    return changes
+
+
+def GroupChanges(changes):
+    """
+    Group files which receive exactly the same tag assignments,
+    so that each group can be written with a single set of
+    exiftool arguments.
+
+    Inputs:
+        changes (pandas DataFrame) : Output of DiffMetadata()
+    Outputs:
+        groups (list) : List of (assignments, files) tuples, where
+            assignments is a tuple of (tag, value) pairs and files
+            is a list of SourceFiles
+    """
+    groups = {}
+    changes = changes.sort_values(['SourceFile', 'Tag'])
+    for name, df in changes.groupby('SourceFile', sort=False):
+        assignments = tuple(zip(df['Tag'], df['Value']))
+        groups.setdefault(assignments, []).append(name)
+    return list(groups.items())
+
+
+def WriteArgfile(groups, argfile, batch_size=None, delete_empty=False):
+    """
+    Write an exiftool argfile applying each group of assignments to
+    its files, with groups separated by -execute so that a single
+    exiftool process handles everything. Values are HTML-escaped
+    (for use with -E) so that newlines survive the argfile format.
+
+    Inputs:
+        groups (list) : Output of GroupChanges()
+        argfile (str) : Path of the argfile to write
+        batch_size (int) : Largest number of files per -execute
+            section, default is no limit
+        delete_empty (bool) : If True, empty values delete their tag
+            from the files. Default is to skip them, as exiftool
+            does when importing a csv
+    Outputs:
+        n_files (int) : Number of files in the argfile
+    """
+    n_files = 0
+    sections = []
+    for assignments, files in groups:
+        if not delete_empty:
+            assignments = [(tag, value) for tag, value in assignments \
+                           if value != '']
+        if len(assignments) == 0:
+            continue
+        if batch_size is None:
+            batches = [files]
+        else:
+            batches = [files[i:i+batch_size] \
+                       for i in range(0, len(files), batch_size)]
+        for batch in batches:
+            lines = []
+            for tag, value in assignments:
+                value = html.escape(value, quote=False)
+                value = value.replace('\n', '&#xa;')
+                lines.append('-%s=%s\n' % (tag, value))
+            lines.extend(name + '\n' for name in batch)
+            sections.append(''.join(lines))
+            n_files += len(batch)
+    with open(argfile, 'w', encoding='utf-8') as f:
+        f.write('-execute\n'.join(sections))
+    return n_files
+
+
+def ApplyChanges(changes, argfile, batch_size=1000,
+                 preserve_dates=True, delete_empty=False):
+    """
+    Write a set of metadata changes into the media files using one
+    exiftool call, through an argfile. Files are edited in place.
+
+    Inputs:
+        changes (pandas DataFrame) : Output of DiffMetadata(), or
+            any DataFrame with columns SourceFile, Tag and Value
+        argfile (str) : Path of the argfile to write
+        batch_size (int) : Largest number of files per -execute
+            section of the argfile
+        preserve_dates (bool) : If True, keep the filesystem
+            modification dates of the files (exiftool -P)
+        delete_empty (bool) : If True, empty values delete their tag,
+            see WriteArgfile()
+    Outputs:
+        result (subprocess.CompletedProcess) : Completed exiftool call,
+            or None if there was nothing to write
+    """
+    if len(changes) == 0:
+        return None
+    groups = GroupChanges(changes)
+    if WriteArgfile(groups, argfile, batch_size, delete_empty) == 0:
+        return None
+    common = ['-overwrite_original_in_place', '-F', '-E',
+              '-charset', 'filename=utf8']
+    if preserve_dates:
+        common.append('-P')
+    result = RunExiftool(['-@', argfile, '-common_args'] + common)
+    return result
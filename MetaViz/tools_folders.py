@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tools to discover the subfolders of the collection. Directories are
+listed in parallel with os.scandir (files are never stat-ed), and the
+result is cached along with the modification time of every directory,
+so that later calls only list again the directories which changed.
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+
+def Excluded(rel, exclude):
+    """
+    Check if a relative path falls in one of the excluded folders.
+    Exclusions match whole path components, so 'Images' excludes
+    'Images' and 'Trip/Images/raw', but not 'MyImages'.
+
+    Inputs:
+        rel (str) : Path relative to the collection
+        exclude (list) : Folder names or relative paths to exclude
+    Outputs:
+        excluded (bool) : True if rel is inside an excluded folder
+    """
+    parts = rel.split(os.sep)
+    for ex in exclude:
+        ex_parts = os.path.normpath(ex).strip(os.sep).split(os.sep)
+        n = len(ex_parts)
+        for i in range(len(parts) - n + 1):
+            if parts[i:i+n] == ex_parts:
+                return True
+    return False
+
+
+def _ListDirs(job):
+    """
+    List the child directories of a directory, unless its
+    modification time matches the cached one, in which case the
+    cached children are returned. Missing directories return None
+    """
+    path, cached = job
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        if cached is not None and cached[0] == mtime:
+            return cached
+        with os.scandir(path) as it:
+            dirs = sorted(e.name for e in it \
+                          if e.is_dir(follow_symlinks=False))
+    except OSError:
+        return None
+    return [mtime, dirs]
+
+
+def ScanFolders(root, exclude=[], workers=16, cachefile=None):
+    """
+    List every subfolder below root, excluding any in exclude.
+    Each level of the tree is listed in parallel. If a cache file
+    is given (and was saved for the same root and exclude), only
+    directories whose modification time changed since are listed
+    again, the others are just stat-ed, and the cache is updated.
+
+    Inputs:
+        root (str) : Absolute path of the collection
+        exclude (list) : Folder names or relative paths to exclude,
+            see Excluded()
+        workers (int) : Number of threads listing directories
+        cachefile (str) : Path of a json file in which to cache the
+            directory tree, default is no caching
+    Outputs:
+        subfolders (list) : Sorted paths of the subfolders, relative
+            to root
+    """
+    exclude = list(exclude)
+    cached = {}
+    if cachefile is not None and os.path.exists(cachefile):
+        try:
+            with open(cachefile) as f:
+                cache = json.load(f)
+            if cache['root'] == root and cache['exclude'] == exclude:
+                cached = cache['tree']
+        except (OSError, ValueError, KeyError):
+            cached = {}
+
+    # Breadth-first walk, one parallel call per level
+    tree = {}
+    frontier = ['']
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while len(frontier) > 0:
+            jobs = [(os.path.join(root, rel), cached.get(rel)) \
+                    for rel in frontier]
+            nxt = []
+            for rel, entry in zip(frontier, pool.map(_ListDirs, jobs)):
+                if entry is None:
+                    continue
+                tree[rel] = entry
+                for d in entry[1]:
+                    child = os.path.join(rel, d) if rel else d
+                    if not Excluded(child, exclude):
+                        nxt.append(child)
+            frontier = nxt
+
+    if cachefile is not None:
+        tmp = cachefile + '.part'
+        try:
+            os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump({'root': root, 'exclude': exclude,
+                           'tree': tree}, f)
+            os.replace(tmp, cachefile)
+        except OSError:
+            # Read-only location, the tree is just not cached
+            if os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    subfolders = sorted(rel for rel in tree if rel != '')
+    return subfolders
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+~~~GEOSPATIAL FUNCTIONS STILL IN BETA~~~
+Tools for geocoding the locations in the Coverage field, with a
+persistent local cache so each location is only looked up once,
+and for spatial queries over the located files
+"""
+import os
+import re
+import time
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+
+def NormalizeLocation(location):
+    """
+    Normalize a location string into the key used by the geocode
+    cache: lowercase, with whitespace and commas collapsed.
+
+    Inputs:
+        location (str) : Location name, e.g. 'Austin,  Texas '
+    Outputs:
+        key (str) : Normalized location, e.g. 'austin, texas'
+    """
+    key = re.sub(r'\s+', ' ', str(location)).strip().casefold()
+    key = re.sub(r'\s*,\s*', ', ', key)
+    return key
+
+
+def SimplifyLocation(location):
+    """
+    Simplify a location name for a second geocoding attempt, as
+    default XMP syntax is sometimes bad for searches. Removes
+    parentheticals, e.g. 'Zilker Park (Austin)' -> 'Zilker Park'
+
+    Inputs:
+        location (str) : Location name
+    Outputs:
+        simple (str) : Simplified location name
+    """
+    simple = re.sub(r'\([^()]*\)', '', str(location))
+    simple = re.sub(r'\s+', ' ', simple).strip()
+    return simple
+
+
+class GeocodeCache():
+    """
+    Persistent cache of geocoding results in a SQLite database,
+    keyed by normalized location string. Failed lookups are cached
+    too, with missing coordinates. Safe to share between threads.
+    """
+    def __init__(self, dbname):
+        self.dbname = dbname
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(dbname, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS geocode ('
+                         'key TEXT PRIMARY KEY, location TEXT, '
+                         'latitude REAL, longitude REAL, '
+                         'details TEXT, updated REAL)')
+        self._db.commit()
+
+
+    def Get(self, locations):
+        """
+        Look up locations in the cache.
+
+        Inputs:
+            locations (list) : Location names
+        Outputs:
+            found (dict) : Mapping of normalized keys found in the
+                cache to (latitude, longitude, details) tuples, with
+                latitude and longitude None for failed lookups
+        """
+        keys = list(dict.fromkeys(NormalizeLocation(l) for l in locations))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start+500]
+                rows = self._db.execute(
+                    'SELECT key, latitude, longitude, details FROM geocode '
+                    'WHERE key IN (%s)' % ','.join('?'*len(chunk)), chunk)
+                for key, lat, lon, details in rows:
+                    found[key] = (lat, lon, details)
+        return found
+
+
+    def Put(self, location, latitude, longitude, details=''):
+        """
+        Store the result of a lookup in the cache.
+
+        Inputs:
+            location (str) : Location name
+            latitude (float) : Latitude, or None if the lookup failed
+            longitude (float) : Longitude, or None if the lookup failed
+            details (str) : Address returned by the geocoder
+        """
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO geocode VALUES '
+                             '(?, ?, ?, ?, ?, ?)',
+                             (NormalizeLocation(location), location,
+                              latitude, longitude, details, time.time()))
+            self._db.commit()
+        return
+
+
+    def Close(self):
+        """Close the database connection"""
+        self._db.close()
+        return
+
+
+class RateBudget():
+    """
+    Rate limit shared between threads: calls to Wait() return at
+    least min_delay_seconds apart, however many threads call it.
+    """
+    def __init__(self, min_delay_seconds):
+        self.min_delay_seconds = min_delay_seconds
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+
+    def Wait(self):
+        """Block until the next call is allowed"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.min_delay_seconds
+        if start > now:
+            time.sleep(start - now)
+        return
+
+
+def _Coordinates(loc):
+    """Extract (latitude, longitude, details) from a geocoder result"""
+    if loc is None:
+        return None, None, ''
+    if hasattr(loc, 'latitude'):
+        lat, lon = loc.latitude, loc.longitude
+    else:
+        lat, lon = tuple(loc.point)[0:2]
+    details = getattr(loc, 'address', str(loc))
+    return float(lat), float(lon), str(details)
+
+
+def GeocodeLocations(locations, geolocator, cache=None,
+                     min_delay_seconds=2, workers=4,
+                     retry_failed=True, max_retries=2):
+    """
+    Geocode a list of location names, only querying the geolocator
+    for locations which are not in the cache (or failed before, if
+    retry_failed). Independent lookups run concurrently, under a
+    shared rate budget of one query every min_delay_seconds. Locations
+    which can't be found are retried with a simplified name.
+
+    Inputs:
+        locations (list) : Location names
+        geolocator (obj) : Object with a geocode(query) method, e.g.
+            one of the classes inside geopy.geocoders, returning an
+            object with latitude/longitude (or point) attributes, or
+            None if the location was not found
+        cache (GeocodeCache) : Cache of previous results, default
+            is no cache
+        min_delay_seconds (float) : Shortest time between two queries,
+            to keep within the ToS of the geocoding service
+        workers (int) : Number of concurrent queries
+        retry_failed (bool) : If True, query again locations which
+            failed in a previous call
+        max_retries (int) : Number of retries of a query raising an
+            error (e.g. a timeout), with exponential backoff
+    Outputs:
+        coords (pandas DataFrame) : DataFrame with columns Location,
+            Latitude, Longitude and Details, NaN where not found
+    """
+    locations = list(dict.fromkeys(locations))
+    found = cache.Get(locations) if cache is not None else {}
+    todo = []
+    for loc in locations:
+        hit = found.get(NormalizeLocation(loc))
+        if hit is None or (retry_failed and hit[0] is None):
+            todo.append(loc)
+
+    budget = RateBudget(min_delay_seconds)
+
+    def query(q):
+        for attempt in range(max_retries + 1):
+            budget.Wait()
+            try:
+                return geolocator.geocode(q)
+            except Exception:
+                if attempt == max_retries:
+                    raise
+                time.sleep(min_delay_seconds * 2**attempt)
+
+    def lookup(loc):
+        try:
+            result = _Coordinates(query(loc))
+            simple = SimplifyLocation(loc)
+            if result[0] is None and simple and simple != loc:
+                result = _Coordinates(query(simple))
+        except Exception:
+            # Don't cache errors, so they are retried next time
+            return loc, (None, None, '')
+        if cache is not None:
+            cache.Put(loc, *result)
+        return loc, result
+
+    if len(todo) > 0:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for loc, result in pool.map(lookup, todo):
+                found[NormalizeLocation(loc)] = result
+
+    rows = []
+    for loc in locations:
+        lat, lon, details = found.get(NormalizeLocation(loc),
+                                      (None, None, ''))
+        rows.append((loc, lat, lon, details))
+    coords = pd.DataFrame(rows, columns=['Location', 'Latitude',
+                                         'Longitude', 'Details'])
+    coords[['Latitude', 'Longitude']] = \
+        coords[['Latitude', 'Longitude']].astype(float)
+    return coords
+
+
+#--------------------------------------
+# Spatial index
+#--------------------------------------
+EARTH_RADIUS_KM = 6371.0
+
+
+def Haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between points, in km. Accepts scalars
+    or numpy arrays (in degrees).
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1)/2)**2 \
+        + np.cos(lat1)*np.cos(lat2)*np.sin((lon2 - lon1)/2)**2
+    return 2*EARTH_RADIUS_KM*np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def LocateFiles(data, coords, delimiter=', '):
+    """
+    Join the Coverage entries of each file to their coordinates.
+
+    Inputs:
+        data (pandas DataFrame) : Output of Archive.GrabData() with
+            the SourceFile and Coverage fields
+        coords (pandas DataFrame) : Contents of LocationCoords.csv,
+            with Location, Latitude and Longitude columns
+        delimiter (str) : String delimiter used to separate
+            entries in the Coverage column
+    Outputs:
+        located (pandas DataFrame) : DataFrame with columns SourceFile,
+            Location, Latitude and Longitude, one row per located
+            Coverage entry of each file
+    """
+    df = data[['SourceFile', 'Coverage']].dropna()
+    df = df.assign(Location=df['Coverage'].str.split(delimiter))
+    df = df.explode('Location')[['SourceFile', 'Location']]
+    coords = coords[['Location', 'Latitude', 'Longitude']].copy()
+    for col in ['Latitude', 'Longitude']:
+        coords[col] = pd.to_numeric(coords[col], errors='coerce')
+    # (0, 0) marks locations which couldn't be geocoded
+    coords = coords[coords['Latitude'].notnull() \
+                    & coords['Longitude'].notnull() \
+                    & ~((coords['Latitude'] == 0) \
+                        & (coords['Longitude'] == 0))]
+    coords = coords.drop_duplicates('Location')
+    located = df.merge(coords, on='Location', how='inner')
+    located.reset_index(drop=True, inplace=True)
+    return located
+
+
+class SpatialIndex():
+    """
+    Grid-hash index over the coordinates of located files, for fast
+    radius and bounding-box queries. Points are sorted by grid cell,
+    so a query only scans the cells overlapping its bounding box.
+    """
+    def __init__(self, located, cell_deg=0.5):
+        """
+        Inputs:
+            located (pandas DataFrame) : Output of LocateFiles(), or any
+                DataFrame with SourceFile, Latitude and Longitude
+            cell_deg (float) : Size of the grid cells, in degrees
+        """
+        self.cell_deg = cell_deg
+        self.n_lat = int(np.ceil(180/cell_deg))
+        self.n_lon = int(np.ceil(360/cell_deg))
+        lat = located['Latitude'].to_numpy(dtype=float)
+        lon = located['Longitude'].to_numpy(dtype=float)
+        cells = self._Cell(lat, lon)
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+        self.SourceFile = located['SourceFile'].to_numpy()[order]
+        if 'Location' in located.columns:
+            self.Location = located['Location'].to_numpy()[order]
+
+
+    def __len__(self):
+        return len(self.cells)
+
+
+    def _Cell(self, lat, lon):
+        """Grid cell ID of each point"""
+        i = np.clip(((np.asarray(lat) + 90)//self.cell_deg).astype(np.int64),
+                    0, self.n_lat - 1)
+        j = np.clip(((np.asarray(lon) + 180)//self.cell_deg).astype(np.int64),
+                    0, self.n_lon - 1)
+        return i*self.n_lon + j
+
+
+    def _Candidates(self, south, west, north, east):
+        """Rows of all points in the grid cells overlapping a box"""
+        i0, j0 = divmod(int(self._Cell(south, west)), self.n_lon)
+        i1, j1 = divmod(int(self._Cell(north, east)), self.n_lon)
+        rows = []
+        for i in range(i0, i1 + 1):
+            # Cells of one latitude band are contiguous
+            lo = np.searchsorted(self.cells, i*self.n_lon + j0, 'left')
+            hi = np.searchsorted(self.cells, i*self.n_lon + j1, 'right')
+            rows.append(np.arange(lo, hi))
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(rows)
+
+
+    def _Files(self, rows, withPath):
+        """Sorted unique SourceFiles of some rows"""
+        files = sorted(set(self.SourceFile[rows]))
+        if not withPath:
+            files = [f.split(os.sep)[-1] for f in files]
+        return files
+
+
+    def BoundingBox(self, south, west, north, east, withPath=False):
+        """
+        Find the files located inside a bounding box. Boxes crossing
+        the antimeridian can be given with west > east.
+
+        Inputs:
+            south, west, north, east (float) : Bounds of the box,
+                in degrees
+            withPath (bool) : Returns just filenames if False,
+                returns full path if true
+        Outputs:
+            FileNames (list) : List of files in the box
+        """
+        rows = self._BoxRows(south, west, north, east)
+        return self._Files(rows, withPath)
+
+
+    def _BoxRows(self, south, west, north, east):
+        """Rows of the points inside a bounding box"""
+        if west > east:
+            return np.concatenate([self._BoxRows(south, west, north, 180),
+                                   self._BoxRows(south, -180, north, east)])
+        rows = self._Candidates(south, west, north, east)
+        inside = (self.lat[rows] >= south) & (self.lat[rows] <= north) \
+                 & (self.lon[rows] >= west) & (self.lon[rows] <= east)
+        return rows[inside]
+
+
+    def Radius(self, lat, lon, km, withPath=False):
+        """
+        Find the files located within some distance of a point.
+
+        Inputs:
+            lat, lon (float) : Coordinates of the point, in degrees
+            km (float) : Search radius, in km
+            withPath (bool) : Returns just filenames if False,
+                returns full path if true
+        Outputs:
+            FileNames (list) : List of files within the radius
+        """
+        dlat = np.degrees(km/EARTH_RADIUS_KM)
+        south, north = max(lat - dlat, -90), min(lat + dlat, 90)
+        coslat = np.cos(np.radians(max(abs(south), abs(north))))
+        if coslat < 1e-6 or dlat/coslat >= 180:
+            west, east = -180, 180
+        else:
+            dlon = dlat/coslat
+            west = (lon - dlon + 180) % 360 - 180
+            east = (lon + dlon + 180) % 360 - 180
+        rows = self._BoxRows(south, west, north, east)
+        near = Haversine(lat, lon, self.lat[rows], self.lon[rows]) <= km
+        return self._Files(rows[near], withPath)
+
+
+    def Density(self, cell_deg=None, bbox=None):
+        """
+        Count located files in a regular lat/lon grid, e.g. for
+        plotting with plot_geospatial.MapDensity()
+
+        Inputs:
+            cell_deg (float) : Size of the bins, in degrees, default
+                is the cell size of the index
+            bbox (list) : Bounds [south, west, north, east] of the
+                grid, default is the whole globe
+        Outputs:
+            counts (numpy array) : Count of points in each bin, of
+                shape (n_lat, n_lon), south to north
+            lat_edges (numpy array) : Latitude edges of the bins
+            lon_edges (numpy array) : Longitude edges of the bins
+        """
+        if cell_deg is None:
+            cell_deg = self.cell_deg
+        if bbox is None:
+            bbox = [-90, -180, 90, 180]
+        south, west, north, east = bbox
+        lat_edges = np.arange(south, north + cell_deg/2, cell_deg)
+        lon_edges = np.arange(west, east + cell_deg/2, cell_deg)
+        counts, _, _ = np.histogram2d(self.lat, self.lon,
+                                      bins=[lat_edges, lon_edges])
+        return counts, lat_edges, lon_edges
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Lightweight write-ahead journal for bulk metadata edits and file
+renames. Before each batch of writes, the original tag values and
+file names of the affected files are recorded, so that the batch
+can later be undone with Rollback() without a full backup.
+"""
+import os
+import json
+import time
+import pandas as pd
+from . import tools_exif as exif
+
+COLUMNS = ['Action', 'Subfolder', 'SourceFile', 'Tag',
+           'OldValue', 'NewValue']
+
+
+class Journal():
+    """
+    Journal of one batch of writes. Records are appended (and
+    flushed to disk) before the corresponding writes are made.
+    Can be used as a context manager, which marks the batch as
+    'done' on success and 'failed' if an exception is raised.
+    """
+    def __init__(self, folder, description=''):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.folder = folder
+        # Unique, time-sortable batch ID
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        n = 0
+        while os.path.exists(os.path.join(folder, '%s_%03d.csv' % (stamp, n))):
+            n += 1
+        self.batch_id = '%s_%03d' % (stamp, n)
+        self.csvname = os.path.join(folder, self.batch_id + '.csv')
+        self.metaname = os.path.join(folder, self.batch_id + '.json')
+        pd.DataFrame(columns=COLUMNS).to_csv(self.csvname, index=False,
+                                             encoding="ISO-8859-1")
+        self.meta = {'BatchID': self.batch_id,
+                     'Description': description,
+                     'Time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                     'Status': 'open'}
+        self._SaveMeta()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close('failed' if exc_type is not None else 'done')
+        return False
+
+
+    def _SaveMeta(self):
+        with open(self.metaname, 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        return
+
+
+    def _Append(self, df):
+        """Append records to the journal and force them to disk"""
+        with open(self.csvname, 'a', encoding="ISO-8859-1",
+                  newline='') as f:
+            df[COLUMNS].to_csv(f, index=False, header=False)
+            f.flush()
+            os.fsync(f.fileno())
+        return
+
+
+    def RecordTags(self, changes):
+        """
+        Record the original values of tags about to be written.
+
+        Inputs:
+            changes (pandas DataFrame) : DataFrame with columns
+                SourceFile, Tag, OldValue and Value, e.g. the output
+                of Archive.DiffMetadata()
+        """
+        df = pd.DataFrame({'Action': 'tag',
+                           'SourceFile': changes['SourceFile'].values,
+                           'Tag': changes['Tag'].values,
+                           'OldValue': changes['OldValue'].values,
+                           'NewValue': changes['Value'].values})
+        if 'Subfolder' in changes.columns:
+            df['Subfolder'] = changes['Subfolder'].values
+        else:
+            df['Subfolder'] = ''
+        self._Append(df)
+        return
+
+
+    def RecordRenames(self, oldNames, newNames):
+        """
+        Record file renames about to be made.
+
+        Inputs:
+            oldNames (list) : Current paths of the files
+            newNames (list) : New paths of the files
+        """
+        df = pd.DataFrame({'Action': 'rename', 'Subfolder': '',
+                           'SourceFile': list(oldNames), 'Tag': '',
+                           'OldValue': list(oldNames),
+                           'NewValue': list(newNames)})
+        self._Append(df)
+        return
+
+
+    def Close(self, status='done'):
+        """
+        Mark the batch as finished.
+
+        Inputs:
+            status (str) : Final status of the batch
+        """
+        self.meta['Status'] = status
+        self._SaveMeta()
+        return
+
+
+def ListBatches(folder):
+    """
+    List the batches recorded in a journal folder, oldest first.
+
+    Inputs:
+        folder (str) : Journal folder
+    Outputs:
+        batches (pandas DataFrame) : DataFrame with columns BatchID,
+            Description, Time, Status and Records
+    """
+    rows = []
+    if os.path.exists(folder):
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(folder, name)) as f:
+                meta = json.load(f)
+            records = LoadBatch(folder, meta['BatchID'])
+            meta['Records'] = len(records)
+            rows.append(meta)
+    batches = pd.DataFrame(rows, columns=['BatchID', 'Description', 'Time',
+                                          'Status', 'Records'])
+    return batches
+
+
+def LoadBatch(folder, batch_id):
+    """
+    Load the records of a batch.
+
+    Inputs:
+        folder (str) : Journal folder
+        batch_id (str) : ID of the batch
+    Outputs:
+        records (pandas DataFrame) : Records of the batch, in the
+            order in which they were written
+    """
+    records = pd.read_csv(os.path.join(folder, batch_id + '.csv'),
+                          encoding="ISO-8859-1", dtype=str,
+                          keep_default_na=False)
+    return records
+
+
+def Rollback(folder, batch_id, verbose=True):
+    """
+    Undo a batch of writes, restoring the original tag values and
+    file names recorded in the journal, in reverse order. Batches
+    that came later and touched the same files should be rolled
+    back first.
+
+    Inputs:
+        folder (str) : Journal folder
+        batch_id (str) : ID of the batch to undo
+        verbose (bool) : If True, print a summary
+    Outputs:
+        records (pandas DataFrame) : The records which were undone
+    """
+    metaname = os.path.join(folder, batch_id + '.json')
+    with open(metaname) as f:
+        meta = json.load(f)
+    if meta['Status'] == 'rolled back':
+        print('Batch %s was already rolled back' % batch_id)
+        return LoadBatch(folder, batch_id).iloc[0:0]
+    records = LoadBatch(folder, batch_id)
+
+    # Undo in reverse order, grouping consecutive tag records
+    # into a single exiftool call
+    rev = records.iloc[::-1].reset_index(drop=True)
+    block = (rev['Action'] != rev['Action'].shift()).cumsum()
+    argfile = os.path.join(folder, batch_id + '_rollback.args')
+    missing = 0
+    for b, df in rev.groupby(block, sort=True):
+        if df['Action'].iloc[0] == 'rename':
+            for old, new in zip(df['OldValue'], df['NewValue']):
+                if os.path.exists(new) and not os.path.exists(old):
+                    os.rename(new, old)
+                else:
+                    missing += 1
+        else:
+            undo = df.drop_duplicates(['SourceFile', 'Tag'], keep='last')
+            undo = pd.DataFrame({'SourceFile': undo['SourceFile'].values,
+                                 'Tag': undo['Tag'].values,
+                                 'Value': undo['OldValue'].values})
+            # Tags which were empty before the batch are deleted
+            result = exif.ApplyChanges(undo, argfile, delete_empty=True)
+            if result is not None and result.returncode != 0:
+                print('exiftool reported errors, see output above')
+
+    meta['Status'] = 'rolled back'
+    with open(metaname, 'w') as f:
+        json.dump(meta, f, indent=1)
+    if verbose:
+        print('Rolled back %d records of batch %s' % (len(records), batch_id))
+        if missing > 0:
+            print('Warning: %d renames could not be undone, ' % missing \
+                  + 'files were moved or replaced since')
+    return records
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Compact representations of the keyword fields. A multi-valued field
+(e.g. Subject, Coverage, Creator) is encoded once into integer IDs,
+one per distinct entry, with the entries of each file stored CSR-style
+(offsets plus values), so that searches, counts and co-occurrence
+work on integers instead of repeated strings. Hierarchical keywords
+(e.g. 'Places|USA|Texas|Austin') are further indexed into a prefix
+tree, with the files and rolled-up counts of each subtree.
+"""
+import sys
+import numpy as np
+import pandas as pd
+
+
+class KeywordIndex():
+    """
+    Dictionary encoding of a delimited field. The entries of file i
+    are entries[values[offsets[i]:offsets[i+1]]]
+    """
+    def __init__(self, series, delimiter=', ', files=None):
+        """
+        Inputs:
+            series (pandas Series) : Values of the field, one per file,
+                    e.g. archive.GrabData(None, ['Subject'])['Subject']
+            delimiter (str) : String delimiter used to separate
+                    entries in the field
+            files (list) : Names of the files, e.g. the SourceFile
+                    column, default is the index of series
+        """
+        self.delimiter = delimiter
+        self.files = np.asarray(series.index if files is None else files,
+                                dtype=object)
+        parts = series.astype('string').str.split(delimiter)
+        parts = pd.Series(parts.to_numpy(), index=np.arange(len(series)))
+        parts = parts.explode()
+        parts = parts[parts.notnull() & (parts != '')]
+        values, entries = pd.factorize(parts, sort=True)
+        self.entries = np.asarray(entries, dtype=object)
+        self.values = values.astype(np.int32)
+        counts = np.bincount(parts.index.to_numpy(dtype=np.int64),
+                             minlength=len(series))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._ids = None
+        self._rows = None
+
+    @classmethod
+    def Concat(cls, indexes, delimiter=', '):
+        """
+        Combine the indexes of several chunks of files, e.g. one per
+        subfolder from Archive.IterData(), into a single index
+
+        Inputs:
+            indexes (list) : KeywordIndex objects, in file order
+            delimiter (str) : Delimiter of the index if indexes is
+                    empty, otherwise that of the first index is kept
+        Outputs:
+            index (KeywordIndex) : Index of all the files, empty if
+                    indexes is
+        """
+        if len(indexes) == 0:
+            return cls(pd.Series([], dtype=object), delimiter)
+        index = cls.__new__(cls)
+        index.delimiter = indexes[0].delimiter
+        index.files = np.concatenate([i.files for i in indexes])
+        index.entries = np.unique(np.concatenate([i.entries \
+                                                  for i in indexes]))
+        values, offsets = [], [np.zeros(1, dtype=np.int64)]
+        total = 0
+        for i in indexes:
+            remap = np.searchsorted(index.entries,
+                                    i.entries).astype(np.int32)
+            values.append(remap[i.values])
+            offsets.append(i.offsets[1:] + total)
+            total += len(i.values)
+        index.values = np.concatenate(values).astype(np.int32)
+        index.offsets = np.concatenate(offsets)
+        index._ids = None
+        index._rows = None
+        return index
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        """Memory used by the arrays, in bytes, entries included"""
+        strings = sum(sys.getsizeof(e) for e in self.entries)
+        return self.values.nbytes + self.offsets.nbytes \
+               + self.entries.nbytes + strings
+
+    @property
+    def rows(self):
+        """File position of each value"""
+        if self._rows is None:
+            self._rows = np.repeat(np.arange(len(self), dtype=np.int64),
+                                   np.diff(self.offsets))
+        return self._rows
+
+    def ID(self, entry):
+        """
+        Inputs:
+            entry (str) : Keyword, e.g. 'beach'
+        Outputs:
+            id (int) : Integer ID of the keyword, -1 if absent
+        """
+        if self._ids is None:
+            self._ids = {e: i for i, e in enumerate(self.entries)}
+        return self._ids.get(entry, -1)
+
+    def ToStrings(self):
+        """
+        Decode back into delimited strings
+
+        Outputs:
+            series (pandas Series) : Values of the field, NaN for
+                    files with no entries, indexed by file
+        """
+        strings = pd.Series(self.entries[self.values], dtype=object)
+        strings = strings.groupby(self.rows).agg(self.delimiter.join)
+        series = pd.Series(np.nan, index=np.arange(len(self)), dtype=object)
+        series[strings.index] = strings.to_numpy()
+        series.index = self.files
+        return series
+
+    def Find(self, entries, include_all=False):
+        """
+        Files containing whole entries (not words inside entries)
+
+        Inputs:
+            entries (list) : Keywords for which to search
+            include_all (bool) : Returns union of entries if False,
+                    intersection if True
+        Outputs:
+            files (array) : Names of the matching files
+        """
+        return self.files[self.FindRows(entries, include_all)]
+
+    def FindRows(self, entries, include_all=False):
+        """Same as Find(), returning file positions"""
+        ids = np.unique([self.ID(e) for e in entries])
+        if include_all and (ids < 0).any():
+            return np.zeros(0, dtype=np.int64)
+        ids = ids[ids >= 0]
+        hits = self.rows[np.isin(self.values, ids)]
+        if not include_all:
+            return np.unique(hits)
+        rows, n = np.unique(hits, return_counts=True)
+        return rows[n >= len(ids)]
+
+    def Counts(self):
+        """
+        Number of appearances of each entry, as in
+        tools.CountUnique()
+
+        Outputs:
+            uq (pandas DataFrame) : All unique entries and their
+                    appearance counts, sorted by appearance
+        """
+        count = np.bincount(self.values, minlength=len(self.entries))
+        uq = pd.DataFrame({'Entry': self.entries, 'Count': count})
+        uq = uq[uq['Count'] > 0]
+        uq = uq.sort_values('Count', ascending=False, kind='stable')
+        uq.reset_index(drop=True, inplace=True)
+        return uq
+
+    def _Select(self, entries):
+        """File positions and column numbers of the given entries"""
+        # Absent entries map to the extra last slot, never looked up
+        lookup = np.full(len(self.entries) + 1, -1, dtype=np.int64)
+        for j, e in enumerate(entries):
+            lookup[self.ID(e)] = j
+        cols = lookup[self.values]
+        keep = cols >= 0
+        pairs = pd.DataFrame({'row': self.rows[keep], 'col': cols[keep]})
+        return pairs.drop_duplicates()
+
+    def Cooccurrence(self, entries, other=None, other_entries=None):
+        """
+        Number of files in which pairs of entries appear together,
+        within this field or with the entries of another field of
+        the same files
+
+        Inputs:
+            entries (list) : Keywords of this field
+            other (KeywordIndex) : Index of another field of the same
+                    files, default is this field
+            other_entries (list) : Keywords of the other field,
+                    default is entries
+        Outputs:
+            matrix (numpy array) : Counts, entries by other_entries
+        """
+        if other is None:
+            other = self
+        if other_entries is None:
+            other_entries = entries
+        pairs = self._Select(entries).merge(other._Select(other_entries),
+                                            on='row')
+        matrix = np.zeros((len(entries), len(other_entries)), dtype=np.int64)
+        np.add.at(matrix, (pairs['col_x'].to_numpy(),
+                           pairs['col_y'].to_numpy()), 1)
+        return matrix
+
+
+class KeywordTree():
+    """
+    Prefix tree of hierarchical keywords, e.g. 'Places|USA|Texas'
+    is a child of 'Places|USA'. Each node holds the positions of the
+    files tagged with it or any keyword below it, so subtree queries
+    and counts are answered without scanning the field again.
+    """
+    def __init__(self, index, separator='|'):
+        """
+        Inputs:
+            index (KeywordIndex) : Encoded keyword field, e.g. from
+                    Archive.KeywordIndex('Subject')
+            separator (str) : Separator between levels of a keyword
+        """
+        self.index = index
+        self.separator = separator
+
+        # Nodes are the prefixes of every entry
+        nodes, ancestors = {}, []
+        for entry in index.entries:
+            parts = [p.strip() for p in entry.split(separator)]
+            parts = [p for p in parts if p]
+            path = []
+            for k in range(len(parts)):
+                key = separator.join(parts[:k+1])
+                if key not in nodes:
+                    nodes[key] = len(nodes)
+                path.append(nodes[key])
+            ancestors.append(path)
+        self.nodes = np.array(list(nodes), dtype=object)
+        self._ids = nodes
+        self.depth = np.array([len(n.split(separator)) for n in self.nodes],
+                              dtype=np.int32)
+
+        # Pairs of (node, file) for every ancestor of every entry
+        n_anc = np.array([len(a) for a in ancestors], dtype=np.int64)
+        anc = np.array([n for a in ancestors for n in a], dtype=np.int64)
+        anc_offsets = np.concatenate([[0], np.cumsum(n_anc)])
+        lengths = n_anc[index.values]
+        starts = np.repeat(anc_offsets[index.values] \
+                           - np.concatenate([[0], np.cumsum(lengths)[:-1]]),
+                           lengths)
+        node = anc[starts + np.arange(lengths.sum())]
+        row = np.repeat(index.rows, lengths)
+        pairs = np.sort(node * len(index) + row)
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = pairs[1:] != pairs[:-1]
+        pairs = pairs[first]
+
+        # Files of node k are rows[offsets[k]:offsets[k+1]], sorted
+        self.rows = (pairs % max(len(index), 1)).astype(np.int64)
+        self.offsets = np.searchsorted(pairs // max(len(index), 1),
+                                       np.arange(len(self.nodes) + 1))
+        self.counts = np.diff(self.offsets)
+
+    def _Node(self, path):
+        if isinstance(path, (list, tuple)):
+            path = self.separator.join(path)
+        return self._ids.get(path, -1)
+
+    def Rows(self, path):
+        """
+        Inputs:
+            path (str or list) : Keyword, e.g. 'Places|USA|Texas' or
+                    ['Places', 'USA', 'Texas']
+        Outputs:
+            rows (array) : Positions of the files in the subtree
+        """
+        k = self._Node(path)
+        if k < 0:
+            return np.zeros(0, dtype=np.int64)
+        return self.rows[self.offsets[k]:self.offsets[k+1]]
+
+    def Files(self, path):
+        """
+        Files tagged with a keyword or any keyword below it, e.g.
+        everything under 'Places|USA|Texas'
+
+        Inputs:
+            path (str or list) : Keyword at the root of the subtree
+        Outputs:
+            files (array) : Names of the files in the subtree
+        """
+        return self.index.files[self.Rows(path)]
+
+    def Count(self, path):
+        """
+        Number of files tagged with a keyword or any keyword below it
+        """
+        k = self._Node(path)
+        return 0 if k < 0 else int(self.counts[k])
+
+    def Children(self, path=None):
+        """
+        Keywords one level below path, with their rolled-up counts
+
+        Inputs:
+            path (str or list) : Parent keyword, default is the top level
+        Outputs:
+            uq (pandas DataFrame) : Entry (name of the child) and Count,
+                    sorted by count, e.g. for BarChart()
+        """
+        if path is None:
+            keep = self.depth == 1
+            prefix = ''
+        else:
+            if isinstance(path, (list, tuple)):
+                path = self.separator.join(path)
+            prefix = path + self.separator
+            keep = (self.depth == len(path.split(self.separator)) + 1) \
+                   & np.array([n.startswith(prefix) for n in self.nodes],
+                              dtype=bool)
+        uq = pd.DataFrame({'Entry': [n[len(prefix):] \
+                                     for n in self.nodes[keep]],
+                           'Count': self.counts[keep]})
+        uq = uq.sort_values('Count', ascending=False, kind='stable')
+        uq.reset_index(drop=True, inplace=True)
+        return uq
+
+    def TopN(self, level=1, N=10):
+        """
+        Most frequent keywords at one level of the hierarchy, counting
+        the files of their whole subtree
+
+        Inputs:
+            level (int) : Depth in the hierarchy, 1 for the top level
+            N (int) : Number of keywords to return, None for all
+        Outputs:
+            uq (pandas DataFrame) : Entry (full keyword) and Count,
+                    sorted by count, e.g. for BarChart()
+        """
+        keep = self.depth == level
+        uq = pd.DataFrame({'Entry': self.nodes[keep],
+                           'Count': self.counts[keep]})
+        uq = uq.sort_values('Count', ascending=False, kind='stable')
+        if N is not None:
+            uq = uq.iloc[:N]
+        uq.reset_index(drop=True, inplace=True)
+        return uq
+
+
+def Categorize(df, max_unique=0.5, fields=None):
+    """
+    Store the low-cardinality text columns of a DataFrame as pandas
+    categoricals, e.g. Creator or FileType
+
+    Inputs:
+        df (pandas DataFrame) : Metadata, e.g. from Archive.GrabData()
+        max_unique (float) : Largest ratio of distinct values to
+                rows for a column to be converted
+        fields (list) : Columns to consider, default is all text columns
+    Outputs:
+        df (pandas DataFrame) : Copy of df with categorical columns
+    """
+    df = df.copy()
+    if fields is None:
+        fields = [c for c in df.columns \
+                  if pd.api.types.is_string_dtype(df[c]) \
+                  or pd.api.types.is_object_dtype(df[c])]
+    for c in fields:
+        if len(df) > 0 and df[c].nunique() <= max_unique * len(df):
+            df[c] = df[c].astype('category')
+    return df
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tools to find groups of sub-scenes or scans in the collection
+and stitch them into panoramas in batch. Stitching requires cv2
+"""
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+def GroupPanoramas(data, max_gap='10s', use_names=True, max_step=1,
+                   min_size=2, max_size=None):
+    """
+    Propose groups of files which are likely sub-scenes of the same
+    panorama, based on gaps in CreateDate and on filename sequences
+    (e.g. scan_0012.jpg, scan_0013.jpg, ...).
+
+    Inputs:
+        data (pandas DataFrame) : Output of Archive.GrabData(), with
+            at least the SourceFile and CreateDate fields. Use
+            withPath=True so the groups can be stitched directly
+        max_gap (str) : Largest time gap between consecutive files of
+            the same group, in a format recognized by pd.Timedelta()
+        use_names (bool) : If True, also split groups wherever the
+            filename prefix changes or the trailing number of the
+            filename jumps by more than max_step. Only applies to
+            camera or scanner counters (a prefix without digits then
+            a number, e.g. IMG_0001), not to datetime names such as
+            those of Dates2Names()
+        max_step (int) : Largest jump of the filename number
+            allowed inside a group
+        min_size (int) : Smallest number of files in a group
+        max_size (int) : Largest number of files in a group, larger
+            groups are dropped. Default is no limit
+    Outputs:
+        groups (pandas DataFrame) : DataFrame with columns Group,
+            SourceFile and CreateDate, sorted by group
+    """
+    df = data[['SourceFile', 'CreateDate']].dropna()
+    df = df.sort_values(['CreateDate', 'SourceFile'])
+    df.reset_index(drop=True, inplace=True)
+
+    # Break wherever the time gap is too large
+    gap = df['CreateDate'].diff()
+    brk = gap.isnull() | (gap > pd.Timedelta(max_gap))
+
+    if use_names:
+        # Split filename stems into prefix and trailing number
+        stem = df['SourceFile'].map(os.path.basename)
+        stem = stem.str.rsplit('.', n=1).str[0]
+        parts = stem.str.extract(r'^(\D*?)(\d+)$')
+        counter = parts[1].notnull()
+        number = pd.to_numeric(parts[1], errors='coerce')
+        step = number.diff()
+        # Only between two counter names
+        both = counter & counter.shift(fill_value=False)
+        brk |= both & ((parts[0] != parts[0].shift()) | (step < 1)
+                       | (step > max_step))
+
+    df['Group'] = brk.cumsum() - 1
+
+    # Filter by group size, then renumber
+    size = df.groupby('Group')['Group'].transform('size')
+    keep = size >= min_size
+    if max_size is not None:
+        keep &= size <= max_size
+    df = df[keep].copy()
+    df['Group'] = df.groupby('Group', sort=True).ngroup()
+    df = df[['Group', 'SourceFile', 'CreateDate']].reset_index(drop=True)
+    return df
+
+
+def _StitchGroup(job):
+    """
+    Stitch a single group, used as the worker of BatchStitchPanorama
+    """
+    group, images, outfile, mode, registration_resol = job
+    status = {'Group': group, 'Output': outfile,
+              'Images': len(images), 'Status': '',
+              'Code': -1, 'Seconds': 0.0}
+    t0 = time.perf_counter()
+    try:
+        import cv2
+        imgs = []
+        for img_name in images:
+            img = cv2.imread(img_name)
+            if img is None:
+                raise IOError("Can't read image " + img_name)
+            imgs.append(img)
+
+        # Register on downscaled copies, composite at full resolution
+        stitcher = cv2.Stitcher.create(mode)
+        stitcher.setRegistrationResol(registration_resol)
+        stitcher.setSeamEstimationResol(min(registration_resol, 0.1))
+        stitcher.setCompositingResol(-1)  # Stitcher::ORIG_RESOL
+        code, pano = stitcher.stitch(imgs)
+        status['Code'] = int(code)
+        if code == cv2.Stitcher_OK:
+            cv2.imwrite(outfile, pano)
+            status['Status'] = 'stitched'
+        else:
+            status['Status'] = 'failed'
+    except Exception as err:
+        status['Status'] = 'error: %s' % err
+    status['Seconds'] = time.perf_counter() - t0
+    return status
+
+
+def BatchStitchPanorama(groups, outfolder, mode=1,
+                        registration_resol=0.6, workers=None,
+                        ext='jpg', skip_existing=True):
+    """
+    Stitch many groups of sub-scenes into panoramas, running the
+    groups in a process pool. Image registration is done on
+    downscaled copies of the inputs (registration_resol), while
+    the output is composited at full resolution. The status of
+    every group is saved to 'PanoramaStatus.csv' in outfolder.
+    Requires cv2
+
+    Inputs:
+        groups (pandas DataFrame or dict) : Output of GroupPanoramas(),
+            or a dict mapping group names to lists of image paths
+        outfolder (str) : Folder in which to save the panoramas, named
+            after the first image of each group
+        mode (int) : Mode used as input to cv2.Stitcher.create(),
+            defaults to 1 for scanned (flat) photos
+        registration_resol (float) : Image size (in megapixels) used
+            for registration, fed into setRegistrationResol()
+        workers (int) : Number of worker processes, default is the
+            number of CPUs
+        ext (str) : File extension of the saved panoramas
+        skip_existing (bool) : If True, groups whose output file
+            already exists are not stitched again
+    Outputs:
+        status (pandas DataFrame) : One row per group, with columns
+            Group, Output, Images, Status, Code and Seconds
+    """
+    # Check if OpenCV is available
+    try:
+        import cv2
+    except ImportError:
+        print("Function unavailable, requires installation of OpenCV")
+        print("Perform full setup for auxilary packages")
+        return
+
+    if isinstance(groups, pd.DataFrame):
+        groups = groups.groupby('Group')['SourceFile'].apply(list).to_dict()
+    if not os.path.exists(outfolder):
+        os.makedirs(outfolder)
+
+    # Build list of jobs
+    jobs = []
+    status = []
+    for group, images in groups.items():
+        stem = os.path.basename(images[0]).rsplit('.', 1)[0]
+        outfile = os.path.join(outfolder, '%s_pano.%s' % (stem, ext))
+        if skip_existing and os.path.exists(outfile):
+            status.append({'Group': group, 'Output': outfile,
+                           'Images': len(images), 'Status': 'skipped',
+                           'Code': 0, 'Seconds': 0.0})
+            continue
+        jobs.append((group, images, outfile, mode, registration_resol))
+
+    # Stitch groups in parallel
+    if len(jobs) > 0:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            status.extend(pool.map(_StitchGroup, jobs))
+
+    status = pd.DataFrame(status, columns=['Group', 'Output', 'Images',
+                                           'Status', 'Code', 'Seconds'])
+    status.to_csv(os.path.join(outfolder, 'PanoramaStatus.csv'),
+                  index=False, encoding="ISO-8859-1")
+    n_ok = (status['Status'] == 'stitched').sum()
+    print('Stitched %d of %d groups' % (n_ok, len(status)))
+    return status
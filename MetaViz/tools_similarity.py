@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Tools for "more like this" searches over the images in the
+collection, using compact colour/texture feature vectors.
+Requires Pillow
+"""
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Bins per channel of the RGB colour histogram
+HIST_BINS = 4
+# Side length of the downsampled grayscale thumbnail
+THUMB_SIZE = 16
+# Length of each feature vector
+N_FEATURES = HIST_BINS**3 + THUMB_SIZE**2
+# File extensions (lowercase) considered to be images
+IMAGE_TYPES = ['jpg', 'jpeg', 'png', 'tif', 'tiff', 'bmp', 'gif',
+               'webp', 'heic']
+
+
+def ImageFeatures(path):
+    """
+    Compute the feature vector of a single image: a coarse RGB
+    colour histogram concatenated with a small downsampled
+    grayscale thumbnail. Both halves are normalized so that the
+    dot product of two vectors is a cosine similarity.
+
+    Inputs:
+        path (str) : Path to the image file
+    Outputs:
+        vec (numpy array) : float32 feature vector of length
+            N_FEATURES, or None if the file could not be read
+    """
+    from PIL import Image
+    try:
+        with Image.open(path) as im:
+            im.draft('RGB', (4*THUMB_SIZE, 4*THUMB_SIZE))
+            rgb = im.convert('RGB')
+            rgb.thumbnail((8*THUMB_SIZE, 8*THUMB_SIZE))
+            gray = rgb.convert('L').resize((THUMB_SIZE, THUMB_SIZE))
+    except Exception:
+        return None
+
+    # Colour histogram, square-rooted to damp dominant colours
+    px = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3)
+    q = (px // (256 // HIST_BINS)).astype(np.int64)
+    codes = (q[:, 0]*HIST_BINS + q[:, 1])*HIST_BINS + q[:, 2]
+    hist = np.bincount(codes, minlength=HIST_BINS**3).astype(np.float32)
+    hist = np.sqrt(hist / max(hist.sum(), 1))
+
+    # Zero-mean grayscale layout
+    thumb = np.asarray(gray, dtype=np.float32).ravel()
+    thumb -= thumb.mean()
+    norm = np.linalg.norm(thumb)
+    if norm > 0:
+        thumb /= norm
+
+    vec = np.concatenate([hist, thumb]) / np.sqrt(2)
+    return vec
+
+
+def ExtractFeatures(files, workers=None, chunksize=64, out=None,
+                    rows=None):
+    """
+    Compute feature vectors for a list of images in a process pool.
+
+    Inputs:
+        files (list) : List of paths to image files
+        workers (int) : Number of worker processes, default is
+            the number of CPUs
+        chunksize (int) : Number of files sent to a worker at once
+        out (numpy array) : Zero-filled float16 array (e.g. from
+            CreateFeatures()) in which to write the vectors as they
+            are computed, instead of a new array
+        rows (numpy array) : Row of out for each file, default is
+            the first len(files) rows
+    Outputs:
+        features (numpy array) : float16 array of shape
+            (len(files), N_FEATURES), zero for unreadable files,
+            or out if given
+        valid (numpy array) : Boolean array, True where the file
+            was read successfully
+    """
+    if out is None:
+        out = np.zeros((len(files), N_FEATURES), dtype=np.float16)
+    if rows is None:
+        rows = np.arange(len(files))
+    valid = np.zeros(len(files), dtype=bool)
+    if len(files) == 0:
+        return out, valid
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(ImageFeatures, files, chunksize=chunksize)
+        for ii, vec in enumerate(results):
+            if vec is not None:
+                out[rows[ii]] = vec
+                valid[ii] = True
+    return out, valid
+
+
+def CreateFeatures(filename, N):
+    """
+    Create a zero-filled .npy feature file of N rows, memory-mapped
+    so that it can be filled without holding it in memory
+
+    Inputs:
+        filename (str) : Path of the .npy file to write
+        N (int) : Number of rows
+    Outputs:
+        features (numpy memmap) : Writable float16 feature array
+    """
+    return np.lib.format.open_memmap(filename, mode='w+', dtype=np.float16,
+                                     shape=(N, N_FEATURES))
+
+
+def LoadFeatures(filename):
+    """
+    Memory-map a feature array written with CreateFeatures()
+
+    Inputs:
+        filename (str) : Path of the .npy file
+    Outputs:
+        features (numpy memmap) : Read-only float16 feature array
+    """
+    return np.load(filename, mmap_mode='r')
+
+
+def ClusterFeatures(features, n_clusters=None, iterations=10,
+                    sample=100000, batch=65536, seed=0):
+    """
+    Build a coarse clustering index over the feature vectors with
+    spherical k-means, so that queries only need to score the rows
+    in a few nearby clusters. Useful for large archives.
+
+    Inputs:
+        features (numpy array) : Feature array, e.g. LoadFeatures().
+            Rows of zeros (unreadable images) are not used to fit
+            the centroids
+        n_clusters (int) : Number of clusters, default is about
+            the square root of the number of rows
+        iterations (int) : Number of k-means iterations
+        sample (int) : Number of rows used to fit the centroids
+        batch (int) : Number of rows scored at once when assigning
+        seed (int) : Random seed for the initial centroids
+    Outputs:
+        centroids (numpy array) : float32 array of cluster centres
+        labels (numpy array) : Cluster of each row of features
+    """
+    N = features.shape[0]
+    if n_clusters is None:
+        n_clusters = max(1, int(np.sqrt(N)))
+    n_clusters = min(n_clusters, N)
+    rng = np.random.default_rng(seed)
+
+    # Fit centroids on a random sample of rows, leaving out empty ones
+    rows = np.sort(rng.choice(N, size=min(sample, N), replace=False))
+    X = np.asarray(features[rows], dtype=np.float32)
+    nonzero = np.any(X != 0, axis=1)
+    if nonzero.any():
+        X = X[nonzero]
+    n_clusters = min(n_clusters, len(X))
+    centroids = X[rng.choice(len(X), size=n_clusters, replace=False)]
+    for it in range(iterations):
+        assign = np.argmax(X @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = X[assign == c]
+            if len(members) > 0:
+                centroids[c] = members.sum(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1)
+
+    # Assign every row in batches
+    labels = np.empty(N, dtype=np.int32)
+    for start in range(0, N, batch):
+        block = np.asarray(features[start:start+batch], dtype=np.float32)
+        labels[start:start+batch] = np.argmax(block @ centroids.T, axis=1)
+    return centroids, labels
+
+
+def TopK(features, query, k=10, rows=None, batch=65536):
+    """
+    Find the k rows of features most similar to the query vector,
+    scoring the (possibly memory-mapped) array in batches.
+
+    Inputs:
+        features (numpy array) : Feature array, e.g. LoadFeatures()
+        query (numpy array) : Query feature vector
+        k (int) : Number of results to return
+        rows (numpy array) : Optional subset of row indices to score
+        batch (int) : Number of rows scored at once
+    Outputs:
+        best (numpy array) : Row indices of the top-k matches
+        scores (numpy array) : Cosine similarity of each match
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if rows is None:
+        rows = np.arange(features.shape[0])
+    best = np.empty(0, dtype=np.int64)
+    scores = np.empty(0, dtype=np.float32)
+    for start in range(0, len(rows), batch):
+        idx = rows[start:start+batch]
+        if idx[-1] - idx[0] == len(idx) - 1:
+            block = features[idx[0]:idx[-1]+1]  # contiguous slice
+        else:
+            block = features[idx]
+        sim = np.asarray(block, dtype=np.float32) @ query
+        # Merge with best so far
+        best = np.concatenate([best, idx])
+        scores = np.concatenate([scores, sim])
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k)[:k]
+            best, scores = best[keep], scores[keep]
+    order = np.argsort(-scores)
+    return best[order], scores[order]
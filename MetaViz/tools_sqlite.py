@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Optional SQLite backend for the metadatabase. The per-subfolder csv
+files are mirrored into a single database, with an index on
+SourceFile and on a typed CreateDate column, and an FTS5 full-text
+index over the free-text fields, which supports phrases ("red car"),
+prefixes (moun*), boolean operators and ranking by relevance.
+Requires a Python sqlite3 module compiled with FTS5 (the default in
+most distributions)
+"""
+import os
+import json
+import sqlite3
+import pandas as pd
+from . import tools
+
+# Typed columns, all others are TEXT
+TYPES = {'CreateDate': 'DATETIME', 'DurationSeconds': 'REAL'}
+
+# Fields (shorthand) indexed for full-text search, when present
+TEXT_FIELDS = ['Title', 'Description', 'Notes', 'Subject', 'Coverage',
+               'Creator', 'Source']
+
+
+def FTS5Available():
+    """
+    Check if the sqlite3 module supports FTS5 full-text search
+
+    Outputs:
+        available (bool) : True if FTS5 can be used
+    """
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute('CREATE VIRTUAL TABLE t USING fts5(x)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def _Quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _CreateSchema(conn, fields, text_fields):
+    """Create the tables of an empty database"""
+    cols = ['Subfolder TEXT NOT NULL', 'SourceFile TEXT NOT NULL',
+            'FileName TEXT NOT NULL']
+    for f in fields:
+        if f == 'SourceFile':
+            continue
+        cols.append('%s %s' % (_Quote(f), TYPES.get(f, 'TEXT')))
+    conn.execute('CREATE TABLE Metadata (%s)' % ', '.join(cols))
+    conn.execute('CREATE INDEX idx_sourcefile ON Metadata (SourceFile)')
+    conn.execute('CREATE INDEX idx_filename ON Metadata (FileName)')
+    conn.execute('CREATE INDEX idx_subfolder ON Metadata (Subfolder)')
+    if 'CreateDate' in fields:
+        conn.execute('CREATE INDEX idx_createdate ON Metadata (CreateDate)')
+    conn.execute('CREATE VIRTUAL TABLE MetadataFTS USING fts5(%s)'
+                 % ', '.join(_Quote(f) for f in text_fields))
+    conn.execute('CREATE TABLE Subfolders (Subfolder TEXT PRIMARY KEY, '
+                 'CsvModifyTime INTEGER)')
+    conn.execute('CREATE TABLE Schema (Fields TEXT, TextFields TEXT)')
+    conn.execute('INSERT INTO Schema VALUES (?, ?)',
+                 (json.dumps(fields), json.dumps(text_fields)))
+    return
+
+
+def Sync(dbname, csvPath, subfolders, fields, verbose=False):
+    """
+    Mirror the csv files of the metadatabase into the database. Only
+    subfolders whose csv changed since the last call are copied
+    again, and subfolders no longer listed are removed.
+
+    Inputs:
+        dbname (str) : Path of the database, created if needed
+        csvPath (str) : Folder of the csv files
+        subfolders (list) : Subfolders of the archive
+        fields (list) : Shorthand fields to store, e.g.
+            Archive.fields_short
+        verbose (bool) : If True, print the subfolders copied
+    Outputs:
+        n_changed (int) : Number of subfolders copied or removed
+    """
+    fields = list(fields)
+    if 'SourceFile' not in fields:
+        fields = ['SourceFile'] + fields
+    if 'Duration' in fields and 'DurationSeconds' not in fields:
+        fields = fields + ['DurationSeconds']
+    text_fields = [f for f in TEXT_FIELDS if f in fields]
+
+    conn = sqlite3.connect(dbname)
+    try:
+        tables = [r[0] for r in conn.execute(
+                  "SELECT name FROM sqlite_master WHERE type='table'")]
+        if 'Schema' in tables:
+            schema = conn.execute('SELECT Fields FROM Schema').fetchone()
+            if json.loads(schema[0]) != fields:
+                # Fields changed, start over
+                conn.close()
+                os.remove(dbname)
+                conn = sqlite3.connect(dbname)
+                tables = []
+        if 'Schema' not in tables:
+            with conn:
+                _CreateSchema(conn, fields, text_fields)
+
+        known = dict(conn.execute('SELECT Subfolder, CsvModifyTime '
+                                  'FROM Subfolders'))
+        mtimes = {}
+        for sf in subfolders:
+            csvname = os.path.join(csvPath, sf.replace(os.sep,'__') + '.csv')
+            mtimes[sf] = os.stat(csvname).st_mtime_ns
+        changed = [sf for sf in subfolders if known.get(sf) != mtimes[sf]]
+        removed = [sf for sf in known if sf not in mtimes]
+
+        columns = ['Subfolder', 'SourceFile', 'FileName'] \
+                  + [f for f in fields if f != 'SourceFile']
+        insert = 'INSERT INTO Metadata (%s) VALUES (%s)' \
+                 % (', '.join(_Quote(c) for c in columns),
+                    ', '.join('?' * len(columns)))
+        insert_fts = 'INSERT INTO MetadataFTS (rowid, %s) VALUES (?%s)' \
+                     % (', '.join(_Quote(f) for f in text_fields),
+                        ', ?' * len(text_fields))
+        for sf in removed + changed:
+            with conn:
+                conn.execute('DELETE FROM MetadataFTS WHERE rowid IN '
+                             '(SELECT rowid FROM Metadata WHERE Subfolder=?)',
+                             (sf,))
+                conn.execute('DELETE FROM Metadata WHERE Subfolder=?', (sf,))
+                conn.execute('DELETE FROM Subfolders WHERE Subfolder=?',
+                             (sf,))
+                if sf in removed:
+                    continue
+                df = _ReadTable(csvPath, sf, fields)
+                df.insert(0, 'Subfolder', sf)
+                df.insert(2, 'FileName', df['SourceFile'].map(os.path.basename))
+                start = conn.execute('SELECT COALESCE(MAX(rowid), 0) '
+                                     'FROM Metadata').fetchone()[0] + 1
+                conn.executemany(insert, df[columns].itertuples(index=False))
+                rowids = range(start, start + len(df))
+                conn.executemany(insert_fts,
+                                 zip(rowids, *[df[f] for f in text_fields]))
+                conn.execute('INSERT INTO Subfolders VALUES (?, ?)',
+                             (sf, mtimes[sf]))
+            if verbose:
+                print('Copied %s into %s' % (sf, dbname))
+    finally:
+        conn.close()
+    return len(changed) + len(removed)
+
+
+def _ReadTable(csvPath, sf, fields):
+    """
+    Read the csv of subfolder sf as strings (None if missing), with
+    shorthand column names, CreateDate in ISO format and Duration
+    parsed into seconds (DurationSeconds)
+    """
+    csvname = os.path.join(csvPath, sf.replace(os.sep,'__') + '.csv')
+    df = pd.read_csv(csvname, encoding="ISO-8859-1", dtype=str,
+                     keep_default_na=False)
+    df.columns = [col.split(':')[-1] for col in df.columns]
+    df = df.reindex(columns=fields)
+    if 'DurationSeconds' in fields:
+        df['DurationSeconds'] = tools.ParseDuration(df['Duration'])
+    if 'CreateDate' in fields:
+        dates = pd.to_datetime(df['CreateDate'].str.split('.', n=1).str[0],
+                               format='%Y:%m:%d %H:%M:%S', errors='coerce')
+        df['CreateDate'] = dates.dt.strftime('%Y-%m-%d %H:%M:%S')
+    df = df.astype(object).where(df.notnull() & (df != ''), None)
+    return df
+
+
+def _MatchQuery(searchterms, include_all):
+    """FTS5 query matching whole words, as FindSource does"""
+    terms = ['"%s"' % t.replace('"', '""') for t in searchterms]
+    return (' AND ' if include_all else ' OR ').join(terms)
+
+
+def Search(dbname, query, fields=None, subfolders=None, limit=None):
+    """
+    Full-text search with the FTS5 query syntax, e.g.
+    '"birthday party" AND cake', 'moun*', 'beach NOT dog'
+
+    Inputs:
+        dbname (str) : Path of the database
+        query (str) : FTS5 query
+        fields (list) : Indexed fields in which to look, default is
+            all of them (see TEXT_FIELDS)
+        subfolders (list) : Subfolders in which to look, default is all
+        limit (int) : Largest number of results
+    Outputs:
+        results (pandas DataFrame) : Columns Subfolder, SourceFile and
+            Rank (lower is more relevant), best matches first
+    """
+    conn = sqlite3.connect(dbname)
+    try:
+        text_fields = json.loads(conn.execute('SELECT TextFields '
+                                              'FROM Schema').fetchone()[0])
+        if fields is not None:
+            fields = [f for f in fields if f in text_fields]
+            if len(fields) == 0:
+                return pd.DataFrame(columns=['Subfolder', 'SourceFile',
+                                             'Rank'])
+            query = '{%s} : (%s)' % (' '.join(_Quote(f) for f in fields),
+                                     query)
+        sql = ('SELECT m.Subfolder, m.SourceFile, f.rank AS Rank '
+               'FROM MetadataFTS f JOIN Metadata m ON m.rowid = f.rowid '
+               'WHERE MetadataFTS MATCH ?')
+        params = [query]
+        if subfolders is not None:
+            sql += ' AND m.Subfolder IN (%s)' % ', '.join('?' * len(subfolders))
+            params.extend(subfolders)
+        sql += ' ORDER BY f.rank'
+        if limit is not None:
+            sql += ' LIMIT %d' % int(limit)
+        results = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+    return results
+
+
+def TextFields(dbname):
+    """Fields (shorthand) in the full-text index of the database"""
+    conn = sqlite3.connect(dbname)
+    try:
+        text_fields = json.loads(conn.execute('SELECT TextFields '
+                                              'FROM Schema').fetchone()[0])
+    finally:
+        conn.close()
+    return text_fields
+
+
+def FindSource(dbname, searchterms, fields=None, subfolders=None,
+               include_all=False, pattern=None):
+    """
+    Whole-word search, as in Archive.FindSource(). The full-text
+    index, which is case-insensitive and splits words on all
+    punctuation, gives candidates, which are then checked against the
+    regular expression pattern, so that the results are the same as
+    in the csv. Fields which are not indexed are ignored
+
+    Inputs:
+        pattern (str) : Regular expression which the field must
+            contain, default is to keep all candidates
+    Outputs:
+        SourceFiles (list) : Full paths of the matching files
+    """
+    text_fields = TextFields(dbname)
+    if fields is None:
+        fields = text_fields
+    SourceFiles = []
+    conn = sqlite3.connect(dbname)
+    try:
+        # Intersection of terms only applies inside a single field
+        for f in [f for f in fields if f in text_fields]:
+            sql = ('SELECT m.SourceFile, m.%s AS Value '
+                   'FROM MetadataFTS JOIN Metadata m '
+                   'ON m.rowid = MetadataFTS.rowid '
+                   'WHERE MetadataFTS MATCH ?' % _Quote(f))
+            params = ['{%s} : (%s)' % (_Quote(f),
+                                       _MatchQuery(searchterms, include_all))]
+            if subfolders is not None:
+                sql += ' AND m.Subfolder IN (%s)' % ', '.join('?' * len(subfolders))
+                params.extend(subfolders)
+            found = pd.read_sql_query(sql, conn, params=params)
+            if pattern is not None:
+                found = found[found['Value'].astype(str).str.contains(pattern,
+                                                                      regex=True)]
+            SourceFiles.extend(found['SourceFile'].tolist())
+    finally:
+        conn.close()
+    return SourceFiles
+
+
+def GrabData(dbname, fields, sourcefiles=None, subfolders=None,
+             startdate=None, enddate=None):
+    """
+    Select metadata, filtering files and dates in SQL on the indexed
+    columns. See Archive.GrabData()
+
+    Inputs:
+        dbname (str) : Path of the database
+        fields (list) : Shorthand fields to return
+        sourcefiles (list) : File names or full paths to return,
+            default is all
+        subfolders (list) : Subfolders to return, default is all
+        startdate (str) : Datetime (YYYYmmdd_HHMMSS) after which
+            to return data
+        enddate (str) : Datetime (YYYYmmdd_HHMMSS) before which
+            to return data
+    Outputs:
+        data (pandas DataFrame) : Requested metadata, with CreateDate
+            as datetime
+    """
+    conn = sqlite3.connect(dbname)
+    try:
+        stored = json.loads(conn.execute('SELECT Fields '
+                                         'FROM Schema').fetchone()[0])
+        fields = [f for f in fields if f in stored]
+        where, params = [], []
+        if sourcefiles is not None:
+            conn.execute('CREATE TEMP TABLE Wanted (Name TEXT PRIMARY KEY)')
+            conn.executemany('INSERT OR IGNORE INTO Wanted VALUES (?)',
+                             ((s,) for s in sourcefiles))
+            where.append('(SourceFile IN (SELECT Name FROM Wanted) OR '
+                         'FileName IN (SELECT Name FROM Wanted))')
+        if subfolders is not None:
+            where.append('Subfolder IN (%s)' % ', '.join('?' * len(subfolders)))
+            params.extend(subfolders)
+        if startdate is not None:
+            where.append('CreateDate >= ?')
+            params.append(pd.to_datetime(startdate, format="%Y%m%d_%H%M%S")
+                          .strftime('%Y-%m-%d %H:%M:%S'))
+        if enddate is not None:
+            where.append('CreateDate <= ?')
+            params.append(pd.to_datetime(enddate, format="%Y%m%d_%H%M%S")
+                          .strftime('%Y-%m-%d %H:%M:%S'))
+        sql = 'SELECT %s FROM Metadata' % ', '.join(_Quote(f) for f in fields)
+        if len(where) > 0:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY rowid'
+        data = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+    if 'CreateDate' in data.columns:
+        data['CreateDate'] = pd.to_datetime(data['CreateDate'],
+                                            format='%Y-%m-%d %H:%M:%S')
+    if 'DurationSeconds' in data.columns:
+        data['DurationSeconds'] = data['DurationSeconds'].astype(float)
+    return data
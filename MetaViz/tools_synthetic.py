@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Generator of synthetic metadatabases, written in the same layout as
+Archive.UpdateCSV(), for benchmarking and for trying out the package
+without a real collection. Keywords and locations follow a Zipf
+distribution, dates are spread over several decades, and multi-valued
+fields are delimited the same way exiftool writes them.
+"""
+import os
+import numpy as np
+import pandas as pd
+from . import config as cf
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ra', 'tu', 'si', 'po', 've', 'da',
+             'gri', 'bel', 'sha', 'mon', 'tex', 'quin', 'har', 'lu']
+CREATORS = ['Kyle Wright', 'Mickey Lanning', 'Ann Lee', 'Jose Diaz',
+            'Priya Rao', 'Tom Baker', 'Unknown']
+VIDEO_TYPES = ['mp4', 'mov']
+
+
+def Vocabulary(n, seed=0, capitalize=False):
+    """
+    Make a list of n distinct made-up words.
+
+    Inputs:
+        n (int) : Number of words
+        seed (int) : Seed of the random generator
+        capitalize (bool) : If True, capitalize the words
+    Outputs:
+        words (numpy array) : Array of n distinct words
+    """
+    rng = np.random.default_rng(seed)
+    words = {}
+    length = 2
+    while len(words) < n:
+        syl = rng.choice(SYLLABLES, size=(4*n, length))
+        for w in map(''.join, syl):
+            words[w.capitalize() if capitalize else w] = None
+        length += 1
+    words = np.array(list(words)[:n], dtype=object)
+    return words
+
+
+def ZipfChoice(rng, words, size, s=1.1):
+    """
+    Sample words with probabilities following Zipf's law, so that
+    the k-th word appears with probability proportional to 1/k**s.
+
+    Inputs:
+        rng (numpy Generator) : Random generator
+        words (numpy array) : Words, from most to least common
+        size (int or tuple) : Shape of the output
+        s (float) : Exponent of the distribution
+    Outputs:
+        sample (numpy array) : Sampled words
+    """
+    p = 1.0 / np.arange(1, len(words) + 1)**s
+    idx = rng.choice(len(words), size=size, p=p / p.sum())
+    return words[idx]
+
+
+def JoinMulti(rng, words, n, mean, max_k, delimiter=', ', s=1.1):
+    """
+    Make n delimited multi-valued entries, each with a Poisson number
+    (at least one, at most max_k) of distinct Zipf-distributed words.
+
+    Outputs:
+        entries (numpy array) : Array of n delimited strings
+    """
+    k = np.clip(rng.poisson(mean, n), 1, max_k)
+    cols = ZipfChoice(rng, words, (n, max_k), s)
+    entries = cols[:, 0].copy()
+    for j in range(1, max_k):
+        add = k > j
+        for i in range(j):
+            add &= cols[:, j] != cols[:, i]
+        entries[add] = entries[add] + delimiter + cols[add, j]
+    return entries
+
+
+def _Sparse(rng, values, fraction):
+    """Blank out (NaN) a random fraction of values"""
+    values = values.astype(object)
+    values[rng.random(len(values)) >= fraction] = np.nan
+    return values
+
+
+def SyntheticFrame(n, year, folder, rng, vocab, places,
+                   fields=None, delimiter=', '):
+    """
+    Make the metadata of n synthetic files created in a given year,
+    with the columns of an UpdateCSV() csv file.
+
+    Inputs:
+        n (int) : Number of rows
+        year (int) : Year of the CreateDate of the files
+        folder (str) : Absolute path of the folder of the files
+        rng (numpy Generator) : Random generator
+        vocab (numpy array) : Keyword vocabulary, see Vocabulary()
+        places (numpy array) : Location vocabulary
+        fields (list) : Long-form fields (columns), default is config
+        delimiter (str) : Delimiter of multi-valued fields
+    Outputs:
+        df (pandas DataFrame) : Synthetic metadata
+    """
+    if fields is None:
+        fields = cf.fields
+
+    # Dates, clustered into bursts (events) through the year
+    start = pd.Timestamp(year=year, month=1, day=1).value // 10**9
+    span = 365*86400
+    n_events = max(n // 50, 1)
+    events = start + rng.integers(0, span, n_events)
+    seconds = events[rng.integers(0, n_events, n)] \
+              + rng.exponential(3600, n).astype(np.int64)
+    seconds = np.sort(np.minimum(seconds, start + span - 1))
+    dates = pd.to_datetime(seconds, unit='s')
+    create = dates.strftime('%Y:%m:%d %H:%M:%S').to_numpy(dtype=object)
+    modify = (dates + pd.to_timedelta(rng.integers(0, 10**8, n), unit='s'))
+    modify = modify.strftime('%Y:%m:%d %H:%M:%S-06:00')
+
+    ext = np.where(rng.random(n) < 0.1, rng.choice(VIDEO_TYPES, n), 'jpg')
+    names = ['IMG_%06d.%s' % (i, e) for i, e in enumerate(ext)]
+    names = np.array([os.path.join(folder, f) for f in names], dtype=object)
+    video = np.isin(ext, VIDEO_TYPES)
+
+    # Durations of videos, formatted as exiftool prints them
+    secs = rng.lognormal(3, 1.2, n)
+    duration = np.where(secs < 30,
+                        np.char.mod('%.2f s', secs.round(2)),
+                        ['%d:%02d:%02d' % (s // 3600, s // 60 % 60, s % 60) \
+                         for s in secs.astype(int)])
+    duration = np.where(video, duration.astype(object), np.nan)
+
+    columns = {
+        'SourceFile': names,
+        'Title': _Sparse(rng, JoinMulti(rng, vocab, n, 1.5, 3, ' '), 0.3),
+        'Description': _Sparse(rng, JoinMulti(rng, vocab, n, 6, 12, ' '),
+                               0.2),
+        'Coverage': _Sparse(rng, JoinMulti(rng, places, n, 1.5, 3,
+                                           delimiter), 0.6),
+        'Subject': _Sparse(rng, JoinMulti(rng, vocab, n, 3, 8,
+                                          delimiter), 0.8),
+        'CreateDate': create,
+        'Creator': _Sparse(rng, ZipfChoice(rng, np.array(CREATORS,
+                                                         dtype=object),
+                                           n, 1.5), 0.5),
+        'FileModifyDate': modify,
+        'Notes': _Sparse(rng, JoinMulti(rng, vocab, n, 4, 8, ' '), 0.05),
+        'Source': _Sparse(rng, ZipfChoice(rng, places, n), 0.05),
+        'Duration': duration}
+    df = pd.DataFrame({f: columns.get(f.split(':')[-1], np.nan) \
+                       for f in fields})
+    return df
+
+
+def MakeArchive(csvPath, n_rows, start_year=1975, end_year=2024,
+                CollectionPath='/synthetic/collection', fields=None,
+                n_keywords=5000, n_places=500, delimiter=', ',
+                seed=0, overwrite=False):
+    """
+    Write a synthetic metadatabase with one csv per year subfolder,
+    in the layout of Archive.UpdateCSV(). The number of files grows
+    over the years, as in a typical digital collection. Subfolders
+    are generated one at a time, so that large archives (10M rows)
+    fit in memory.
+
+    Inputs:
+        csvPath (str) : Folder in which to write the csv files
+        n_rows (int) : Total number of files in the archive
+        start_year (int) : Year of the first subfolder
+        end_year (int) : Year of the last subfolder
+        CollectionPath (str) : Made-up path of the media collection
+        fields (list) : Long-form fields (columns), default is config
+        n_keywords (int) : Size of the keyword vocabulary
+        n_places (int) : Size of the location vocabulary
+        delimiter (str) : Delimiter of multi-valued fields
+        seed (int) : Seed of the random generator
+        overwrite (bool) : If False and csvPath already holds a
+            synthetic archive of the same size, it is reused
+    Outputs:
+        archive (Archive) : Archive instance reading the csv files
+    """
+    from .archive import Archive
+    if fields is None:
+        fields = cf.fields
+    years = np.arange(start_year, end_year + 1)
+    subfolders = [str(y) for y in years]
+    stamp = os.path.join(csvPath, 'Synthetic_%d.txt' % n_rows)
+
+    if overwrite or not os.path.exists(stamp):
+        os.makedirs(csvPath, exist_ok=True)
+        for f in os.listdir(csvPath):
+            if f.startswith('Synthetic_') and f.endswith('.txt'):
+                os.remove(os.path.join(csvPath, f))
+        rng = np.random.default_rng(seed)
+        vocab = Vocabulary(n_keywords, seed)
+        places = Vocabulary(n_places, seed + 1, capitalize=True)
+        weights = np.linspace(1, 4, len(years))
+        counts = np.floor(n_rows * weights / weights.sum()).astype(int)
+        counts[-1] += n_rows - counts.sum()
+        for sf, n in zip(subfolders, counts):
+            df = SyntheticFrame(n, int(sf),
+                                os.path.join(CollectionPath, sf),
+                                rng, vocab, places, fields, delimiter)
+            df.to_csv(os.path.join(csvPath, sf + '.csv'), index=False,
+                      encoding="ISO-8859-1")
+        with open(stamp, 'w') as f:
+            f.write('seed=%d\n' % seed)
+
+    archive = Archive(CollectionPath=CollectionPath, csvPath=csvPath,
+                      fields=fields, subfolders=subfolders,
+                      verbose=False)
+    return archive
+
+
+def MakeTree(root, n_files, n_subfolders=10, video_fraction=0.1,
+             seed=0):
+    """
+    Create a tree of small placeholder media files, one subfolder per
+    year, to be read with fake_exiftool in place of real media.
+    Modification times are fixed, so the tree is deterministic.
+
+    Inputs:
+        root (str) : Folder in which to create the tree
+        n_files (int) : Total number of files
+        n_subfolders (int) : Number of (year) subfolders
+        video_fraction (float) : Fraction of files which are videos
+        seed (int) : Seed of the random generator
+    Outputs:
+        subfolders (list) : Names of the subfolders
+    """
+    rng = np.random.default_rng(seed)
+    subfolders = [str(2024 - n_subfolders + 1 + i) \
+                  for i in range(n_subfolders)]
+    per_folder = np.full(n_subfolders, n_files // n_subfolders)
+    per_folder[:n_files % n_subfolders] += 1
+    for sf, n in zip(subfolders, per_folder):
+        folder = os.path.join(root, sf)
+        os.makedirs(folder, exist_ok=True)
+        mtime = pd.Timestamp(year=int(sf), month=6, day=1).value // 10**9
+        video = rng.random(n) < video_fraction
+        for i in range(n):
+            ext = rng.choice(VIDEO_TYPES) if video[i] else 'jpg'
+            path = os.path.join(folder, 'IMG_%06d.%s' % (i, ext))
+            with open(path, 'wb') as f:
+                f.write(b'\0' * 16)
+            os.utime(path, (mtime, mtime))
+    return subfolders
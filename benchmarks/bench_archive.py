@@ -0,0 +1,264 @@
+"""
+Benchmarks of the metadatabase entry points and of the data preparation
+of the plotting routines, against synthetic archives made by tools_synthetic.
+
+The archives are generated once and kept on disk between runs, in
+$METAVIZ_BENCH_DATA (default: a folder in the temp directory). The
+sizes (number of files) are set by $METAVIZ_BENCH_SIZES, a comma
+separated list, e.g. METAVIZ_BENCH_SIZES=10000,10000000 asv run
+"""
+import os
+import tempfile
+
+SIZES = [int(n) for n in os.environ.get('METAVIZ_BENCH_SIZES',
+                                        '10000,100000,1000000').split(',')]
+DATA = os.environ.get('METAVIZ_BENCH_DATA',
+                      os.path.join(tempfile.gettempdir(), 'metaviz_bench'))
+
+
+def synthetic(n):
+    """Synthetic archive with n files, generated if needed"""
+    from MetaViz import tools_synthetic as syn
+    return syn.MakeArchive(os.path.join(DATA, str(n)), n)
+
+
+def terms(n_terms, offset=100):
+    """Keywords of middling frequency in the synthetic vocabulary"""
+    from MetaViz import tools_synthetic as syn
+    vocab = syn.Vocabulary(5000)
+    return list(vocab[offset:offset + 10*n_terms:10])
+
+
+class Search:
+    """FindSource() and GrabData()"""
+    params = SIZES
+    param_names = ['rows']
+    timeout = 1800
+    number = 1
+
+    def setup(self, n):
+        self.archive = synthetic(n)
+        self.terms = terms(3)
+        self.files = self.archive.FindSource(self.terms[:1], ['Subject'])
+
+    def time_findsource_single(self, n):
+        self.archive.FindSource(self.terms[0], ['Subject'])
+
+    def time_findsource_any(self, n):
+        self.archive.FindSource(self.terms, ['Subject'])
+
+    def time_findsource_all(self, n):
+        self.archive.FindSource(self.terms, ['Subject'], include_all=True)
+
+    def time_findsource_wildcard(self, n):
+        self.archive.FindSource(self.terms[0][:3] + '.*', ['Subject'])
+
+    def time_findsource_allfields(self, n):
+        self.archive.FindSource(self.terms[0])
+
+    def time_grabdata_all(self, n):
+        self.archive.GrabData()
+
+    def time_grabdata_fields(self, n):
+        self.archive.GrabData(None, ['SourceFile', 'CreateDate'])
+
+    def time_grabdata_dates(self, n):
+        self.archive.GrabData(None, ['SourceFile', 'CreateDate'],
+                              startdate='20000101_000000',
+                              enddate='20091231_235959')
+
+    def time_grabdata_sourcefiles(self, n):
+        self.archive.GrabData(self.files, ['SourceFile', 'CreateDate'])
+
+    def peakmem_grabdata_all(self, n):
+        self.archive.GrabData()
+
+
+class Counts:
+    """tools.CountUnique() on fields of different cardinality"""
+    params = SIZES
+    param_names = ['rows']
+    timeout = 3600
+    number = 1
+
+    def setup(self, n):
+        archive = synthetic(n)
+        self.data = archive.GrabData(None, ['Creator', 'Coverage',
+                                            'Subject'])
+
+    def time_countunique_creator(self, n):
+        from MetaViz import tools
+        tools.CountUnique(self.data['Creator'])
+
+    def time_countunique_coverage(self, n):
+        from MetaViz import tools
+        tools.CountUnique(self.data['Coverage'])
+
+
+class CountsSubject:
+    """tools.CountUnique() on the keywords, quadratic in the vocabulary"""
+    # Larger archives would take hours
+    params = [n for n in SIZES if n <= 10000] or [10000]
+    param_names = ['rows']
+    timeout = 3600
+    number = 1
+
+    def setup(self, n):
+        archive = synthetic(n)
+        self.data = archive.GrabData(None, ['Subject'])
+
+    def time_countunique_subject(self, n):
+        from MetaViz import tools
+        tools.CountUnique(self.data['Subject'])
+
+
+class Aggregates:
+    """Counts, histograms and filters over the whole archive"""
+    params = SIZES
+    param_names = ['rows']
+    timeout = 3600
+    number = 1
+
+    def setup(self, n):
+        self.archive = synthetic(n)
+        self.creators = self.archive.GrabData(None, ['Creator'])['Creator']
+
+    def time_count(self, n):
+        self.archive.Count()
+
+    def time_count_field(self, n):
+        self.archive.Count('Creator')
+
+    def time_datehistogram_year(self, n):
+        self.archive.DateHistogram('Y')
+
+    def time_datehistogram_month(self, n):
+        self.archive.DateHistogram('M')
+
+    def time_query(self, n):
+        self.archive.Query([('CreateDate', '>=', '20000101_000000'),
+                            ('Subject', 'contains', terms(1)[0])],
+                           ['SourceFile', 'CreateDate'])
+
+    def time_countunique_archive(self, n):
+        self.archive.CountUnique('Coverage')
+
+    def time_countunique_weights(self, n):
+        from MetaViz import tools
+        values = self.creators.value_counts()
+        tools.CountUnique(values.index.to_series(), weights=values.to_numpy())
+
+
+class Plots:
+    """
+    Data preparation of the plotting routines (Agg backend), i.e. the
+    time until the drawing starts, see profiling.Mark(). Plots whose
+    auxiliary package is not installed give no result
+    """
+    params = SIZES
+    param_names = ['rows']
+    unit = 'seconds'
+    timeout = 3600
+    number = 1
+
+    def setup(self, n):
+        import matplotlib
+        matplotlib.use('Agg')
+        self.archive = synthetic(n)
+        self.data = self.archive.GrabData(None, ['SourceFile',
+                                                 'CreateDate'])
+        # Same output as tools.CountUnique(), much faster to set up
+        coverage = self.archive.GrabData(None, ['Coverage'])['Coverage']
+        counts = coverage.str.split(', ').explode().value_counts()
+        self.counts = counts.rename_axis('Entry').reset_index(name='Count')
+        self.terms = terms(3)
+
+    def teardown(self, n):
+        import matplotlib.pyplot as plt
+        plt.close('all')
+
+    def _Prep(self, plot, *args, **kwargs):
+        """Seconds spent by plot before drawing"""
+        from MetaViz import profiling as prof
+        with prof.Profile() as p:
+            plot(*args, **kwargs)
+        results = p.Results()
+        return float(results[results['Depth'] == 0]['PrepSeconds'].iloc[-1])
+
+    def track_filetypes(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.FileTypes, self.archive)
+
+    def track_temporalstats(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.TemporalStats, self.data)
+
+    def track_histogramyear(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.HistogramYear, self.data)
+
+    def track_histogrammonth(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.HistogramMonth, self.data)
+
+    def track_histogramweek(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.HistogramWeek, self.data)
+
+    def track_histogramday(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.HistogramDay, self.data)
+
+    def track_heatmapmonth(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.HeatmapMonth, self.data)
+
+    def track_heatmapweek(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.HeatmapWeek, self.data)
+
+    def track_heatmapday(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.HeatmapDay, self.data)
+
+    def track_barchart(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.BarChart, self.counts)
+
+    def track_piechart(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.PieChart, self.counts)
+
+    def track_heatmap1(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.Heatmap1, self.archive, 'Coverage', N=5)
+
+    def track_heatmap2(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.Heatmap2, self.archive, 'Coverage', 'Creator',
+                          N_x=5, N_y=5)
+
+    def track_chordchart(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.ChordChart, self.archive, self.terms,
+                          ['Subject'])
+
+    def track_occuranceplot(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.OccurancePlot, self.archive, self.terms,
+                          ['Subject'])
+
+    def track_occurancemagnitude(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.OccuranceMagnitude, self.archive, self.terms,
+                          ['Subject'])
+
+    def track_violinplot(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.ViolinPlot, self.archive, self.terms,
+                          ['Subject'])
+
+    def track_ridgeplot(self, n):
+        import MetaViz as mv
+        return self._Prep(mv.RidgePlot, self.archive, self.terms,
+                          ['Subject'])
@@ -0,0 +1,26 @@
+"""
+Import-time benchmarks, run with airspeed velocity (asv run).
+Each timeraw_ benchmark is timed in a fresh interpreter.
+"""
+
+
+def timeraw_import_metaviz():
+    return "import MetaViz"
+
+
+def timeraw_import_archive():
+    return "from MetaViz import Archive"
+
+
+def timeraw_import_plot():
+    return "from MetaViz import BarChart"
+
+
+def track_import_loads_matplotlib():
+    """Should stay 0, plotting modules are loaded on first use"""
+    import subprocess
+    import sys
+    code = "import sys, MetaViz; print(int('matplotlib' in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code],
+                         capture_output=True, text=True, check=True)
+    return int(out.stdout)
@@ -0,0 +1,67 @@
+"""
+Ingest throughput of Archive.UpdateCSV(), in files per second, using
+fake_exiftool on a tree of placeholder files (tools_synthetic.MakeTree)
+so that no real media or exiftool install is needed.
+
+The per-file latency of the stand-in is set by $METAVIZ_BENCH_LATENCY
+(seconds, default 0.0005), and the trees are kept in
+$METAVIZ_BENCH_DATA between runs.
+"""
+import os
+import time
+import shutil
+import tempfile
+
+DATA = os.environ.get('METAVIZ_BENCH_DATA',
+                      os.path.join(tempfile.gettempdir(), 'metaviz_bench'))
+LATENCY = float(os.environ.get('METAVIZ_BENCH_LATENCY', 0.0005))
+
+
+class Ingest:
+    """Full and incremental UpdateCSV() with several exiftool workers"""
+    params = ([1000, 10000], [1, 4, 8])
+    param_names = ['files', 'workers']
+    unit = 'files/s'
+    timeout = 1800
+    number = 1
+    repeat = 3
+
+    def setup(self, n, workers):
+        import MetaViz as mv
+        from MetaViz import config as cf
+        from MetaViz import fake_exiftool as fx
+        from MetaViz import tools_synthetic as syn
+        cf.exiftool = fx.Command(LATENCY)
+        root = os.path.join(DATA, 'tree_%d' % n)
+        if not os.path.exists(root):
+            syn.MakeTree(root, n, n_subfolders=20)
+        self.csvPath = tempfile.mkdtemp(prefix='metaviz_ingest_')
+        self.archive = mv.Archive(CollectionPath=root, csvPath=self.csvPath,
+                                  verbose=False)
+        self.n = n
+
+    def teardown(self, n, workers):
+        shutil.rmtree(self.csvPath)
+
+    def track_full_ingest(self, n, workers):
+        t0 = time.perf_counter()
+        self.archive.UpdateCSV(workers=workers)
+        return self.n / (time.perf_counter() - t0)
+
+    def track_incremental_ingest(self, n, workers):
+        """
+        One subfolder in ten changed since the last ingest, in files
+        of the changed subfolders (which are extracted again) per second
+        """
+        self.archive.UpdateCSV(workers=workers)
+        time.sleep(0.01)
+        modified = 0
+        for sf in self.archive.subfolders[::10]:
+            folder = os.path.join(self.archive.CollectionPath, sf)
+            names = sorted(n for n in os.listdir(folder) \
+                           if not n.startswith('.'))
+            os.utime(os.path.join(folder, names[-1]))
+            modified += len(names)
+        t0 = time.perf_counter()
+        self.archive.UpdateCSV(workers=workers, incremental=True)
+        return modified / (time.perf_counter() - t0)
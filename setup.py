@@ -14,10 +14,11 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/wrightky/MetaViz",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=['benchmarks']),
     classifiers=[
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent"],
     install_requires = ['numpy','matplotlib','pandas'],
+    entry_points={'console_scripts': ['metaviz=MetaViz.cli:main']},
     keywords=['metadata', 'visualization', 'photos', 'archive']
 )
@@ -0,0 +1,40 @@
+"""
+Incremental updates of LocationCoords.csv by DownloadCoverage()
+"""
+import os
+import pandas as pd
+from MetaViz import tools_synthetic as syn
+
+
+def _Coords(archive):
+    coords = pd.read_csv(os.path.join(archive.csvPath, 'LocationCoords.csv'),
+                         encoding="ISO-8859-1")
+    return coords.set_index('Location')['Appearances'].sort_index()
+
+
+def _Edit(archive, sf, edit):
+    csvname = os.path.join(archive.csvPath, sf + '.csv')
+    df = pd.read_csv(csvname, encoding="ISO-8859-1", dtype=str)
+    col = [c for c in df.columns if c.split(':')[-1] == 'Coverage'][0]
+    df[col] = edit(df[col])
+    df.to_csv(csvname, index=False, encoding="ISO-8859-1")
+    # Make sure the modification time changes
+    st = os.stat(csvname)
+    os.utime(csvname, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_incremental_matches_rebuild(tmp_path):
+    archive = syn.MakeArchive(str(tmp_path / 'csv'), 1000, seed=4)
+    archive.verbose = False
+    archive.DownloadCoverage(incremental=True)
+    # Locations removed from one subfolder, added to another
+    _Edit(archive, archive.subfolders[-1], lambda c: c.where(c.isnull()))
+    _Edit(archive, archive.subfolders[-2],
+          lambda c: c.fillna('Nowhere') + ', Somewhere')
+    archive.DownloadCoverage(incremental=True)
+    incremental = _Coords(archive)
+
+    archive.DownloadCoverage(overwrite_existing=True)
+    rebuild = _Coords(archive)
+    pd.testing.assert_series_equal(incremental, rebuild, check_dtype=False)
+    assert incremental['Somewhere'] > 0
@@ -0,0 +1,26 @@
+"""
+Parsing of exiftool Duration strings into seconds
+"""
+import numpy as np
+import pandas as pd
+from MetaViz import tools
+
+
+def test_parse_duration_formats():
+    values = pd.Series(['0:01:23', '1:02:03.5', '12.5 s', '12.34 s (approx)',
+                        '42', '3.25', ' 7 s '])
+    seconds = tools.ParseDuration(values)
+    np.testing.assert_allclose(seconds, [83, 3723.5, 12.5, 12.34,
+                                         42, 3.25, 7])
+
+
+def test_parse_duration_missing():
+    values = pd.Series([np.nan, '', 'unknown', '12.5 s'])
+    seconds = tools.ParseDuration(values)
+    assert seconds.isnull().tolist() == [True, True, True, False]
+    assert seconds.dtype == float
+
+
+def test_total_duration():
+    df = pd.DataFrame({'Duration': ['0:01:00', '30 s', None]})
+    assert tools.TotalDuration(df) == str(pd.Timedelta(seconds=90))
@@ -0,0 +1,89 @@
+"""
+Geocoding of the Coverage locations with fake_geolocator in place
+of a geopy geocoder
+"""
+import os
+import numpy as np
+import pandas as pd
+from MetaViz import tools
+from MetaViz import tools_geo as geo
+from MetaViz import fake_geolocator as fg
+
+
+def test_cache_hits(tmp_path):
+    cache = geo.GeocodeCache(str(tmp_path / 'cache.sqlite'))
+    geolocator = fg.Geolocator()
+    places = ['Austin', 'Paris', 'Kyoto']
+    first = geo.GeocodeLocations(places, geolocator, cache,
+                                 min_delay_seconds=0)
+    assert sorted(geolocator.Queried()) == sorted(places)
+    # Same locations, differently written, come from the cache
+    second = geo.GeocodeLocations(['austin ', 'PARIS', 'Kyoto'], geolocator,
+                                  cache, min_delay_seconds=0)
+    assert len(geolocator.Queried()) == 3
+    np.testing.assert_array_equal(first['Latitude'], second['Latitude'])
+    cache.Close()
+
+
+def test_retry_failed(tmp_path):
+    cache = geo.GeocodeCache(str(tmp_path / 'cache.sqlite'))
+    geolocator = fg.Geolocator(unknown=['Atlantis'])
+    coords = geo.GeocodeLocations(['Atlantis', 'Lima'], geolocator, cache,
+                                  min_delay_seconds=0)
+    assert coords['Latitude'].isnull().tolist() == [True, False]
+
+    # Failures are cached, and only queried again if asked to
+    geo.GeocodeLocations(['Atlantis', 'Lima'], geolocator, cache,
+                         min_delay_seconds=0, retry_failed=False)
+    assert geolocator.Queried() == ['Atlantis', 'Lima']
+    geolocator.unknown = set()
+    coords = geo.GeocodeLocations(['Atlantis', 'Lima'], geolocator, cache,
+                                  min_delay_seconds=0)
+    assert geolocator.Queried() == ['Atlantis', 'Lima', 'Atlantis']
+    assert coords['Latitude'].notnull().all()
+    cache.Close()
+
+
+def test_simplified_name_and_errors():
+    geolocator = fg.Geolocator(unknown=['Zilker Park (Austin)'],
+                               errors={'Oslo': 1})
+    coords = geo.GeocodeLocations(['Zilker Park (Austin)', 'Oslo'],
+                                  geolocator, min_delay_seconds=0.01)
+    assert coords['Latitude'].notnull().all()
+    assert geolocator.Queried().count('Zilker Park') == 1
+    assert geolocator.Queried().count('Oslo') == 2
+
+    # Errors are not cached as failures
+    geolocator = fg.Geolocator(errors={'Oslo': 5})
+    coords = geo.GeocodeLocations(['Oslo'], geolocator,
+                                  min_delay_seconds=0.001, max_retries=1)
+    assert coords['Latitude'].isnull().all()
+
+
+def test_shared_rate_budget():
+    geolocator = fg.Geolocator(latency=0.01)
+    places = ['Place %d' % i for i in range(8)]
+    geo.GeocodeLocations(places, geolocator, min_delay_seconds=0.05,
+                         workers=4)
+    times = np.sort([t for t, q in geolocator.queries])
+    assert len(times) == len(places)
+    assert np.diff(times).min() >= 0.05 - 0.005
+
+
+def test_coverage2coords(tmp_path):
+    csvname = os.path.join(str(tmp_path), 'LocationCoords.csv')
+    pd.DataFrame({'Location': ['Austin', 'Atlantis', 'Denver'],
+                  'Latitude': [np.nan, np.nan, 1.5],
+                  'Longitude': [np.nan, np.nan, 2.5]}).to_csv(csvname,
+                                                              index=False)
+    geolocator = fg.Geolocator(unknown=['Atlantis'])
+    tools.Coverage2Coords(str(tmp_path), geolocator, min_delay_seconds=0)
+    df = pd.read_csv(csvname)
+    assert geolocator.Queried() == ['Austin', 'Atlantis']
+    assert df.loc[0, 'Latitude'] != 0
+    assert (df.loc[1, 'Latitude'], df.loc[1, 'Longitude']) == (0, 0)
+    assert (df.loc[2, 'Latitude'], df.loc[2, 'Longitude']) == (1.5, 2.5)
+
+    # The failed location is looked up again, from the cache otherwise
+    tools.Coverage2Coords(str(tmp_path), geolocator, min_delay_seconds=0)
+    assert geolocator.Queried() == ['Austin', 'Atlantis', 'Atlantis']
@@ -0,0 +1,52 @@
+"""
+Writing csv edits back into the files with Archive.UpdateMetadata(),
+using fake_exiftool on a synthetic tree
+"""
+import os
+import pandas as pd
+import pytest
+import MetaViz as mv
+from MetaViz import config as cf
+from MetaViz import fake_exiftool as fx
+from MetaViz import tools_synthetic as syn
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(cf, 'exiftool', fx.Command())
+    syn.MakeTree(str(tmp_path / 'collection'), 20, n_subfolders=2)
+    archive = mv.Archive(CollectionPath=str(tmp_path / 'collection'),
+                         csvPath=str(tmp_path / 'csv'), verbose=False)
+    archive.UpdateCSV()
+    return archive
+
+
+def _ReadCSV(archive, sf):
+    csvname = os.path.join(archive.csvPath, sf + '.csv')
+    df = pd.read_csv(csvname, encoding="ISO-8859-1", dtype=str,
+                     keep_default_na=False)
+    return csvname, df
+
+
+def test_clear_tag(archive):
+    sf = archive.subfolders[0]
+    csvname, df = _ReadCSV(archive, sf)
+    cleared = df.loc[0, 'SourceFile']
+    assert df.loc[0, 'XMP-dc:Creator'] != ''
+    df.loc[0, 'XMP-dc:Creator'] = ''
+    df.to_csv(csvname, index=False, encoding="ISO-8859-1")
+
+    archive.UpdateMetadata()
+    assert len(archive.DiffMetadata()) == 0
+    assert (archive.ListJournal()['Status'] == 'done').all()
+
+    # The tag is gone from the file, not only from the csv
+    archive.UpdateCSV(subfolders=[sf])
+    csvname, df = _ReadCSV(archive, sf)
+    row = df[df['SourceFile'] == cleared]
+    assert row['XMP-dc:Creator'].tolist() == ['']
+
+
+def test_no_changes(archive):
+    archive.UpdateMetadata()
+    assert len(archive.DiffMetadata()) == 0